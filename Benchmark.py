@@ -0,0 +1,248 @@
+"""
+Scaling benchmark: tanks of a growing number of creatures, with a fixed mix of sharks, salmon, cod and food spawned
+from a fixed seed, stepped frame by frame while timing each stage separately:
+
+    * stepForward: the simulation step of every creature, CreatureStore.stepForward
+    * animationUpdate: copying the step back to the creatures and animating their fins, Vivarium.applySteps
+    * Component.update: the transformation matrices of the scene graph
+    * drawList: grouping the shapes and skinned meshes, and packing the instance data of the shapes, the CPU side of
+      InstanceRenderer.draw
+    * bones: packing the bone matrices of the skinned creatures for the GPU, InstanceRenderer.boneData. With
+      animationUpdate and Component.update, it is what the swimming motion costs on the CPU, see SkinnedMesh
+
+The stages after stepForward need the models, and so a GL context (see Offscreen.createContext). Tanks larger than
+--scene-max, and every tank with --headless, only time stepForward, on a HeadlessVivarium. Results are written as
+JSON, and can be compared to the results of an earlier run to catch regressions.
+
+Usage: python Benchmark.py --output bench.json
+       python Benchmark.py --headless --sizes 10 100 1000 10000 --baseline bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import Species
+from Headless import HeadlessVivarium
+from SimClock import DEFAULT_DT
+
+STAGES = ("stepForward", "animationUpdate", "Component.update", "drawList", "bones")
+# share of each species in the tanks, at least one shark and the rest of the rounding in food
+MIX = ((Species.SHARK, 0.02), (Species.SALMON, 0.34), (Species.COD, 0.34), (Species.FOOD, 0.30))
+# the creatures a Vivarium starts with
+DEFAULT_POPULATION = {Species.SHARK: 1, Species.SALMON: 2, Species.COD: 2}
+
+
+def population(total: int) -> Dict[Species.Species, int]:
+    """
+    Number of creatures of each species in a tank of total creatures, never fewer than a Vivarium starts with
+    """
+    counts = {species: max(round(total * share), DEFAULT_POPULATION.get(species, 0)) for species, share in MIX}
+    counts[Species.FOOD] = max(0, total - sum(n for species, n in counts.items() if species is not Species.FOOD))
+    return counts
+
+
+def populate(vivarium, counts: Dict[Species.Species, int]):
+    """
+    Add creatures to a vivarium holding DEFAULT_POPULATION until it holds counts
+    """
+    for species, count in counts.items():
+        for _ in range(count - DEFAULT_POPULATION.get(species, 0)):
+            vivarium.addCreature(species)
+
+
+class StageTimer:
+    """
+    Wall time of each run of each stage, in nanoseconds
+    """
+    samples = None  # Dict[str, List[int]]
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter_ns() - start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Mean, percentiles and extremes of every stage, in milliseconds
+        """
+        result = {}
+        for stage, samples in self.samples.items():
+            values = np.array(samples, dtype=np.float64) / 1e6
+            p50, p95 = np.percentile(values, [50, 95])
+            result[stage] = {"mean_ms": float(values.mean()), "p50_ms": float(p50), "p95_ms": float(p95),
+                             "min_ms": float(values.min()), "max_ms": float(values.max()), "samples": len(values)}
+        return result
+
+
+def benchmarkScene(total: int, frames: int, warmup: int, seed: int, radius: Optional[float]) -> dict:
+    """
+    Time every stage on a Vivarium of total creatures. A GL context must be current.
+    """
+    # imported here, so the headless benchmark runs without OpenGL
+    from InstanceRenderer import InstanceRenderer
+    from Offscreen import OffscreenRenderer
+
+    renderer = OffscreenRenderer(64, 64, seed, radius)
+    vivarium = renderer.vivarium
+    counts = population(total)
+    populate(vivarium, counts)
+    root = renderer.topLevelComponent
+    root.update(np.identity(4))
+
+    timer = StageTimer()
+    gc.collect()
+    for frame in range(warmup + frames):
+        if frame == warmup:
+            timer = StageTimer()
+        creatures = list(vivarium.store.creatures)
+        with timer.time("stepForward"):
+            _, eaten = vivarium.store.stepForward(vivarium.tank_dimensions, DEFAULT_DT)
+        with timer.time("animationUpdate"):
+            vivarium.applySteps(creatures, eaten, DEFAULT_DT)
+        with timer.time("Component.update"):
+            root.update(np.identity(4))
+        with timer.time("drawList"):
+            groups, skins, _ = InstanceRenderer.collect(root)
+            for shapes in groups.values():
+                InstanceRenderer.instanceData(shapes)
+        with timer.time("bones"):
+            for meshes in skins.values():
+                InstanceRenderer.boneData(meshes)
+    return {"creatures": total, "population": {species.name: n for species, n in counts.items()}, "scene": True,
+            "creatures_left": len(vivarium.store), "stages": timer.summary()}
+
+
+def benchmarkHeadless(total: int, frames: int, warmup: int, seed: int, radius: Optional[float]) -> dict:
+    """
+    Time stepForward on a HeadlessVivarium of total creatures
+    """
+    vivarium = HeadlessVivarium(interaction_radius=radius, seed=seed)
+    vivarium.addShark()
+    for _ in range(DEFAULT_POPULATION[Species.SALMON]):
+        vivarium.addFish()
+    counts = population(total)
+    populate(vivarium, counts)
+
+    timer = StageTimer()
+    gc.collect()
+    for frame in range(warmup + frames):
+        if frame == warmup:
+            timer = StageTimer()
+        creatures = list(vivarium.store.creatures)
+        with timer.time("stepForward"):
+            _, eaten = vivarium.store.stepForward(vivarium.tank_dimensions, vivarium.dt)
+        for i in np.flatnonzero(eaten):
+            vivarium.store.remove(creatures[i])
+    return {"creatures": total, "population": {species.name: n for species, n in counts.items()}, "scene": False,
+            "creatures_left": len(vivarium.store), "stages": timer.summary()}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                                timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "processor": platform.processor(), "commit": commit}
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """
+    Median times slower than in the baseline by more than tolerance, as one line per tank size and stage
+    """
+    previous = {(r["creatures"], stage): stats["p50_ms"] for r in baseline for stage, stats in r["stages"].items()}
+    regressions = []
+    for r in results:
+        for stage, stats in r["stages"].items():
+            before = previous.get((r["creatures"], stage))
+            if before is None or before <= 0:
+                continue
+            ratio = stats["p50_ms"] / before
+            if ratio > 1 + tolerance:
+                regressions.append(f"{r['creatures']:>6} {stage:<17} {before:10.3f} -> {stats['p50_ms']:10.3f} ms "
+                                   f"({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the simulation and the scene graph for growing tanks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="number of creatures of each tank")
+    parser.add_argument("--frames", type=int, default=50, help="number of frames timed for each tank")
+    parser.add_argument("--warmup", type=int, default=5, help="number of frames run before timing")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the spawn positions and directions")
+    parser.add_argument("--radius", type=float, default=None,
+                        help="time the spatial hash with this interaction radius, see CreatureStore.interaction_radius. "
+                             "Every pair interacts if not given, as in Sketch, Offscreen and Headless")
+    parser.add_argument("--headless", action="store_true", help="only time stepForward, without any GL context")
+    parser.add_argument("--scene-max", type=int, default=1000,
+                        help="largest tank built with its models, larger ones only time stepForward. "
+                             "The models take about half a megabyte per creature")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare the median times to the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown over the baseline reported as a regression, 0.25 for 25%%")
+    args = parser.parse_args(argv)
+
+    radius = args.radius
+    scene = not args.headless and any(size <= args.scene_max for size in args.sizes)
+    if scene:
+        from Offscreen import createContext
+        createContext()
+
+    results = []
+    print(f"{'size':>6} {'stage':<17} {'p50 ms':>10} {'p95 ms':>10} {'left':>6}")
+    for size in args.sizes:
+        if scene and size <= args.scene_max:
+            result = benchmarkScene(size, args.frames, args.warmup, args.seed, radius)
+        else:
+            result = benchmarkHeadless(size, args.frames, args.warmup, args.seed, radius)
+        results.append(result)
+        for stage in STAGES:
+            stats = result["stages"].get(stage)
+            if stats is not None:
+                print(f"{size:>6} {stage:<17} {stats['p50_ms']:10.3f} {stats['p95_ms']:10.3f} "
+                      f"{result['creatures_left']:>6}")
+
+    if args.output is not None:
+        report = {"version": 1,
+                  "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                  "environment": environment(),
+                  "config": {"frames": args.frames, "warmup": args.warmup, "seed": args.seed,
+                             "interaction_radius": radius, "dt": DEFAULT_DT},
+                  "results": results}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        baseline_radius = baseline.get("config", {}).get("interaction_radius")
+        if baseline_radius != radius:
+            print(f"The baseline was timed with interaction radius {baseline_radius}, not {radius}")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("Slower than the baseline:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print("No regression over the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -208,6 +208,21 @@ class Buff:
             self.generatePointArray()
         return self.buffPointArray[x][y]
 
+    def setBuffView(self, buffArray):
+        """
+        Use an existing array as the buff, without copying it, e.g. a view of pixels read back from the graphic card.
+        The buff changes whenever the array does.
+
+        :param buffArray: a (width, height, 3) array, it may be a non-contiguous view
+        :type buffArray: numpy.array(dtype=uint8)
+        """
+        if not isinstance(buffArray, np.ndarray) or buffArray.dtype != np.uint8:
+            raise TypeError("buffArray can be uint8 ndarray only")
+        if buffArray.shape != (self.width, self.height, 3):
+            raise TypeError("You are viewing buffArray with incorrect shape as this buff")
+        self.buff = buffArray
+        self.buffPointArray = None
+
     def _setBuffArray(self, buffarray):
         """
         In class usage only
@@ -6,6 +6,10 @@ from Component import Component
 from EnvironmentObject import EnvironmentObject
 from Point import Point
 from Quaternion import Quaternion
+from Species import Species
+from SimClock import DEFAULT_DT
+from StaticBatch import bakeRigidParts, skinBakedParts
+from Potential import d_gravity, d_dist, d_wall, normalize, reflect, length, turn
 
 
 class CS680PA3(Component, EnvironmentObject):
@@ -21,7 +25,7 @@ class CS680PA3(Component, EnvironmentObject):
 
     componentDict: Dict[str, Component] = None
     # Rotation handling registry to record information about
-    # each part and the speed at which it needs to be rotated.
+    # each part and the speed at which it needs to be rotated, in degrees per second.
     rotationRegistry: List[RotWrap] = None
 
     # define the relative boundary of each component
@@ -30,29 +34,71 @@ class CS680PA3(Component, EnvironmentObject):
     # define the center within the boundary of each component
     basic_boundary_center: Point = None
 
-    # define the speed of the creature
-    basic_speed: float = 0.5
+    # define the speed of the creature, in units per second
+    basic_speed: float = 60
 
     # define the current step orientation of the creature
     step_vector: Point = None
 
+    # where the creature draws its random numbers from, spawned from its vivarium's so that runs can be reproduced
+    rng: np.random.Generator = None
+
     # define the current orientation of the creature
     orientation: Point = None
 
     # define the food chain level, the smaller number represents the higher level
     food_chain_level: int = 0
 
+    # creatures which do not steer, and only drift along their step vector (e.g. Food)
+    drifting: bool = False
+
+    # merge the parts that do not move relative to their joint before the creature is first drawn, see StaticBatch
+    bake_static_geometry: bool = True
+    # then draw the whole baked creature at once, moving its joints on the GPU, see SkinnedMesh
+    gpu_skinning: bool = True
+    __baked: bool = False
+
+    # radius around the creature's origin containing all its parts at the unit scale, measured when it is first
+    # displayed, and how much larger than that the parts may get while the joints rotate
+    basic_draw_radius: float = None
+    draw_radius_margin: float = 1.1
+
     __cur_max_scale: float = 1.0
     __boundary_center: Point = None
 
-    def __init__(self, position):
+    # the state after the last two simulation ticks, used to interpolate between them when rendering
+    __prev_state = None
+    __state = None
+
+    def __init__(self, position, rng: np.random.Generator = None):
         Component.__init__(self, position)
+        self.rng = np.random.default_rng() if rng is None else rng
         self.componentDict = {}
         self.rotationRegistry = []
         self.basic_boundary_center = Point((0, 0, 0))
         self.__boundary_center = self.basic_boundary_center
         self.orientation = Point((0, 0, 1))
-        self.step_vector = Point(np.random.normal(0, 1, 3)).normalize()
+        self.step_vector = Point(self.rng.normal(0, 1, 3)).normalize()
+
+    def initializeDisplay(self):
+        if self.basic_draw_radius is None:
+            self.basic_draw_radius = self.measureDrawRadius() / self.__cur_max_scale
+        if self.bake_static_geometry and not self.__baked:
+            baked = bakeRigidParts(self, [wrap.comp for wrap in self.rotationRegistry])
+            if self.gpu_skinning:
+                skinBakedParts(self, baked)
+            self.__baked = True
+        super().initializeDisplay()
+
+    def setSpecies(self, species: Species):
+        """
+        Use the simulation parameters of a species. Call this before setting the scale.
+        """
+        self.basic_boundary_radius = species.boundary_radius
+        self.basic_boundary_center = Point(species.boundary_center)
+        self.basic_speed = species.speed
+        self.food_chain_level = species.food_chain_level
+        self.drifting = species.drifting
 
     def setCurrentScale(self, scale, check: bool = True):
         super().setCurrentScale(scale, check)
@@ -63,6 +109,34 @@ class CS680PA3(Component, EnvironmentObject):
     def boundary_radius(self) -> float:
         return self.basic_boundary_radius * self.__cur_max_scale
 
+    def measureDrawRadius(self) -> float:
+        """
+        Distance from the creature's origin to the furthest point of its parts, in their current pose
+        """
+        self.update()
+        origin = self.transformationMat[:3, 3]
+        radius = 0.0
+        for node in self.sceneGraph.components()[1:]:
+            sphere = node.boundingSphere()
+            if sphere is not None:
+                radius = max(radius, np.linalg.norm(sphere[0] - origin) + sphere[1])
+        return radius
+
+    @property
+    def draw_radius(self) -> float:
+        """
+        Radius around the creature's origin that its parts stay in, larger than the collision sphere, which only
+        covers the body
+        """
+        if self.basic_draw_radius is None:
+            return self.boundary_radius + np.linalg.norm(self.boundary_center.coords)
+        return self.basic_draw_radius * self.__cur_max_scale * self.draw_radius_margin
+
+    def boundingSphere(self):
+        if self.transformationMat is None:
+            return None
+        return self.transformationMat[:3, 3], self.draw_radius
+
     @property
     def speed(self) -> float:
         return self.basic_speed * self.__cur_max_scale
@@ -71,13 +145,13 @@ class CS680PA3(Component, EnvironmentObject):
     def boundary_center(self) -> Point:
         return self.__boundary_center
 
-    def animationUpdate(self):
+    def animationUpdate(self, dt: float = DEFAULT_DT):
         for i, wrap in enumerate(self.rotationRegistry):
             comp = wrap.comp
             speed = wrap.rotation_speed
-            comp.rotate(speed[0], comp.uAxis)
-            comp.rotate(speed[1], comp.vAxis)
-            comp.rotate(speed[2], comp.wAxis)
+            comp.rotate(speed[0] * dt, comp.uAxis)
+            comp.rotate(speed[1] * dt, comp.vAxis)
+            comp.rotate(speed[2] * dt, comp.wAxis)
             # rotation reached the limit
             if comp.uAngle in comp.uRange:
                 speed[0] *= -1
@@ -85,32 +159,37 @@ class CS680PA3(Component, EnvironmentObject):
                 speed[1] *= -1
             if comp.wAngle in comp.wRange:
                 speed[2] *= -1
-        self.update()
+        # the rotated parts are marked dirty, their transforms are computed with the next update of the scene
 
     def stepForward(self,
                     components: List[Component],
                     tank_dimensions: List[float],
-                    vivarium: Component):
+                    vivarium: Component,
+                    dt: float = DEFAULT_DT):
+        # The new step vector is set right away, so the creatures stepped after this one in the same frame see it, as
+        # CreatureStore.stepForward does
+        step_vector = self.step_vector.coords.astype(np.float64)
+        distance = self.speed * dt
+
         # reflect when the object is near hit the tank.
         # this is the highest priority. If hit, we no longer do any more test.
-        hit_test_pos = self.currentPos + self.boundary_center + self.step_vector * self.speed
-        tank_dimensions = np.array(tank_dimensions)
+        hit_test_pos = self.currentPos.coords + self.boundary_center.coords + step_vector * distance
+        tank_dimensions = np.array(tank_dimensions, dtype=np.float64)
 
         hit = False
         for dim in range(3):
-            if hit_test_pos.coords[dim] > tank_dimensions[dim] / 2 - self.boundary_radius or \
-                    hit_test_pos.coords[dim] < -tank_dimensions[dim] / 2 + self.boundary_radius:
-                self.step_vector.coords[dim] *= -1
+            if hit_test_pos[dim] > tank_dimensions[dim] / 2 - self.boundary_radius or \
+                    hit_test_pos[dim] < -tank_dimensions[dim] / 2 + self.boundary_radius:
+                step_vector[dim] *= -1
                 hit = True
         if hit:
             # when actually do translation, we should not add the boundary_center inside it!
-            return self.step_vector * self.speed, None
+            self.step_vector = Point(step_vector)
+            return self.step_vector * distance, None
 
         overall_velocity = np.zeros(3)
         # we add the potential functions for the walls, to avoid objects run towards the tank walls
-        wall_drv_step = d_upper_bound(30, 3.4012, hit_test_pos.coords - tank_dimensions / 2.162)
-        wall_drv_step += d_lower_bound(30, 3.4012, hit_test_pos.coords + tank_dimensions / 2.162)
-        overall_velocity -= wall_drv_step * 0.09
+        overall_velocity -= d_wall(tank_dimensions, hit_test_pos) * 0.09
 
         # now compute the potential functions between objects
         most_junior_level = float('-inf')
@@ -121,15 +200,16 @@ class CS680PA3(Component, EnvironmentObject):
                 most_junior_level = max(most_junior_level, comp.food_chain_level)
 
                 # this is another creature
-                new_object_test_pos = comp.currentPos + comp.boundary_center + comp.step_vector * comp.speed
+                new_object_test_pos = comp.currentPos.coords + comp.boundary_center.coords + \
+                    comp.step_vector.coords * (comp.speed * dt)
                 dist_vec = new_object_test_pos - hit_test_pos
-                dist = np.sqrt(np.sum(dist_vec.coords ** 2))
+                dist = length(dist_vec)[0]
 
                 # Collision
                 if dist < self.boundary_radius + comp.boundary_radius:
                     # if the food chain level is equal:
                     if self.food_chain_level == comp.food_chain_level:
-                        overall_velocity += self.step_vector.reflect(dist_vec.normalize()).coords * 0.3
+                        overall_velocity += reflect(self.step_vector.coords, dist_vec) * 0.3
                     elif self.food_chain_level < comp.food_chain_level == most_junior_level:
                         # only can kill the creature when the food is the least level
                         # each time it can only kill one creature
@@ -140,66 +220,68 @@ class CS680PA3(Component, EnvironmentObject):
                     # mimic universal gravity
                     overall_velocity -= d_gravity(
                         0.5 * 3 * self.boundary_radius, 0.5,
-                        hit_test_pos.coords - new_object_test_pos.coords) * 0.01
+                        hit_test_pos - new_object_test_pos) * 0.01
                 elif self.food_chain_level < comp.food_chain_level:
                     # chasing
                     if comp.food_chain_level == most_junior_level:
-                        overall_velocity += d_dist(hit_test_pos.coords - new_object_test_pos.coords) * 0.05
+                        overall_velocity += d_dist(hit_test_pos - new_object_test_pos) * 0.05
                 elif self.food_chain_level > comp.food_chain_level:
                     # escaping
-                    overall_velocity -= d_dist(hit_test_pos.coords - new_object_test_pos.coords) * 0.04
+                    overall_velocity -= d_dist(hit_test_pos - new_object_test_pos) * 0.04
 
-        self.step_vector += Point(overall_velocity)
-        self.step_vector = self.step_vector.normalize()
+        # the steering weights give the turn of a tick of DEFAULT_DT, kept as a turn rate whatever dt
+        self.step_vector = Point(turn(step_vector, normalize(step_vector + overall_velocity), dt / DEFAULT_DT))
 
         # the object will move towards its own step_vector
-        return self.step_vector * self.speed, item_to_delete
+        return self.step_vector * distance, item_to_delete
 
-    def rotateDirection(self):
+    def rotateDirection(self, direction: Point = None):
         """
         change this environment object's orientation from v1 to v2.
+
+        :param direction: the direction to face, defaults to step_vector
         """
         v1 = self.orientation
-        v2 = self.step_vector
+        v2 = self.step_vector if direction is None else direction
         rotate_axis = v1.cross3d(v2)
         rotate_angle = v1.angleWith(v2)
         rotate_q = Quaternion.axisAngleToQuaternion(rotate_axis, rotate_angle)
         self.setPostRotation(rotate_q.toMatrix())
 
+    def __captureState(self):
+        angles = np.array([[w.comp.uAngle, w.comp.vAngle, w.comp.wAngle] for w in self.rotationRegistry])
+        return self.currentPos.coords.astype(np.float64), self.step_vector.coords.astype(np.float64), angles
 
-def unit_v(vector: np.ndarray, tol: float = 1E-6) -> np.ndarray:
-    norm = np.linalg.norm(vector)
-    if norm == 0 or norm < abs(norm - 1.0) <= tol:
-        return vector
-    else:
-        return vector / norm
-
-
-def d_lower_bound(n: float, log_n: float, x: np.ndarray) -> np.ndarray:
-    # compute the lower bound gradient descent function
-    # n: the number of exponent
-    # log_n: log(n), precomputed for reduced computation
-    # x: the input vector
-    # y = np.pow(n, -x)
-    return -log_n * (n ** -x)
-
-
-def d_upper_bound(n: float, log_n: float, x: np.ndarray) -> np.ndarray:
-    # y = np.pow(n, x)
-    return log_n * (n ** x)
+    def __applyState(self, position: np.ndarray, direction: np.ndarray, angles: np.ndarray):
+        self.currentPos = Point(position)
+        self.rotateDirection(Point(direction))
+        for wrap, (u, v, w) in zip(self.rotationRegistry, angles):
+            wrap.comp.uAngle, wrap.comp.vAngle, wrap.comp.wAngle = u, v, w
 
+    def saveState(self):
+        """
+        Remember the state reached by the last simulation tick
+        """
+        self.__prev_state = self.__state
+        self.__state = self.__captureState()
 
-def d_gravity(a: float, b: float, x: np.ndarray) -> np.ndarray:
-    # potential functions for mimic gravity boids.
-    # df(x) = - a / x + b
-    # b: limit point
-    # a / b should be the place you want to cross the 0
-    sign_x = np.sign(x)
-    result = b - a / np.abs(x)
-    result *= sign_x
-    return result
+    def restoreState(self):
+        """
+        Go back to the state of the last simulation tick, after it was replaced by an interpolated one
+        """
+        if self.__state is not None:
+            self.__applyState(*self.__state)
 
+    def interpolateState(self, alpha: float):
+        """
+        Show the creature between the last two simulation ticks.
 
-def d_dist(x: np.ndarray) -> np.ndarray:
-    # y = 1 / np.exp(x ** 2)
-    return -2 * x * np.exp(-x ** 2)
+        :param alpha: 0 for the state of the tick before the last one, 1 for the last one
+        """
+        if self.__prev_state is None or self.__state is None:
+            return
+        (p0, d0, a0), (p1, d1, a1) = self.__prev_state, self.__state
+        direction = normalize((1 - alpha) * d0 + alpha * d1)
+        if not direction.any():
+            direction = d1
+        self.__applyState((1 - alpha) * p0 + alpha * p1, direction, (1 - alpha) * a0 + alpha * a1)
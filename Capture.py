@@ -0,0 +1,211 @@
+"""
+Reading rendered frames back from the GPU, and writing them out. Frames are read into a ring of pixel buffer objects
+and only mapped a few frames later, so the CPU does not wait for the GPU to finish each frame before the next one
+is drawn, and recording does not slow rendering down.
+"""
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+from Buff import Buff
+from GLBuffer import PBO
+
+
+class FrameReader:
+    """
+    Reads the framebuffer bound for reading, the default one or a FBO, once per frame:
+
+        buff = reader.read()  # a frame drawn depth - 1 frames ago, None while the ring fills up
+        ...
+        for buff in reader.flush():  # the frames still in the ring, once done drawing
+        reader.release()
+
+    Frames are returned as a Buff, with y = 0 the bottom row as OpenGL reads them. It is the same Buff every time,
+    and its content is only valid until the next read, copy it to keep it. With mapped, the Buff views the memory of
+    the pixel buffer itself, otherwise the pixels are copied once into an array reused for every frame.
+    """
+    width = 0
+    height = 0
+    depth = 2  # number of pixel buffers, a frame is returned depth - 1 frames after it was read
+    mapped = False  # whether the returned Buff views the mapped pixel buffer instead of a copy
+    pbos = None  # List[PBO]
+    pixels = None  # height x width x 3 array the frames are copied into, when not mapped
+    buff = None  # Buff the frames are returned in
+
+    __next = 0  # pixel buffer the next frame is read into
+    __pending = 0  # number of frames read but not returned yet
+    __mappedPbo = None  # pixel buffer mapped for the last frame returned
+
+    def __init__(self, width: int, height: int, depth: int = 2, mapped: bool = False):
+        if depth < 1:
+            raise ValueError("FrameReader needs at least one pixel buffer")
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.mapped = mapped
+        self.pbos = [PBO(width * height * 3) for _ in range(depth)]
+        self.pixels = np.empty((height, width, 3), dtype=np.uint8)
+        self.buff = Buff(width, height)
+
+    def read(self) -> Optional[Buff]:
+        """
+        Start reading the current frame, and return the oldest frame in the ring once it is full
+        """
+        self.release()
+        self.pbos[self.__next].readPixels(0, 0, self.width, self.height)
+        self.__next = (self.__next + 1) % self.depth
+        self.__pending += 1
+        if self.__pending < self.depth:
+            return None
+        # the buffer read into next is the oldest one
+        return self.__fetch(self.__next)
+
+    def flush(self):
+        """
+        Return the frames still in the ring, oldest first
+        """
+        while self.__pending > 0:
+            self.release()
+            yield self.__fetch((self.__next - self.__pending) % self.depth)
+        self.release()
+
+    def release(self):
+        """
+        Unmap the pixel buffer viewed by the last frame returned, if mapped
+        """
+        if self.__mappedPbo is not None:
+            self.__mappedPbo.unmap()
+            self.__mappedPbo = None
+
+    def __fetch(self, index: int) -> Buff:
+        pbo = self.pbos[index]
+        pixels = pbo.map()[:self.pixels.size].reshape(self.pixels.shape)
+        if self.mapped:
+            self.__mappedPbo = pbo
+        else:
+            np.copyto(self.pixels, pixels)
+            pbo.unmap()
+            pixels = self.pixels
+        self.__pending -= 1
+        # Buff is indexed by x first
+        self.buff.setBuffView(pixels.transpose(1, 0, 2))
+        return self.buff
+
+
+def topDownRows(buff: Buff) -> np.ndarray:
+    """
+    The pixels of a frame as a height x width x 3 array, top row first as image files store them
+    """
+    return buff.buff.transpose(1, 0, 2)[::-1]
+
+
+class PNGSequenceWriter:
+    """
+    Writes each frame to its own numbered PNG file
+    """
+    directory = None
+    pattern = "frame_%05d.png"
+    count = 0  # number of frames written
+
+    def __init__(self, directory: str, pattern: str = None):
+        try:
+            # From pip package "Pillow"
+            from PIL import Image
+        except ImportError:
+            raise ImportError("Required dependency Pillow not present")
+        self.__image = Image
+        self.directory = directory
+        if pattern is not None:
+            self.pattern = pattern
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, buff: Buff):
+        path = os.path.join(self.directory, self.pattern % self.count)
+        self.__image.fromarray(np.ascontiguousarray(topDownRows(buff))).save(path)
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class RawVideoWriter:
+    """
+    Writes the frames one after the other as raw rgb24 pixels, top row first, e.g. to pipe them into a video
+    encoder:
+
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x480 -r 60 -i - out.mp4
+    """
+    stream = None  # BinaryIO
+    count = 0  # number of frames written
+
+    __owned = False  # whether close closes the stream
+
+    def __init__(self, path: str):
+        """
+        :param path: file to write to, "-" for the standard output
+        """
+        if path == "-":
+            self.stream = sys.stdout.buffer
+        else:
+            self.stream = open(path, "wb")
+            self.__owned = True
+
+    def write(self, buff: Buff):
+        self.stream.write(np.ascontiguousarray(topDownRows(buff)).data)
+        self.count += 1
+
+    def close(self):
+        self.stream.flush()
+        if self.__owned:
+            self.stream.close()
+
+
+class FrameRecorder:
+    """
+    Gives every frame drawn to some writers, through a FrameReader fitted to the size of each frame. Call capture
+    after drawing each frame, before swapping buffers, then close once done.
+    """
+    writers = None  # the writers, each one with write(buff) and close()
+    depth = 2
+    mapped = True
+    reader = None  # FrameReader of the current size
+    count = 0  # number of frames given to the writers
+
+    def __init__(self, writers: List, depth: int = 2, mapped: bool = True):
+        self.writers = list(writers)
+        self.depth = depth
+        self.mapped = mapped
+
+    def capture(self, width: int, height: int):
+        """
+        Read the frame just drawn, of this size, and write the frame read depth - 1 frames ago
+        """
+        if self.reader is not None and (self.reader.width, self.reader.height) != (width, height):
+            self.__flush()
+        if self.reader is None:
+            self.reader = FrameReader(width, height, self.depth, self.mapped)
+        buff = self.reader.read()
+        if buff is not None:
+            self.__write(buff)
+
+    def close(self):
+        """
+        Write the frames still in the ring, and close the writers
+        """
+        self.__flush()
+        for writer in self.writers:
+            writer.close()
+
+    def __flush(self):
+        if self.reader is None:
+            return
+        for buff in self.reader.flush():
+            self.__write(buff)
+        self.reader = None
+
+    def __write(self, buff: Buff):
+        for writer in self.writers:
+            writer.write(buff)
+        self.count += 1
@@ -20,38 +20,42 @@ from Displayable import Displayable
 from Quaternion import Quaternion
 from GLUtility import GLUtility
 from GLBuffer import Texture
+from SceneGraph import SceneGraph
 
-try:
-    import OpenGL
 
-    try:
-        import OpenGL.GL as gl
-        import OpenGL.GLU as glu
-    except ImportError:
-        from ctypes import util
+class TransformAttribute:
+    """
+    An attribute of Component making up its local transform. Assigning it marks the local transform dirty, so the
+    next update recomputes it, see SceneGraph.
+    """
+    name = None
+    default = None
 
-        orig_util_find_library = util.find_library
+    def __init__(self, default=None):
+        self.default = default
 
+    def __set_name__(self, owner, name):
+        self.name = "_" + name
 
-        def new_util_find_library(name):
-            res = orig_util_find_library(name)
-            if res:
-                return res
-            return '/System/Library/Frameworks/' + name + '.framework/' + name
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance.__dict__.get(self.name, self.default)
 
-
-        util.find_library = new_util_find_library
-        import OpenGL.GL as gl
-        import OpenGL.GLU as glu
-except ImportError:
-    raise ImportError("Required dependency PyOpenGL not present")
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+        instance.localDirty = True
 
 
 class Component:
     children = None  # list
+    parentComponent = None  # the component this one is a child of
 
     # the homogeneous transformation matrix for the current joint
     transformationMat = None
+    # the transformation relative to the parent, kept while none of the attributes it is made of changes
+    localMat = None
+    localDirty = True
 
     # a instance of class which inherit from Displayable
     # if this class is used as skeleton, then keep this empty
@@ -60,34 +64,43 @@ class Component:
     default_color = None  # ColorType
     current_color = None  # ColorType
     defaultPos = None  # Point
-    currentPos = None  # Point
+    currentPos = TransformAttribute()  # Point
 
     uAxis = None  # list<float>(3): local basis u
     vAxis = None  # list<float>(3): local basis v
     wAxis = None  # list<float>(3): local basis w
     default_uAngle = 0.0
-    uAngle = 0.0
+    uAngle = TransformAttribute(0.0)
     uRange = None  # list<float>(2)
     default_vAngle = 0.0
-    vAngle = 0.0
+    vAngle = TransformAttribute(0.0)
     vRange = None  # list<float>(2)
     default_wAngle = 0.0
-    wAngle = 0.0
+    wAngle = TransformAttribute(0.0)
     wRange = None  # list<float>(2)
     axisBucket = None
 
     defaultScaling = None
-    currentScaling = None
+    currentScaling = TransformAttribute()
 
-    preRotationMat = None
-    postRotationMat = None
+    preRotationMat = TransformAttribute()
+    postRotationMat = TransformAttribute()
+    # fixed transform between the parent and this component, left by the components baked away in between, see
+    # StaticBatch
+    parentOffsetMat = TransformAttribute()
+    inRotation = TransformAttribute()
+    outRotation = TransformAttribute()
 
     texture = None
     textureOn = False
 
     glUtility = None
 
-    quat = None
+    quat = TransformAttribute()
+
+    sceneGraph = None  # SceneGraph of the tree under this component, compiled on the first update
+
+    lodLevel = 0  # level of detail chosen for the tree under this component, see LOD
 
     def __init__(self, position, display_obj=None):
         """
@@ -133,6 +146,7 @@ class Component:
         self.postRotationMat = np.identity(4)
         self.inRotation = np.identity(4)
         self.outRotation = np.identity(4)
+        self.parentOffsetMat = np.identity(4)
         self.texture = Texture()
 
     def addChild(self, child):
@@ -149,6 +163,20 @@ class Component:
         # prevent the duplicate child to be added to the self.children
         if child not in self.children:
             self.children.append(child)
+            child.parentComponent = self
+            SceneGraph.invalidate()
+
+    def removeChild(self, child):
+        """
+        Remove a child from this Component child list.
+
+        :param child: The child Component to be removed
+        :type child: Component
+        :return: None
+        """
+        self.children.remove(child)
+        child.parentComponent = None
+        SceneGraph.invalidate()
 
     def clear(self):
         """
@@ -158,6 +186,7 @@ class Component:
             c.clear()
             self.children.remove(c)
             del c
+        SceneGraph.invalidate()
 
     def initialize(self):
         """
@@ -166,29 +195,65 @@ class Component:
 
         :return: None
         """
+        self.initializeDisplay()
+
+        # use init value to generate transformation matrix for all children
+        self.update()
+
+    def initializeDisplay(self):
+        """
+        Initialize the Displayable objects of this component and all its children, without updating transforms
+        """
         if isinstance(self.displayObj, Displayable):
             self.displayObj.initialize()
 
         for c in self.children:
-            c.initialize()
-
-        # use init value to generate transformation matrix for all children
-        self.update()
+            c.initializeDisplay()
 
     def draw(self, shaderProg: GLProgram):
-        shaderProg.setMat4("modelMat", self.transformationMat.transpose())
+        self.drawSelf(shaderProg)
+
+        for c in self.children:
+            c.draw(shaderProg)
+
+    def drawSelf(self, shaderProg: GLProgram):
+        """
+        Draw this component only, without its children
+        """
+        modelMat = self.modelMatrix()
+        shaderProg.setMat4("modelMat", modelMat.transpose())
+        if shaderProg.hasUniform("normalMat"):
+            shaderProg.setMat3("normalMat", GLUtility.normalMatrix(modelMat))
         shaderProg.setVec3("currentColor", self.current_color)
         if isinstance(self.displayObj, Displayable):
+            shaderProg.setBool("vertexColorOn", self.displayObj.vertexColors)
+            # GLProgram and Texture skip the calls that would not change the GL state
             if self.textureOn:
-                shaderProg.use()
-                self.texture.bind(shaderProg.getUniformLocation("textureImage"))
+                shaderProg.setInt("textureImage", self.texture.bind())
             else:
-                shaderProg.use()
-                self.texture.unbind(shaderProg.getUniformLocation("textureImage"))
+                shaderProg.setInt("textureImage", self.texture.unbind())
             self.displayObj.draw()
 
-        for c in self.children:
-            c.draw(shaderProg)
+    def modelMatrix(self):
+        """
+        The matrix applied to the vertices of displayObj, transformationMat unless the mesh needs more
+        """
+        return self.transformationMat
+
+    def boundingSphere(self):
+        """
+        World center and radius of a sphere containing what this component draws, None if it has nothing to bound.
+        Transforms should be up to date.
+        """
+        if self.displayObj is None or self.transformationMat is None:
+            return None
+        sphere = self.displayObj.boundingSphere()
+        if sphere is None:
+            return None
+        center, radius = sphere
+        modelMat = self.modelMatrix()
+        center = modelMat[:3, :3] @ center + modelMat[:3, 3]
+        return center, radius * np.linalg.norm(modelMat[:3, :3], axis=0).max()
 
     def update(self, parentTransformationMat=None):
         """
@@ -196,32 +261,16 @@ class Component:
         all matrix are stored in column-major order
         Must be called after any changes made to the instance
 
+        :param parentTransformationMat: transformation of the parent, defaults to the current one of
+            parentComponent, or identity for a root
         :return: None
         """
-        if parentTransformationMat is None:
-            parentTransformationMat = np.identity(4)
-
-        translationMat = self.glUtility.translate(*self.currentPos.getCoords(), False)
-
-        # if self.quat is set, use the quaternion as your rotation matrix.
-        # otherwise, use Euler angles with rotation extents, etc.
-        # this means that quaternions will always override the settings for Euler angles
-
-        if self.quat != None:
-            rotationMatU = self.quat.toMatrix().transpose()
-            rotationMatV = np.identity(4)
-            rotationMatW = np.identity(4)
-        else:
-            rotationMatU = self.glUtility.rotate(self.uAngle, self.uAxis, False)
-            rotationMatV = self.glUtility.rotate(self.vAngle, self.vAxis, False)
-            rotationMatW = self.glUtility.rotate(self.wAngle, self.wAxis, False)
-        scalingMat = self.glUtility.scale(*self.currentScaling, False)
-
-        self.transformationMat = parentTransformationMat @ translationMat @ self.postRotationMat @ self.outRotation @ rotationMatU @ rotationMatV @ \
-                                 rotationMatW @ self.inRotation @ self.preRotationMat @ scalingMat
-
-        for c in self.children:
-            c.update(self.transformationMat)
+        if parentTransformationMat is None and self.parentComponent is not None:
+            parentTransformationMat = self.parentComponent.transformationMat
+        # the whole subtree is evaluated at once, and only what changed is computed again, see SceneGraph
+        if self.sceneGraph is None:
+            self.sceneGraph = SceneGraph(self)
+        self.sceneGraph.update(parentTransformationMat)
 
     def rotate(self, degree, axis):
         """
@@ -489,18 +538,21 @@ class Component:
             raise TypeError("axis should have the same size as the current one")
         for i in range(len(u)):
             self.uAxis[i] = u[i]
+        self.localDirty = True
 
     def setV(self, v):
         if len(v) != len(self.vAxis):
             raise TypeError("axis should have the same size as the current one")
         for i in range(len(v)):
             self.vAxis[i] = v[i]
+        self.localDirty = True
 
     def setW(self, w):
         if len(w) != len(self.wAxis):
             raise TypeError("axis should have the same size as the current one")
         for i in range(len(w)):
             self.wAxis[i] = w[i]
+        self.localDirty = True
 
     def setQuaternion(self, q):
         """ sets a quaternion for rotation """
@@ -0,0 +1,420 @@
+"""
+Structure-of-arrays storage for every creature in the tank, with a batched version of CS680PA3.stepForward.
+
+Row i of every array describes creatures[i]. Rows are kept in the same order as Vivarium.components (sorted by
+food chain level, most junior first), and the batched step gives the same result as the per-creature path, which
+steps the creatures one after the other in that order: every creature sees the new step vector of the ones stepped
+before it, and visits its neighbours in the same order, accumulating exactly the same forces. Creatures only eat
+more junior ones, stepped before them, so every creature eaten has had its turn, and it still pushes the ones
+stepped after it until the end of the tick.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from Potential import d_gravity, d_dist, d_wall, normalize, reflect, length, turn
+from SimClock import DEFAULT_DT
+from SpatialHash import SpatialHash
+
+
+class CreatureStore:
+    """
+    Contiguous NumPy arrays holding the simulation state of all creatures:
+
+        * positions(N x 3): current position of the creature, relative to the tank
+        * step_vectors(N x 3): unit vector the creature is currently moving along
+        * speeds(N): distance travelled per second
+        * radii(N): boundary radius used for collisions and wall reflection
+        * centers(N x 3): boundary center, relative to the position
+        * levels(N): food chain level, the smaller number represents the higher level
+        * drifting(N): creatures which do not steer and only sink along their step vector, like Food
+    """
+    creatures = None  # list<CS680PA3>
+
+    # Creatures further apart than this ignore each other's boids forces, and only the pairs found through the
+    # SpatialHash are evaluated. Creatures close enough to collide are always paired, whatever the radius.
+    # None evaluates every pair, which is exactly the per-creature CS680PA3.stepForward. A radius is an approximation:
+    # the gravity between creatures of the same level tends to a constant with the distance instead of vanishing, so
+    # the creatures beyond it would still have pulled each other.
+    interaction_radius: Optional[float] = None
+    grids = None  # dict<float, SpatialHash>, keyed by search radius
+
+    __size = 0
+    __positions = None
+    __step_vectors = None
+    __speeds = None
+    __radii = None
+    __centers = None
+    __levels = None
+    __drifting = None
+
+    def __init__(self, capacity: int = 16, interaction_radius: Optional[float] = None):
+        self.creatures = []
+        self.interaction_radius = interaction_radius
+        self.grids = {}
+        self.__size = 0
+        self.__allocate(max(1, capacity))
+
+    def __len__(self):
+        return self.__size
+
+    def __contains__(self, creature):
+        return any(c is creature for c in self.creatures)
+
+    def __allocate(self, capacity: int):
+        n = self.__size
+
+        def grow(old, shape, dtype):
+            new = np.zeros(shape, dtype=dtype)
+            if old is not None:
+                new[:n] = old[:n]
+            return new
+
+        self.__positions = grow(self.__positions, (capacity, 3), np.float64)
+        self.__step_vectors = grow(self.__step_vectors, (capacity, 3), np.float64)
+        self.__speeds = grow(self.__speeds, (capacity,), np.float64)
+        self.__radii = grow(self.__radii, (capacity,), np.float64)
+        self.__centers = grow(self.__centers, (capacity, 3), np.float64)
+        self.__levels = grow(self.__levels, (capacity,), np.int64)
+        self.__drifting = grow(self.__drifting, (capacity,), np.bool_)
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self.__positions[:self.__size]
+
+    @property
+    def step_vectors(self) -> np.ndarray:
+        return self.__step_vectors[:self.__size]
+
+    @property
+    def speeds(self) -> np.ndarray:
+        return self.__speeds[:self.__size]
+
+    @property
+    def radii(self) -> np.ndarray:
+        return self.__radii[:self.__size]
+
+    @property
+    def centers(self) -> np.ndarray:
+        return self.__centers[:self.__size]
+
+    @property
+    def levels(self) -> np.ndarray:
+        return self.__levels[:self.__size]
+
+    @property
+    def drifting(self) -> np.ndarray:
+        return self.__drifting[:self.__size]
+
+    def indexOf(self, creature) -> int:
+        for i, c in enumerate(self.creatures):
+            if c is creature:
+                return i
+        raise ValueError("creature is not in this store")
+
+    def add(self, creature) -> int:
+        """
+        Add a creature, keeping the rows sorted by food chain level the same way Vivarium sorts its components.
+
+        :param creature: the creature to add, any object with the CS680PA3 simulation attributes
+        :return: the row of the new creature
+        """
+        if self.__size == len(self.__speeds):
+            self.__allocate(2 * len(self.__speeds))
+
+        # a stable sort puts the new creature after every creature with the same level
+        index = int(np.count_nonzero(self.levels >= creature.food_chain_level))
+        n = self.__size
+        for arr in (self.__positions, self.__step_vectors, self.__speeds, self.__radii,
+                    self.__centers, self.__levels, self.__drifting):
+            arr[index + 1:n + 1] = arr[index:n]
+        self.creatures.insert(index, creature)
+        self.__size += 1
+        self.refresh(creature, index)
+        return index
+
+    def remove(self, creature) -> None:
+        index = self.indexOf(creature)
+        n = self.__size
+        for arr in (self.__positions, self.__step_vectors, self.__speeds, self.__radii,
+                    self.__centers, self.__levels, self.__drifting):
+            arr[index:n - 1] = arr[index + 1:n]
+        del self.creatures[index]
+        self.__size -= 1
+
+    def refresh(self, creature, index: int = None) -> None:
+        """
+        Copy the simulation state of a creature into its row.
+        Call this after changing a creature's position, scale or step vector outside of the store.
+        """
+        if index is None:
+            index = self.indexOf(creature)
+        self.__positions[index] = creature.currentPos.coords
+        self.__step_vectors[index] = creature.step_vector.coords
+        self.__speeds[index] = creature.speed
+        self.__radii[index] = creature.boundary_radius
+        self.__centers[index] = creature.boundary_center.coords
+        self.__levels[index] = creature.food_chain_level
+        self.__drifting[index] = creature.drifting
+
+    def stepForward(self, tank_dimensions: List[float], dt: float = DEFAULT_DT) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched CS680PA3.stepForward for every creature, in row order as Vivarium.objectUpdate steps them. Step
+        vectors are updated and positions are moved in place.
+
+        :param tank_dimensions: the size of the tank
+        :param dt: length of the tick, in seconds
+        :return: the step taken by each creature (N x 3), and a mask of the creatures that have been eaten
+        """
+        n = self.__size
+        if n == 0:
+            return np.zeros((0, 3)), np.zeros(0, dtype=np.bool_)
+
+        tank_dimensions = np.array(tank_dimensions, dtype=np.float64)
+        positions = self.positions
+        step_vectors = self.step_vectors
+        distances = self.speeds[:, None] * dt
+        radii = self.radii[:, None]
+        levels = self.levels
+        drifting = self.drifting
+
+        hit_test_pos = positions + self.centers + step_vectors * distances
+        new_step_vectors = step_vectors.copy()
+
+        # reflect when the object is near hit the tank.
+        # this is the highest priority. If hit, we no longer do any more test.
+        out_of_tank = (hit_test_pos > tank_dimensions / 2 - radii) | (hit_test_pos < -tank_dimensions / 2 + radii)
+        out_of_tank[drifting] = False
+        new_step_vectors[out_of_tank] *= -1
+        hit = out_of_tank.any(axis=1)
+        steering = ~(hit | drifting)
+
+        eaten = np.zeros(n, dtype=np.bool_)
+        rows = np.flatnonzero(steering)
+        if len(rows) > 0:
+            overall_velocity = np.zeros((n, 3))
+            # we add the potential functions for the walls, to avoid objects run towards the tank walls
+            overall_velocity[rows] -= d_wall(tank_dimensions, hit_test_pos[rows]) * 0.09
+
+            # the most junior level every creature can see, not counting itself
+            top = levels.max()
+            second = levels[levels != top].max(initial=np.iinfo(levels.dtype).min)
+            most_junior_level = np.where((levels == top) & (np.count_nonzero(levels == top) == 1), second, top)
+
+            # every (creature, neighbour) pair, creature-major and neighbour in store order. A neighbour may be seen
+            # up to two steps away from where it is looked for, once it has turned around
+            i, j = self._neighbourPairs(tank_dimensions, hit_test_pos, rows, 2 * distances.max())
+            self._orderedSteering(hit_test_pos, new_step_vectors, overall_velocity, most_junior_level, rows,
+                                  np.flatnonzero(hit), i, j, eaten, dt)
+
+        steps = new_step_vectors * distances
+        # drifting creatures rest once they reach the bottom of the tank
+        resting = drifting & (hit_test_pos[:, 1] < -tank_dimensions[1] / 2.162 + radii[:, 0])
+        steps[resting] = 0
+
+        step_vectors[:] = new_step_vectors
+        positions += steps
+        return steps, eaten
+
+    def _orderedSteering(self,
+                         hit_test_pos: np.ndarray,
+                         new_step_vectors: np.ndarray,
+                         overall_velocity: np.ndarray,
+                         most_junior_level: np.ndarray,
+                         rows: np.ndarray,
+                         hit_rows: np.ndarray,
+                         i: np.ndarray,
+                         j: np.ndarray,
+                         eaten: np.ndarray,
+                         dt: float) -> None:
+        """
+        Steer the creatures in rows as if one after the other in row order, as Vivarium.objectUpdate does: a creature
+        sees the ones stepped before it moving along their new step vector, and the others along their old one. The
+        creatures reflected by the walls (hit_rows) take their turn in the same order. The new step vectors are
+        written to new_step_vectors, and eaten is set for every creature eaten.
+
+        Creatures that are not neighbours do not see each other, so they are stepped together in waves, see _waves.
+        """
+        n = self.__size
+        step_vectors = self.step_vectors
+        moved = self.positions + self.centers
+        distances = self.speeds[:, None] * dt
+        kinds = self._pairKinds(self.radii, self.levels, most_junior_level, i, j)
+        # where every creature is seen by the others, updated as soon as it has had its turn
+        seen = hit_test_pos.copy()
+        # eaten before its turn, such a creature neither moves nor eats any more
+        lost_turn = np.zeros(n, dtype=np.bool_)
+
+        steering = np.zeros(n, dtype=np.bool_)
+        steering[rows] = True
+        turning = steering.copy()
+        turning[hit_rows] = True
+        wave = self._waves(steering, turning, i, j)
+        # the pairs of each wave, still sorted by creature and then by neighbour
+        pair_order = np.argsort(wave[i], kind="stable")
+        pair_bounds = np.searchsorted(wave[i][pair_order], np.arange(wave.max() + 2))
+        row_order = np.argsort(wave, kind="stable")
+        row_bounds = np.searchsorted(wave[row_order], np.arange(wave.max() + 2))
+
+        for w in range(wave.max() + 1):
+            pairs = pair_order[pair_bounds[w]:pair_bounds[w + 1]]
+            pairs = pairs[~lost_turn[i[pairs]]]
+            velocity, eat = self._pairForces(seen, step_vectors, tuple(kind[pairs] for kind in kinds), i[pairs],
+                                             j[pairs])
+            # accumulate neighbour by neighbour, in the same order as the per-creature loop
+            np.add.at(overall_velocity, np.repeat(i[pairs], 2), velocity.reshape(-1, 3))
+            eaters, prey = i[pairs][eat], j[pairs][eat]
+            eaten[prey] = True
+            lost_turn[prey[prey > eaters]] = True
+
+            turned = row_order[row_bounds[w]:row_bounds[w + 1]]
+            turned = turned[~lost_turn[turned]]
+            steered = turned[steering[turned]]
+            # the steering weights give the turn of a tick of DEFAULT_DT, kept as a turn rate whatever dt
+            new_step_vectors[steered] = turn(step_vectors[steered],
+                                             normalize(step_vectors[steered] + overall_velocity[steered]),
+                                             dt / DEFAULT_DT)
+            seen[turned] = moved[turned] + new_step_vectors[turned] * distances[turned]
+        new_step_vectors[lost_turn] = step_vectors[lost_turn]
+
+    @staticmethod
+    def _waves(steering: np.ndarray, turning: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """
+        Group the turns of the creatures into waves that can be stepped together. Of two neighbours, the one stepped
+        first in row order has its turn in an earlier wave when the other one sees its new step vector, or when it
+        must still see the other one's old step vector, i.e. whenever one of them steers.
+
+        :param steering: mask of the creatures steering from their neighbours, which also change their step vector
+        :param turning: mask of the creatures changing their step vector during their turn
+        :param i, j: every neighbour j of the steering creatures i, see _neighbourPairs
+        :return: the wave of every creature, -1 for those whose turn does not matter to the others
+        """
+        n = len(steering)
+        # every pair once, from the creature stepped first to the other
+        keep = turning[j] & ((j < i) | ~steering[j])
+        first, second = np.minimum(i[keep], j[keep]), np.maximum(i[keep], j[keep])
+        order = np.argsort(first, kind="stable")
+        first, second = first[order], second[order]
+        starts = np.searchsorted(first, np.arange(n + 1))
+
+        # peel the creatures with no earlier neighbour left, layer after layer
+        waiting = np.bincount(second, minlength=n)
+        wave = np.full(n, -1, dtype=np.int64)
+        layer = np.flatnonzero(turning & (waiting == 0))
+        w = 0
+        while len(layer) > 0:
+            wave[layer] = w
+            count = starts[layer + 1] - starts[layer]
+            total = int(count.sum())
+            if total == 0:
+                break
+            # expand the [start, start + count) range of every creature into one array of pairs
+            offsets = np.cumsum(count) - count
+            nexts = second[np.repeat(starts[layer] - offsets, count) + np.arange(total)]
+            waiting -= np.bincount(nexts, minlength=n)
+            ready = np.zeros(n, dtype=np.bool_)
+            ready[nexts[waiting[nexts] == 0]] = True
+            layer = np.flatnonzero(ready)
+            w += 1
+        return wave
+
+    def _neighbourPairs(self,
+                        tank_dimensions: np.ndarray,
+                        hit_test_pos: np.ndarray,
+                        rows: np.ndarray,
+                        margin: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The neighbours of every creature in rows, as two index arrays sorted by creature and then by neighbour.
+
+        :param margin: how much further apart the creatures may be seen by the time they interact
+        """
+        if self.interaction_radius is None:
+            i, j = np.meshgrid(rows, np.arange(self.__size), indexing="ij")
+            i, j = i.ravel(), j.ravel()
+            keep = i != j
+            return i[keep], j[keep]
+
+        # Two creatures collide when their distance is below the sum of their radii, which is at most twice the
+        # larger radius. Every creature looks for neighbours within twice its own radius, and the pairs found are
+        # made symmetric, so one big creature does not make every small one search a large neighbourhood.
+        radii = self.radii
+        search = np.maximum(self.interaction_radius, 2 * radii) + margin
+
+        # one grid per search radius, so every query only looks at a cell and its 26 neighbours
+        grids = {}
+        found_i, found_j = [], []
+        for radius in np.unique(search).tolist():
+            grid = self.grids.get(radius)
+            if grid is None or not np.array_equal(grid.origin, -tank_dimensions / 2):
+                grid = SpatialHash(tank_dimensions, radius)
+            grid.rebuild(hit_test_pos)
+            grids[radius] = grid
+            i, j = grid.pairs(radius, np.flatnonzero(search == radius))
+            found_i += [i, j]
+            found_j += [j, i]
+        self.grids = grids
+
+        n = self.__size
+        keys = np.sort(np.concatenate(found_i) * n + np.concatenate(found_j))
+        keys = keys[np.diff(keys, prepend=-1) != 0]
+        i, j = keys // n, keys % n
+        wanted = np.zeros(n, dtype=np.bool_)
+        wanted[rows] = True
+        keep = wanted[i]
+        return i[keep], j[keep]
+
+    @staticmethod
+    def _pairKinds(radii: np.ndarray,
+                   levels: np.ndarray,
+                   most_junior_level: np.ndarray,
+                   i: np.ndarray,
+                   j: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        What creature i does with its neighbour j, for a list of pairs. It does not change during a step.
+
+        :return: the distance under which they collide, whether they are of the same level, whether i chases j and
+            whether i escapes j, and where the gravity between them crosses 0
+        """
+        reach = radii[i] + radii[j]
+        same_level = levels[i] == levels[j]
+        chase = (levels[i] < levels[j]) & (levels[j] == most_junior_level[i])
+        escape = levels[i] > levels[j]
+        gravity = 0.5 * 3 * radii[i, None]
+        return reach, same_level, chase, escape, gravity
+
+    @staticmethod
+    def _pairForces(hit_test_pos: np.ndarray,
+                    step_vectors: np.ndarray,
+                    kinds: Tuple[np.ndarray, ...],
+                    i: np.ndarray,
+                    j: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Interaction of creature i with its neighbour j, for a list of pairs.
+
+        :param kinds: the kinds of the pairs, see _pairKinds
+        :return: a (M x 2 x 3) array with the collision reflection and the boids velocity of every pair, and a mask
+            of the pairs where i eats j
+        """
+        reach, same_level, chase, escape, gravity = kinds
+        dist_vec = hit_test_pos[j] - hit_test_pos[i]
+        dist = length(dist_vec)[:, 0]
+        collide = dist < reach
+
+        velocity = np.zeros((len(i), 2, 3))
+
+        # Collision, if the food chain level is equal
+        bounce = collide & same_level
+        velocity[bounce, 0] = reflect(step_vectors[i[bounce]], dist_vec[bounce]) * 0.3
+        # only can kill the creature when the food is the least level
+        eat = collide & chase
+
+        # boids movement
+        x = hit_test_pos[i] - hit_test_pos[j]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # mimic universal gravity
+            velocity[same_level, 1] = -d_gravity(gravity[same_level], 0.5, x[same_level]) * 0.01
+        # chasing
+        velocity[chase, 1] = d_dist(x[chase]) * 0.05
+        # escaping
+        velocity[escape, 1] = -d_dist(x[escape]) * 0.04
+        return velocity, eat
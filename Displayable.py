@@ -12,6 +12,8 @@ class Displayable:
     """
     callListHandle = 0
     parent = None  # parent class, used for SetCurrent
+    # whether the colors come from the vertices instead of the component's current color
+    vertexColors = False
 
     def __init__(self):
         pass
@@ -21,3 +23,15 @@ class Displayable:
 
     def initialize(self):
         raise NotImplementedError
+
+    def setLODLevel(self, level):
+        """
+        Switch to a level of detail, see LOD. Displayables with a single level ignore it.
+        """
+        pass
+
+    def boundingSphere(self):
+        """
+        Center and radius of a sphere containing what is drawn, in the space of the model matrix, None if unknown
+        """
+        return None
@@ -13,10 +13,10 @@ from typing import Union, List, Tuple
 from GLProgram import GLProgram
 from Point import Point
 from Displayable import Displayable
-from GLBuffer import VAO, VBO, EBO
+from MeshCache import MeshCache, SharedMesh
+import LOD
 import numpy as np
 import ColorType
-from collada import *
 
 try:
     import OpenGL
@@ -54,46 +54,55 @@ class DisplayableMesh(Displayable):
     indices = None  # stores triangle indices to vertices
 
     defaultColor = None
+    scale = None  # applied with the model matrix, see Shape.modelMatrix
+
+    meshKey = None  # meshes with the same key share their buffers, see MeshCache
+    sharedMesh = None
+
+    # (vertexData, indexData, meshKey) of each level of detail the mesh has, the most detailed first, see LOD
+    levels = None
+    levelIds = None  # the level each of them is used from
+    lodLevel = 0  # index in levels of the mesh drawn
+    sharedMeshes = None  # uploaded mesh of each level
+    localSphere = None  # bounding sphere of the most detailed level, computed when first needed
 
     def __init__(self,
                  shaderProg: GLProgram,
                  scale: Union[List[float], Tuple[float, float, float], np.ndarray],
                  vertexData,
                  indexData,
-                 color: ColorType.ColorType = ColorType.BLUE):
+                 color: ColorType.ColorType = ColorType.BLUE,
+                 meshKey=None,
+                 vertexColors: bool = False,
+                 lodLevels=None):
         """
         :param shaderProg: compiled shader program
         :type shaderProg: GLProgram
         :param scale: set of three scale factors to be applied to each vertex
         :type scale: list or tuple
-        :param filename: .dae file to import
-        :type filename: string
+        :param vertexData: unscaled vertices, 11 floats each. They are not modified
+        :param indexData: triangle indices
         :param color: vertex color to be applied uniformly
         :type color: ColorType
+        :param meshKey: key to share the uploaded data with every mesh having the same key, None to keep it private
+        :param vertexColors: shade with the colors stored in vertexData instead of the component's color
+        :param lodLevels: (vertexData, indexData, meshKey) of the coarser levels of detail, finest first, None for a
+            level the mesh does not have. Without them the mesh has a single level
         """
         super(DisplayableMesh, self).__init__()
         assert(len(scale) == 3)
 
         self.defaultColor = np.array(color.getRGB())
+        self.scale = np.array(scale, dtype=np.float64)
 
         self.shaderProg = shaderProg
         self.shaderProg.use()
 
-        self.vao = VAO()
-        self.vbo = VBO()  # vbo can only be initiate with glProgram activated
-        self.ebo = EBO()
-
         self.indices = indexData
         self.vertices = vertexData
-
-        for i in range(len(self.vertices) // 11):
-            i = i * 11
-            self.vertices[i] = self.vertices[i] * scale[0]
-            self.vertices[i + 1] = self.vertices[i + 1] * scale[1]
-            self.vertices[i + 2] = self.vertices[i + 2] * scale[2]
-            self.vertices[i + 5] = self.defaultColor[0]
-            self.vertices[i + 6] = self.defaultColor[1]
-            self.vertices[i + 7] = self.defaultColor[2]
+        self.meshKey = meshKey
+        self.vertexColors = vertexColors
+        self.levels, self.levelIds = LOD.presentLevels((vertexData, indexData, meshKey), lodLevels)
 
     def draw(self):
         self.vao.bind()
@@ -102,22 +111,40 @@ class DisplayableMesh(Displayable):
 
     def initialize(self):
         """
-        Remember to bind VAO before this initialization. If VAO is not bind, program might throw an error
-        in systems that don't enable a default VAO after GLProgram compilation
+        Upload every level of the mesh, unless another mesh with the same key already did
         """
-        self.vao.bind()
-        self.vbo.setBuffer(self.vertices, 11)
-        self.ebo.setBuffer(self.indices)
-        
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexPos"),
-                                  stride=11, offset=0, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexNormal"),
-                                  stride=11, offset=3, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexColor"),
-                                  stride=11, offset=6, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexTexture"),
-                                  stride=11, offset=9, attribSize=2)
-
-
-        self.vao.unbind()
+        self.sharedMeshes = []
+        for vertices, indices, meshKey in self.levels:
+            if meshKey is None:
+                sharedMesh = SharedMesh(vertices, indices)
+            else:
+                sharedMesh = MeshCache.get(meshKey, vertices, indices)
+            sharedMesh.getVAO(self.shaderProg)
+            self.sharedMeshes.append(sharedMesh)
+        self.setLODLevel(self.levelIds[self.lodLevel])
+
+    def setLODLevel(self, level):
+        """
+        Draw from another level of detail, or from the finer level drawn in its place if the mesh does not have it
+        """
+        self.lodLevel = LOD.levelIndex(self.levelIds, level)
+        if self.sharedMeshes is None:
+            return
+        self.sharedMesh = self.sharedMeshes[self.lodLevel]
+        self.vbo = self.sharedMesh.vbo
+        self.ebo = self.sharedMesh.ebo
+        self.vao = self.sharedMesh.getVAO(self.shaderProg)
+
+    def levelData(self, level: int):
+        """
+        (vertexData, indexData, meshKey) of the mesh drawn at a level of detail
+        """
+        return self.levels[LOD.levelIndex(self.levelIds, level)]
 
+    def boundingSphere(self):
+        """
+        Bounding sphere of the most detailed level, unscaled like the vertices
+        """
+        if self.localSphere is None:
+            self.localSphere = LOD.boundingSphere(self.vertices)
+        return self.localSphere
@@ -10,6 +10,7 @@ modified by Daniel Scrivener 08/2022
 
 
 from Point import Point
+from SimClock import DEFAULT_DT
 from typing import *
 
 
@@ -38,22 +39,26 @@ class EnvironmentObject:
         if isinstance(a, EnvironmentObject):
             self.env_obj_list.remove(a)
 
-    def animationUpdate(self):
+    def animationUpdate(self, dt=DEFAULT_DT):
         """
-        Perform the next frame of this environment object's animation.
+        Perform the next tick of this environment object's animation.
+
+        :param dt: length of the tick, in seconds
         """
         pass
 
     def stepForward(self,
                     components,
                     tank_dimensions,
-                    vivarium) -> Tuple[Point,
-                                       Optional[List["EnvironmentObject"]]]:
+                    vivarium,
+                    dt=DEFAULT_DT) -> Tuple[Point,
+                                            Optional[List["EnvironmentObject"]]]:
         """
 
         :param components:
         :param tank_dimensions:
         :param vivarium:
+        :param dt: length of the tick, in seconds
         :return: The step forward vector, and a list of items to be removed.
         """
         return Point((0, 0, 0)), None
@@ -64,7 +69,7 @@ class EnvironmentObject:
         #   direction in which it swims. Remember that we require your creatures to be movable in 3 dimensions,
         #   so they should be able to face any direction in 3D space.
         
-    def rotateDirection(self):
+    def rotateDirection(self, direction=None):
         """
         change this environment object's orientation from v1 to v2.
         """
@@ -0,0 +1,72 @@
+"""
+View-frustum culling. The six planes of the frustum are extracted from the combined view and projection matrix, and
+each component with a bounding sphere (see Component.boundingSphere), e.g. a creature, is tested against them once
+per frame. A component entirely outside of any plane is skipped along with its whole subtree.
+"""
+from typing import List
+
+import numpy as np
+
+from SceneGraph import SceneGraph
+
+
+class Frustum:
+    """
+    Planes are stored as rows (a, b, c, d) of a 6 x 4 array, normalized so that a * x + b * y + c * z + d is the
+    signed distance of (x, y, z) to the plane, positive inside.
+    """
+    planes = None
+    culled = 0  # number of subtrees skipped by the last visibleComponents
+
+    def __init__(self, viewProjectionMat: np.ndarray):
+        """
+        :param viewProjectionMat: projection @ view in row-major order, taking world points to clip space
+        """
+        m = np.asarray(viewProjectionMat, dtype=np.float64)
+        # left, right, bottom, top, near, far: -w <= x, y, z <= w in clip space
+        planes = np.array([m[3] + m[0], m[3] - m[0],
+                           m[3] + m[1], m[3] - m[1],
+                           m[3] + m[2], m[3] - m[2]])
+        self.planes = planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+    @classmethod
+    def fromCamera(cls, viewMat: np.ndarray, perspMat: np.ndarray) -> "Frustum":
+        """
+        :param viewMat: view matrix in column-major order, see GLUtility.view
+        :param perspMat: projection matrix in column-major order, see GLUtility.perspective
+        """
+        return cls((viewMat @ perspMat).transpose())
+
+    def containsSphere(self, center, radius: float) -> bool:
+        """
+        Whether any part of a sphere may be inside the frustum
+        """
+        distances = self.planes[:, :3] @ np.asarray(center, dtype=np.float64)[:3] + self.planes[:, 3]
+        return bool((distances >= -radius).all())
+
+    def visibleComponents(self, root) -> List:
+        """
+        The components of the tree under root not culled, each parent before its children. The top-most components
+        with a bounding sphere decide for their whole subtree. Transformation matrices should be up to date.
+        """
+        graph = root.sceneGraph if root.sceneGraph is not None else SceneGraph(root)
+        nodes = graph.components()
+        parents = graph.parents
+        # 1 for a node whose subtree is kept, 0 for one whose subtree is culled, -1 while no ancestor decided
+        decided = np.full(len(nodes), -1, dtype=np.int8)
+        visible = []
+        self.culled = 0
+
+        for i, node in enumerate(nodes):
+            parent = parents[i]
+            if parent >= 0 and decided[parent] >= 0:
+                decided[i] = decided[parent]
+            else:
+                sphere = node.boundingSphere()
+                if sphere is not None:
+                    decided[i] = self.containsSphere(*sphere)
+                    if not decided[i]:
+                        self.culled += 1
+            if decided[i] != 0:
+                visible.append(node)
+        return visible
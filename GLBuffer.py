@@ -51,12 +51,13 @@ class VBO:
     def bind(self):
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
 
-    def setBuffer(self, bufferDataArray: np.ndarray, vertexAttribSize: int):
+    def setBuffer(self, bufferDataArray: np.ndarray, vertexAttribSize: int, usage=gl.GL_STATIC_DRAW):
         """
         :param vertexAttribSize: the size of the vertex attribute
         :type vertexAttribSize: int
         :param bufferDataArray: the vertices data. It will be flatten in row-major order if its dimension isn't one
         :type bufferDataArray: numpy.ndarray
+        :param usage: buffer usage hint, use GL_STREAM_DRAW for data uploaded every frame
         """
         # type conversion
         if bufferDataArray.dtype != np.dtype("float32"):
@@ -69,9 +70,9 @@ class VBO:
         byteLength = 4 * bufferSize  # 4 is the size of float32
 
         self.bind()
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, byteLength, bufferData, gl.GL_STATIC_DRAW)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, byteLength, bufferData, usage)
 
-    def setAttribPointer(self, attribLoc, stride=0, offset=0, attribSize=0):
+    def setAttribPointer(self, attribLoc, stride=0, offset=0, attribSize=0, divisor=0):
         attribSize = self.vertexAttribSize if attribSize == 0 else attribSize
         if attribSize == 0:
             raise Exception("Cannot set vertex attrib with empty attribSize")
@@ -87,6 +88,9 @@ class VBO:
         stride *= 4
         gl.glVertexAttribPointer(attribLoc, attribSize, gl.GL_FLOAT, gl.GL_FALSE, stride, offset)
         gl.glEnableVertexAttribArray(attribLoc)
+        # a non-zero divisor advances the attribute once per instance instead of once per vertex
+        if divisor:
+            gl.glVertexAttribDivisor(attribLoc, divisor)
 
     def draw(self):
         gl.glDrawArrays(gl.GL_TRIANGLES, 0, self.vertexNum)
@@ -124,6 +128,9 @@ class EBO:
     def draw(self):
         gl.glDrawElements(gl.GL_TRIANGLES, self.indexNum, gl.GL_UNSIGNED_INT, None)
 
+    def drawInstanced(self, instanceNum):
+        gl.glDrawElementsInstanced(gl.GL_TRIANGLES, self.indexNum, gl.GL_UNSIGNED_INT, None, instanceNum)
+
 class lineEBO:
     """
     A class to handle EBO in OpenGL, with some help functions
@@ -177,6 +184,137 @@ class VAO:
         gl.glBindVertexArray(0)
 
 
+class UBO:
+    """
+    A uniform buffer, bound to a binding point so that every program with a uniform block at that point reads it
+    """
+    ubo = None
+    byteLength = 0
+    bindingPoint = 0
+
+    def __init__(self, byteLength: int, bindingPoint: int):
+        self.ubo = gl.glGenBuffers(1)
+        self.byteLength = byteLength
+        self.bindingPoint = bindingPoint
+
+        self.bind()
+        gl.glBufferData(gl.GL_UNIFORM_BUFFER, byteLength, None, gl.GL_DYNAMIC_DRAW)
+        gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, bindingPoint, self.ubo)
+
+    # def __del__(self):
+    #     gl.glDeleteBuffers(1, self.ubo)
+
+    def bind(self):
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self.ubo)
+
+    def setSubData(self, bufferDataArray: np.ndarray, byteOffset: int = 0):
+        """
+        :param bufferDataArray: the data to write, laid out as the uniform block expects it
+        :param byteOffset: where to write it in the buffer
+        """
+        bufferData = np.ascontiguousarray(bufferDataArray, dtype=np.float32).flatten("C")
+        if byteOffset + bufferData.nbytes > self.byteLength:
+            raise Exception("Data overflows the uniform buffer")
+        self.bind()
+        gl.glBufferSubData(gl.GL_UNIFORM_BUFFER, byteOffset, bufferData.nbytes, bufferData)
+
+
+
+class FBO:
+    """
+    A framebuffer object with a color and a depth renderbuffer, to render without any window
+    """
+    fbo = None
+    colorBuffer = None
+    depthBuffer = None
+    width = 0
+    height = 0
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.fbo = gl.glGenFramebuffers(1)
+        self.colorBuffer, self.depthBuffer = gl.glGenRenderbuffers(2)
+
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.colorBuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, width, height)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.depthBuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_DEPTH_COMPONENT24, width, height)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+
+        self.bind()
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_RENDERBUFFER, self.colorBuffer)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_DEPTH_ATTACHMENT, gl.GL_RENDERBUFFER, self.depthBuffer)
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        self.unbind()
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise Exception(f"Framebuffer incomplete, status {status:#x}")
+
+    # def __del__(self):
+    #     gl.glDeleteFramebuffers(1, self.fbo)
+
+    def bind(self):
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.fbo)
+
+    def unbind(self):
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+
+
+class PBO:
+    """
+    A pixel pack buffer. glReadPixels into it returns at once, the copy happens once the GPU is done with the frame,
+    and the pixels are only waited for when the buffer is mapped
+    """
+    pbo = None
+    byteLength = 0
+
+    def __init__(self, byteLength: int):
+        self.pbo = gl.glGenBuffers(1)
+        self.byteLength = byteLength
+
+        self.bind()
+        gl.glBufferData(gl.GL_PIXEL_PACK_BUFFER, byteLength, None, gl.GL_STREAM_READ)
+        self.unbind()
+
+    # def __del__(self):
+    #     gl.glDeleteBuffers(1, self.pbo)
+
+    def bind(self):
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self.pbo)
+
+    def unbind(self):
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+
+    def readPixels(self, x: int, y: int, width: int, height: int):
+        """
+        Start copying a rectangle of the read framebuffer, as tightly packed RGB bytes, bottom row first
+        """
+        if width * height * 3 > self.byteLength:
+            raise Exception("Pixels overflow the pixel buffer")
+        self.bind()
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+        gl.glReadPixels(x, y, width, height, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        self.unbind()
+
+    def map(self) -> np.ndarray:
+        """
+        Wait for the pixels and map them, valid until unmap
+
+        :return: the bytes of the buffer, without any copy
+        """
+        self.bind()
+        address = gl.glMapBufferRange(gl.GL_PIXEL_PACK_BUFFER, 0, self.byteLength, gl.GL_MAP_READ_BIT)
+        self.unbind()
+        if not address:
+            raise Exception("Cannot map the pixel buffer")
+        # the mapping stays valid once unbound, and other reads of pixels are not redirected into it
+        return np.ctypeslib.as_array((ctypes.c_ubyte * self.byteLength).from_address(address))
+
+    def unmap(self):
+        self.bind()
+        gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+        self.unbind()
+
 # A global variable in this scope to store next texture id, there should be no duplicate textureUnitID
 NextTextureID = 1
 
@@ -187,6 +325,11 @@ class Texture:
     textureName = 0
     textureUnitID = 0
 
+    # texture bound to each texture unit, and the active unit, as last set through this class. Shared by every Texture
+    # since they are GL context state
+    __boundTextures = {}
+    __activeUnit = None
+
     def __init__(self):
         global NextTextureID
 
@@ -205,7 +348,7 @@ class Texture:
         height, width, channel = image.shape
         imageData = image.flatten("C")
 
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureName)
+        self.bindUnit(self.textureUnitID, self.textureName)
         gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGB, width, height, 0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, imageData)
         gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
         self.setTextureParameters()
@@ -217,13 +360,95 @@ class Texture:
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
 
-    def bind(self, glslVariableLoc):
-        gl.glActiveTexture(gl.GL_TEXTURE0 + self.textureUnitID)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureName)
-        gl.glUniform1i(glslVariableLoc, self.textureUnitID)
+    @classmethod
+    def activateUnit(cls, unit):
+        """
+        Make a texture unit active, unless it already is
+        """
+        if cls.__activeUnit != unit:
+            gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+            cls.__activeUnit = unit
+
+    @classmethod
+    def bindUnit(cls, unit, textureName):
+        """
+        Bind textureName to a texture unit, skipping the GL calls for the state that is already set
+        """
+        cls.activateUnit(unit)
+        if cls.__boundTextures.get(unit) != textureName:
+            gl.glBindTexture(gl.GL_TEXTURE_2D, textureName)
+            cls.__boundTextures[unit] = textureName
 
-    def unbind(self, glslVariableLoc):
-        gl.glActiveTexture(gl.GL_TEXTURE0)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
-        gl.glUniform1i(glslVariableLoc, 0)
+    @classmethod
+    def resetState(cls):
+        """
+        Forget the tracked bindings. Call it when the GL context is created again.
+        """
+        cls.__boundTextures = {}
+        cls.__activeUnit = None
+
+    def bind(self, glslVariableLoc=None):
+        """
+        :param glslVariableLoc: location of the sampler to point at this texture's unit, if any. GLProgram.setInt
+            with the unit returned skips redundant updates of the sampler.
+        :return: the texture unit this texture is bound to
+        """
+        self.bindUnit(self.textureUnitID, self.textureName)
+        if glslVariableLoc is not None:
+            gl.glUniform1i(glslVariableLoc, self.textureUnitID)
+        return self.textureUnitID
 
+    def unbind(self, glslVariableLoc=None):
+        """
+        :return: the texture unit left with no texture, 0
+        """
+        self.bindUnit(0, 0)
+        if glslVariableLoc is not None:
+            gl.glUniform1i(glslVariableLoc, 0)
+        return 0
+
+
+class TBO:
+    """
+    A buffer texture: floats uploaded like a VBO and read in the shaders with texelFetch, 4 per texel. It holds
+    arrays too large for uniforms, e.g. the bone matrices of every instance of a skinned mesh
+    """
+    buffer = None
+    textureName = None
+
+    def __init__(self):
+        self.buffer = gl.glGenBuffers(1)
+        self.textureName = gl.glGenTextures(1)
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, self.buffer)
+        gl.glBufferData(gl.GL_TEXTURE_BUFFER, 16, None, gl.GL_STREAM_DRAW)
+        gl.glBindTexture(gl.GL_TEXTURE_BUFFER, self.textureName)
+        gl.glTexBuffer(gl.GL_TEXTURE_BUFFER, gl.GL_RGBA32F, self.buffer)
+        gl.glBindTexture(gl.GL_TEXTURE_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, 0)
+
+    # def __del__(self):
+    #     gl.glDeleteBuffers(1, self.buffer)
+    #     gl.glDeleteTextures(1, self.textureName)
+
+    @staticmethod
+    def maxTexels() -> int:
+        """
+        Most texels a buffer texture can hold on this GL implementation
+        """
+        return int(gl.glGetIntegerv(gl.GL_MAX_TEXTURE_BUFFER_SIZE))
+
+    def setBuffer(self, bufferDataArray: np.ndarray, usage=gl.GL_STREAM_DRAW):
+        """
+        :param bufferDataArray: the data, flatten in row-major order. Its size should be a multiple of 4
+        """
+        bufferData = np.ascontiguousarray(bufferDataArray, dtype=np.float32).reshape(-1)
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, self.buffer)
+        gl.glBufferData(gl.GL_TEXTURE_BUFFER, bufferData.nbytes, bufferData, usage)
+        gl.glBindBuffer(gl.GL_TEXTURE_BUFFER, 0)
+
+    def bind(self, unit: int):
+        """
+        Bind the texture to a texture unit, for the samplerBuffer pointed at that unit
+        """
+        Texture.activateUnit(unit)
+        gl.glBindTexture(gl.GL_TEXTURE_BUFFER, self.textureName)
@@ -33,6 +33,16 @@ except ImportError:
 import numpy as np
 import math
 
+from GLBuffer import UBO
+
+# binding point of the Camera uniform block, the same in every GLProgram
+CAMERA_BLOCK_BINDING = 0
+# size of the bone matrix arrays of skinned programs
+MAX_BONES = 16
+# texels of each bone in the buffer texture of instanced skinned programs: the 4 columns of its matrix, then the 3
+# columns of its normal matrix, padded to 4 floats
+BONE_TEXELS = 7
+
 
 def perspectiveMatrix(angleOfView, near, far):
     result = np.identity(4)
@@ -47,6 +57,45 @@ def perspectiveMatrix(angleOfView, near, far):
     result[3, 3] = 0
 
 
+class CameraBlock:
+    """
+    Per-frame camera state, shared by every GLProgram through the std140 uniform block Camera:
+
+        mat4 projection;  // offset 0
+        mat4 view;        // offset 64
+        vec3 cameraPos;   // offset 128
+        float time;       // offset 140, packed after the vec3
+
+    Matrices are stored as given to GLProgram.setMat4, i.e. already in column-major order.
+    """
+    ubo = None
+    data = None  # the whole block as 36 floats
+
+    def __init__(self):
+        self.data = np.zeros(36, dtype=np.float32)
+        self.ubo = UBO(self.data.nbytes, CAMERA_BLOCK_BINDING)
+
+    def update(self, projectionMat=None, viewMat=None, cameraPos=None, time=None):
+        """
+        Change some of the values and upload the block, with a single glBufferSubData
+
+        :param time: seconds since the scene started
+        """
+        if projectionMat is not None:
+            if projectionMat.shape != (4, 4):
+                raise Exception("Projection Matrix must have 4x4 shape")
+            self.data[0:16] = projectionMat.flatten("C")
+        if viewMat is not None:
+            if viewMat.shape != (4, 4):
+                raise Exception("View Matrix must have 4x4 shape")
+            self.data[16:32] = viewMat.flatten("C")
+        if cameraPos is not None:
+            self.data[32:35] = cameraPos
+        if time is not None:
+            self.data[35] = time
+        self.ubo.setSubData(self.data)
+
+
 class GLProgram:
     program = None
 
@@ -59,11 +108,33 @@ class GLProgram:
 
     ready = False  # a control flag which reflect if this GLprogram is ready
     debug = 0
-
-    def __init__(self) -> None:
+    # take the model matrix and color from per-instance attributes instead of uniforms
+    instanced = False
+    # move each vertex with the bone matrices it is bound to instead of the model matrix. Both together read the bones
+    # of each instance from a buffer texture
+    skinned = False
+    # programs generated with other options, see variant
+    variants = None
+
+    # locations resolved after linking, keyed by GLSL variable name
+    uniformLocations = None
+    attribLocations = None
+    # last value given to each int uniform, keyed by location
+    uniformInts = None
+
+    # the program made current by the last use(). GL has a single current program, shared by every GLProgram
+    __current = None
+
+    def __init__(self, instanced: bool = False, skinned: bool = False) -> None:
         self.program = gl.glCreateProgram()
 
         self.ready = False
+        self.instanced = instanced
+        self.skinned = skinned
+        self.variants = {}
+        self.uniformLocations = {}
+        self.attribLocations = {}
+        self.uniformInts = {}
 
         # define attribs name and corresponding method to set it
         self.attribs = {
@@ -74,14 +145,27 @@ class GLProgram:
 
             "textureImage": "theTexture01",
 
+            "cameraBlock": "Camera",
             "projectionMat": "projection",
             "viewMat": "view",
+            "cameraPos": "cameraPos",
+            "time": "time",
             "modelMat": "model",
+            "normalMat": "normalMatrix",
 
             "vertexJoints": "joint",
             "vertexJointWeights" : "jw",
+            "bones": "bones",
+            "boneNormals": "boneNormals",
 
-            "currentColor": "cColor"
+            "currentColor": "cColor",
+            "vertexColorOn": "useVertexColor",
+
+            "instanceModel": "aInstanceModel",
+            "instanceNormal": "aInstanceNormal",
+            "instanceColor": "aInstanceColor",
+            "instanceBones": "instanceBones",
+            "boneCount": "boneCount"
         }
 
         self.vertexShaderSource = self.genVertexShaderSource()
@@ -105,7 +189,25 @@ class GLProgram:
             raise Exception(info)
         return shader
 
+    def genCameraBlockSource(self):
+        """
+        Declaration of the Camera uniform block, see CameraBlock
+        """
+        return f'''layout (std140) uniform {self.attribs["cameraBlock"]}
+        {{
+            mat4 {self.attribs["projectionMat"]};
+            mat4 {self.attribs["viewMat"]};
+            vec3 {self.attribs["cameraPos"]};
+            float {self.attribs["time"]};
+        }};'''
+
     def genVertexShaderSource(self):
+        if self.instanced and self.skinned:
+            return self.genInstancedSkinnedVertexShaderSource()
+        if self.instanced:
+            return self.genInstancedVertexShaderSource()
+        if self.skinned:
+            return self.genSkinnedVertexShaderSource()
         vss = f'''
         #version 330 core
         in vec3 {self.attribs["vertexPos"]};
@@ -118,22 +220,157 @@ class GLProgram:
         smooth out vec3 vNormal;
         out vec2 vTexture;
         
-        uniform mat4 {self.attribs["projectionMat"]};
-        uniform mat4 {self.attribs["viewMat"]};
+        {self.genCameraBlockSource()}
         uniform mat4 {self.attribs["modelMat"]};
+        // inverse transpose of the model matrix, computed once per draw instead of once per vertex
+        uniform mat3 {self.attribs["normalMat"]};
         
         void main()
         {{
             gl_Position = {self.attribs["projectionMat"]} * {self.attribs["viewMat"]} * {self.attribs["modelMat"]} * vec4({self.attribs["vertexPos"]}, 1.0);
             vPos = vec3({self.attribs["modelMat"]} * vec4({self.attribs["vertexPos"]}, 1.0));
             vColor = {self.attribs["vertexColor"]};
-            vNormal = normalize(transpose(inverse({self.attribs["modelMat"]})) * vec4({self.attribs["vertexNormal"]}, 0.0) ).xyz;
+            vNormal = normalize({self.attribs["normalMat"]} * {self.attribs["vertexNormal"]});
+            vTexture = {self.attribs["vertexTexture"]};
+        }}
+        '''
+        return vss
+
+    def genInstancedVertexShaderSource(self):
+        vss = f'''
+        #version 330 core
+        in vec3 {self.attribs["vertexPos"]};
+        in vec3 {self.attribs["vertexNormal"]};
+        in vec2 {self.attribs["vertexTexture"]};
+        in mat4 {self.attribs["instanceModel"]};
+        in mat3 {self.attribs["instanceNormal"]};
+        in vec3 {self.attribs["instanceColor"]};
+
+        out vec3 vPos;
+        out vec3 vColor;
+        smooth out vec3 vNormal;
+        out vec2 vTexture;
+
+        {self.genCameraBlockSource()}
+
+        void main()
+        {{
+            gl_Position = {self.attribs["projectionMat"]} * {self.attribs["viewMat"]} * {self.attribs["instanceModel"]} * vec4({self.attribs["vertexPos"]}, 1.0);
+            vPos = vec3({self.attribs["instanceModel"]} * vec4({self.attribs["vertexPos"]}, 1.0));
+            vColor = {self.attribs["instanceColor"]};
+            vNormal = normalize({self.attribs["instanceNormal"]} * {self.attribs["vertexNormal"]});
+            vTexture = {self.attribs["vertexTexture"]};
+        }}
+        '''
+        return vss
+
+    def genSkinnedVertexShaderSource(self):
+        # each vertex follows the weighted sum of up to four bones, most have a single one
+        weights = self.attribs["vertexJointWeights"]
+        joints = self.attribs["vertexJoints"]
+        blend = "\n".join(f'''            if ({weights}.{c} > 0.0)
+            {{
+                skin += {weights}.{c} * {self.attribs["bones"]}[int({joints}.{c})];
+                skinNormal += {weights}.{c} * {self.attribs["boneNormals"]}[int({joints}.{c})];
+            }}''' for c in "yzw")
+        vss = f'''
+        #version 330 core
+        in vec3 {self.attribs["vertexPos"]};
+        in vec3 {self.attribs["vertexNormal"]};
+        in vec3 {self.attribs["vertexColor"]};
+        in vec2 {self.attribs["vertexTexture"]};
+        in vec4 {self.attribs["vertexJoints"]};
+        in vec4 {self.attribs["vertexJointWeights"]};
+
+        out vec3 vPos;
+        out vec3 vColor;
+        smooth out vec3 vNormal;
+        out vec2 vTexture;
+
+        {self.genCameraBlockSource()}
+        uniform mat4 {self.attribs["bones"]}[{MAX_BONES}];
+        // inverse transpose of each bone matrix, computed on the CPU
+        uniform mat3 {self.attribs["boneNormals"]}[{MAX_BONES}];
+
+        void main()
+        {{
+            mat4 skin = {weights}.x * {self.attribs["bones"]}[int({joints}.x)];
+            mat3 skinNormal = {weights}.x * {self.attribs["boneNormals"]}[int({joints}.x)];
+{blend}
+            gl_Position = {self.attribs["projectionMat"]} * {self.attribs["viewMat"]} * skin * vec4({self.attribs["vertexPos"]}, 1.0);
+            vPos = vec3(skin * vec4({self.attribs["vertexPos"]}, 1.0));
+            vColor = {self.attribs["vertexColor"]};
+            vNormal = normalize(skinNormal * {self.attribs["vertexNormal"]});
+            vTexture = {self.attribs["vertexTexture"]};
+        }}
+        '''
+        return vss
+
+    def genInstancedSkinnedVertexShaderSource(self):
+        # the same blend as genSkinnedVertexShaderSource, with the bones of each instance read from a buffer texture
+        # instead of uniforms, boneCount bones of BONE_TEXELS texels per instance
+        weights = self.attribs["vertexJointWeights"]
+        joints = self.attribs["vertexJoints"]
+        blend = "\n".join(f'''            if ({weights}.{c} > 0.0)
+            {{
+                skin += {weights}.{c} * boneMat(int({joints}.{c}));
+                skinNormal += {weights}.{c} * boneNormalMat(int({joints}.{c}));
+            }}''' for c in "yzw")
+        vss = f'''
+        #version 330 core
+        in vec3 {self.attribs["vertexPos"]};
+        in vec3 {self.attribs["vertexNormal"]};
+        in vec3 {self.attribs["vertexColor"]};
+        in vec2 {self.attribs["vertexTexture"]};
+        in vec4 {self.attribs["vertexJoints"]};
+        in vec4 {self.attribs["vertexJointWeights"]};
+
+        out vec3 vPos;
+        out vec3 vColor;
+        smooth out vec3 vNormal;
+        out vec2 vTexture;
+
+        {self.genCameraBlockSource()}
+        uniform samplerBuffer {self.attribs["instanceBones"]};
+        uniform int {self.attribs["boneCount"]};
+
+        int boneTexel(int bone)
+        {{
+            return (gl_InstanceID * {self.attribs["boneCount"]} + bone) * {BONE_TEXELS};
+        }}
+
+        mat4 boneMat(int bone)
+        {{
+            int t = boneTexel(bone);
+            return mat4(texelFetch({self.attribs["instanceBones"]}, t), texelFetch({self.attribs["instanceBones"]}, t + 1),
+                        texelFetch({self.attribs["instanceBones"]}, t + 2), texelFetch({self.attribs["instanceBones"]}, t + 3));
+        }}
+
+        // inverse transpose of the bone matrix, computed on the CPU
+        mat3 boneNormalMat(int bone)
+        {{
+            int t = boneTexel(bone) + 4;
+            return mat3(texelFetch({self.attribs["instanceBones"]}, t).xyz, texelFetch({self.attribs["instanceBones"]}, t + 1).xyz,
+                        texelFetch({self.attribs["instanceBones"]}, t + 2).xyz);
+        }}
+
+        void main()
+        {{
+            mat4 skin = {weights}.x * boneMat(int({joints}.x));
+            mat3 skinNormal = {weights}.x * boneNormalMat(int({joints}.x));
+{blend}
+            gl_Position = {self.attribs["projectionMat"]} * {self.attribs["viewMat"]} * skin * vec4({self.attribs["vertexPos"]}, 1.0);
+            vPos = vec3(skin * vec4({self.attribs["vertexPos"]}, 1.0));
+            vColor = {self.attribs["vertexColor"]};
+            vNormal = normalize(skinNormal * {self.attribs["vertexNormal"]});
             vTexture = {self.attribs["vertexTexture"]};
         }}
         '''
         return vss
 
     def genFragShaderSource(self):
+        if self.instanced or self.skinned:
+            return self.genVertexColorFragShaderSource()
         fss = f"""
         #version 330 core
         
@@ -143,6 +380,7 @@ class GLProgram:
         in vec2 vTexture;
 
         uniform vec3 {self.attribs["currentColor"]};
+        uniform bool {self.attribs["vertexColorOn"]};
         uniform sampler2D {self.attribs["textureImage"]};
         
         out vec4 FragColor;
@@ -154,8 +392,34 @@ class GLProgram:
             FragColor = -1 * abs(placeHolder);
             FragColor = clamp(FragColor, 0, 1);
 
-            // Shade according to vertex colors
-            FragColor = vec4({self.attribs["currentColor"]}, 1.0);
+            // Shade according to the current color, or to vertex colors for meshes carrying their own
+            FragColor = vec4({self.attribs["vertexColorOn"]} ? vColor : {self.attribs["currentColor"]}, 1.0);
+        }}
+        """
+        return fss
+
+    def genVertexColorFragShaderSource(self):
+        fss = f"""
+        #version 330 core
+
+        in vec3 vPos;
+        in vec3 vColor;
+        smooth in vec3 vNormal;
+        in vec2 vTexture;
+
+        uniform sampler2D {self.attribs["textureImage"]};
+
+        out vec4 FragColor;
+        void main()
+        {{
+            // These three lines prevent glsl from optimizing out attributes (vPos, vColor, etc.).
+            // They are otherwise meaningless.
+            vec4 placeHolder = vec4(vPos+vColor+vNormal+vec3(vTexture, 1), 0);
+            FragColor = -1 * abs(placeHolder);
+            FragColor = clamp(FragColor, 0, 1);
+
+            // Shade according to instance or vertex colors
+            FragColor = vec4(vColor, 1.0);
         }}
         """
         return fss
@@ -172,7 +436,9 @@ class GLProgram:
 
     def getAttribLocation(self, name):
         programName = self.getAttribName(name)
-        attribLoc = gl.glGetAttribLocation(self.program, programName)
+        if programName not in self.attribLocations:
+            self.attribLocations[programName] = gl.glGetAttribLocation(self.program, programName)
+        attribLoc = self.attribLocations[programName]
         if attribLoc == -1 and self.debug > 1:
             print(f"Warning: Attrib {name} cannot found. Might have been optimized off")
         return attribLoc
@@ -182,11 +448,34 @@ class GLProgram:
             variableName = self.getAttribName(name)
         else:
             variableName = name
-        uniformLoc = gl.glGetUniformLocation(self.program, variableName)
+        if variableName not in self.uniformLocations:
+            self.uniformLocations[variableName] = gl.glGetUniformLocation(self.program, variableName)
+        uniformLoc = self.uniformLocations[variableName]
         if uniformLoc == -1 and self.debug > 1:
             print(f"Warning: Uniform {name} cannot found. Might have been optimized off")
         return uniformLoc
 
+    def variant(self, **options) -> "GLProgram":
+        """
+        A compiled program generated with other options, e.g. variant(skinned=True), made once per program so that
+        it lives in the same GL context
+
+        :param options: arguments of GLProgram's constructor
+        """
+        key = tuple(sorted(options.items()))
+        if key not in self.variants:
+            program = GLProgram(**options)
+            program.debug = self.debug
+            program.compile()
+            self.variants[key] = program
+        return self.variants[key]
+
+    def hasUniform(self, name, lookThroughAttribs=True):
+        """
+        Whether the linked program uses this uniform, so callers can skip computing values GL would ignore
+        """
+        return self.getUniformLocation(name, lookThroughAttribs) != -1
+
     def getAttribName(self, attribIndexName):
         return self.attribs[attribIndexName]
 
@@ -218,15 +507,58 @@ class GLProgram:
             info = gl.glGetShaderInfoLog(self.program)
             raise Exception(info)
 
+        self.resolveLocations()
+        self.bindCameraBlock()
         self.ready = True
 
+    def resolveLocations(self):
+        """
+        Query the locations of all active uniforms and attributes once, so drawing never asks GL for them.
+        Names that are not active, e.g. optimized off, are resolved on their first lookup.
+        """
+        self.uniformLocations = {}
+        self.attribLocations = {}
+        # linking resets the values of the uniforms
+        self.uniformInts = {}
+
+        for i in range(gl.glGetProgramiv(self.program, gl.GL_ACTIVE_UNIFORMS)):
+            name = gl.glGetActiveUniform(self.program, i)[0].decode()
+            loc = gl.glGetUniformLocation(self.program, name)
+            self.uniformLocations[name] = loc
+            # arrays are reported as name[0], but can be looked up by name as well
+            if name.endswith("[0]"):
+                self.uniformLocations[name[:-3]] = loc
+
+        for name in self.attribs.values():
+            self.attribLocations[name] = gl.glGetAttribLocation(self.program, name)
+
+    def bindCameraBlock(self):
+        """
+        Connect the Camera uniform block, if the shaders declare it, to the binding point shared by all programs
+        """
+        blockIndex = gl.glGetUniformBlockIndex(self.program, self.getAttribName("cameraBlock"))
+        if blockIndex == gl.GL_INVALID_INDEX:
+            if self.debug > 1:
+                print("Warning: Uniform block Camera cannot found. Might have been optimized off")
+            return
+        gl.glUniformBlockBinding(self.program, blockIndex, CAMERA_BLOCK_BINDING)
+
+    @classmethod
+    def resetState(cls):
+        """
+        Forget which program is current. Call it when the GL context is created again.
+        """
+        cls.__current = None
+
     def use(self):
         """
-        This is required before the uniforms set up.
+        This is required before the uniforms set up. Nothing is sent to GL if this program is already current.
         """
         if not self.ready:
             raise Exception("GLProgram must compile before use it")
-        gl.glUseProgram(self.program)
+        if GLProgram.__current is not self:
+            gl.glUseProgram(self.program)
+            GLProgram.__current = self
 
     # some help methods to set uniform in program
     def setMat4(self, name, mat, lookThroughAttribs=True):
@@ -235,6 +567,28 @@ class GLProgram:
             raise Exception("Projection Matrix must have 4x4 shape")
         gl.glUniformMatrix4fv(self.getUniformLocation(name, lookThroughAttribs), 1, gl.GL_FALSE, mat.flatten("C"))
 
+    def setMat4Array(self, name, mats, lookThroughAttribs=True):
+        """
+        :param mats: N x 4 x 4 matrices, each in the same order as for setMat4
+        """
+        self.use()
+        mats = np.asarray(mats)
+        if mats.shape[1:] != (4, 4):
+            raise Exception("Matrices must have 4x4 shape")
+        gl.glUniformMatrix4fv(self.getUniformLocation(name, lookThroughAttribs), len(mats), gl.GL_FALSE,
+                              mats.astype(np.float32).flatten("C"))
+
+    def setMat3Array(self, name, mats, lookThroughAttribs=True):
+        """
+        :param mats: N x 3 x 3 matrices, each in the same order as for setMat3
+        """
+        self.use()
+        mats = np.asarray(mats)
+        if mats.shape[1:] != (3, 3):
+            raise Exception("Matrices must have 3x3 shape")
+        gl.glUniformMatrix3fv(self.getUniformLocation(name, lookThroughAttribs), len(mats), gl.GL_FALSE,
+                              mats.astype(np.float32).flatten("C"))
+
     def setMat3(self, name, mat, lookThroughAttribs=True):
         self.use()
         if mat.shape != (3, 3):
@@ -266,16 +620,24 @@ class GLProgram:
         gl.glUniform2fv(self.getUniformLocation(name, lookThroughAttribs), 1, vec)
 
     def setBool(self, name, value, lookThroughAttribs=True):
-        self.use()
         if value not in (0, 1):
             raise Exception("bool only accept True/False/0/1")
-        gl.glUniform1i(self.getUniformLocation(name, lookThroughAttribs), int(value))
+        self.setUniformInt(self.getUniformLocation(name, lookThroughAttribs), int(value))
 
     def setInt(self, name, value, lookThroughAttribs=True):
-        self.use()
         if value != int(value):
             raise Exception("set int only accept  integer")
-        gl.glUniform1i(self.getUniformLocation(name, lookThroughAttribs), int(value))
+        self.setUniformInt(self.getUniformLocation(name, lookThroughAttribs), int(value))
+
+    def setUniformInt(self, loc, value):
+        """
+        Set an int uniform, skipping the GL call when it already has this value, e.g. a texture sampler unit
+        """
+        self.use()
+        if loc == -1 or self.uniformInts.get(loc) == value:
+            return
+        gl.glUniform1i(loc, value)
+        self.uniformInts[loc] = value
 
     def setFloat(self, name, value, lookThroughAttribs=True):
         self.use()
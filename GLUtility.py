@@ -118,6 +118,24 @@ class GLUtility:
         result[2, 3] = z
         return result.transpose() if columnMajor else result
 
+    @staticmethod
+    def normalMatrix(modelMat, columnMajor=True):
+        """
+        3x3 matrix transforming normals, the inverse transpose of the upper-left part of the model matrix
+
+        :param modelMat: 4x4 model matrix in row-major order, or an N x 4 x 4 stack of them
+        :type modelMat: numpy.ndarray
+        :return: 3x3 matrix, or N x 3 x 3 for a stack
+        """
+        linear = np.asarray(modelMat)[..., :3, :3]
+        try:
+            inverse = np.linalg.inv(linear)
+        except np.linalg.LinAlgError:
+            # a zero scale flattens the shape, its normals are meaningless but should not break the draw
+            inverse = np.linalg.pinv(linear)
+        # the inverse transpose, in column-major order, is the inverse itself
+        return inverse if columnMajor else np.swapaxes(inverse, -1, -2)
+
     @staticmethod
     def rotate(angle, rotationAxis, columnMajor=True):
         a = angle / 180 * math.pi
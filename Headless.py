@@ -0,0 +1,166 @@
+"""
+Headless vivarium: the same simulation as Vivarium, with creatures as pure simulation entities.
+Nothing here imports wx, OpenGL or the mesh assets, so it runs on machines without a display or a GPU,
+as fast as the CPU allows. Use it for batch runs, parameter sweeps and CI.
+
+Usage: python Headless.py --frames 1000 --fish 50 --food 5 --seed 42
+"""
+import argparse
+import time
+from typing import List, Optional
+
+import numpy as np
+
+import Species
+from Point import Point
+from CreatureStore import CreatureStore
+from SimClock import DEFAULT_DT
+
+
+class SimCreature:
+    """
+    A creature without any model to draw, holding only the attributes the CreatureStore needs.
+    """
+    item_id = 0
+    species = None
+    currentPos = None  # Point
+    step_vector = None  # Point
+    scale = 1.0
+
+    def __init__(self, species: Species.Species, position: Point, scale: float, item_id: int = 0,
+                 rng: Optional[np.random.Generator] = None):
+        self.species = species
+        self.item_id = item_id
+        self.currentPos = position.copy()
+        self.scale = scale
+        if species.drifting:
+            self.step_vector = Point((0, -1, 0))
+        else:
+            rng = np.random.default_rng() if rng is None else rng
+            self.step_vector = Point(rng.normal(0, 1, 3)).normalize()
+
+    @property
+    def boundary_radius(self) -> float:
+        return self.species.boundary_radius * self.scale
+
+    @property
+    def speed(self) -> float:
+        return self.species.speed * self.scale
+
+    @property
+    def boundary_center(self) -> Point:
+        return Point(np.array(self.species.boundary_center) * self.scale)
+
+    @property
+    def food_chain_level(self) -> int:
+        return self.species.food_chain_level
+
+    @property
+    def drifting(self) -> bool:
+        return self.species.drifting
+
+
+class HeadlessVivarium:
+    """
+    Counterpart of Vivarium without the scene graph. The same population is spawned at the same places, and with
+    the same seed, creatures are spawned exactly where the Vivarium spawns them.
+    """
+    tank_dimensions = None
+    store = None  # CreatureStore
+    frame = 0
+    dt = DEFAULT_DT  # length of one simulation step, in seconds
+    rng = None  # np.random.Generator, see Vivarium.rng
+
+    __next_id = 0
+
+    def __init__(self,
+                 tank_dimensions: Optional[List[float]] = None,
+                 interaction_radius: Optional[float] = None,
+                 dt: float = DEFAULT_DT,
+                 seed: Optional[int] = None):
+        self.tank_dimensions = [4, 4, 4] if tank_dimensions is None else list(tank_dimensions)
+        self.dt = dt
+        self.store = CreatureStore(interaction_radius=interaction_radius)
+        self.frame = 0
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def creatures(self) -> List[SimCreature]:
+        return self.store.creatures
+
+    def addCreature(self, species: Species.Species, position: Point = None) -> SimCreature:
+        if position is None:
+            position = Point(Species.init_pos(species, self.rng))
+        creature = SimCreature(species, position, species.size, self.__next_id, self.rng.spawn(1)[0])
+        self.__next_id += 1
+        self.store.add(creature)
+        return creature
+
+    def addShark(self):
+        return self.addCreature(Species.SHARK, Point((0, 0, 0)))
+
+    def addFish(self):
+        self.addCreature(Species.SALMON, Point(Species.init_fish_pos(self.rng)))
+        self.addCreature(Species.COD, Point(Species.init_fish_pos(self.rng)))
+
+    def addFood(self):
+        for _ in range(6):
+            self.addCreature(Species.FOOD, Point(Species.init_fish_food_pos(self.rng)))
+
+    def animationUpdate(self):
+        """
+        Step every creature once, and remove the creatures that have been eaten
+        """
+        creatures = list(self.store.creatures)
+        _, eaten = self.store.stepForward(self.tank_dimensions, self.dt)
+        for i in np.flatnonzero(eaten):
+            self.store.remove(creatures[i])
+        self.frame += 1
+
+    def run(self, frames: int):
+        for _ in range(frames):
+            self.animationUpdate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the vivarium simulation without any window.")
+    parser.add_argument("--frames", type=int, default=1000, help="number of simulation steps")
+    parser.add_argument("--sharks", type=int, default=1, help="number of sharks")
+    parser.add_argument("--fish", type=int, default=2, help="number of salmon and cod pairs")
+    parser.add_argument("--food", type=int, default=0, help="number of food batches, 6 particles each")
+    parser.add_argument("--radius", type=float, default=None,
+                        help="interaction radius of the spatial hash, every pair interacts if not given")
+    parser.add_argument("--dt", type=float, default=DEFAULT_DT, help="length of one simulation step, in seconds")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the spawn positions and directions, the same seed gives the same trajectories")
+    parser.add_argument("--output", default=None,
+                        help="save the position of every creature at every frame to this .npz file")
+    args = parser.parse_args(argv)
+
+    vivarium = HeadlessVivarium(interaction_radius=args.radius, dt=args.dt, seed=args.seed)
+    for _ in range(args.sharks):
+        vivarium.addShark()
+    for _ in range(args.fish):
+        vivarium.addFish()
+    for _ in range(args.food):
+        vivarium.addFood()
+    print(f"{len(vivarium.store)} creatures, {args.frames} frames")
+
+    frames, ids, positions = [], [], []
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        vivarium.animationUpdate()
+        if args.output is not None:
+            frames.append(np.full(len(vivarium.store), vivarium.frame))
+            ids.append([c.item_id for c in vivarium.creatures])
+            positions.append(vivarium.store.positions.copy())
+    elapsed = time.perf_counter() - start
+
+    print(f"{elapsed:.3f}s, {args.frames / max(elapsed, 1e-9):.1f} frames/s, {len(vivarium.store)} creatures left")
+    if args.output is not None and frames:
+        np.savez(args.output,
+                 frame=np.concatenate(frames), item_id=np.concatenate(ids), position=np.concatenate(positions))
+
+
+if __name__ == "__main__":
+    main()
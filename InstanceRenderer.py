@@ -0,0 +1,273 @@
+"""
+Instanced rendering of the geometric primitives and of the skinned creatures. Every Shape of the same primitive shares
+one mesh on the GPU (see MeshCache), and all of them are drawn with a single glDrawElementsInstanced, their model
+matrices and colors coming from an instance buffer refilled every frame. Likewise every creature drawn as a SkinnedMesh
+(the default, see CS680PA3.gpu_skinning) shares the skinned mesh of its look, and all the creatures of a species are
+one instanced draw, the bone matrices of each one read from a buffer texture.
+
+Shapes are only left in the tree when the creatures are not baked (CS680PA3.bake_static_geometry). Baked creatures that
+are not skinned, textured shapes and the tank are drawn one by one, see RenderQueue.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from Component import Component
+from Frustum import Frustum
+from GLBuffer import VAO, VBO, TBO
+from GLProgram import GLProgram, BONE_TEXELS
+from GLUtility import GLUtility
+from MeshCache import MeshCache, SharedMesh
+from RenderQueue import RenderQueue
+from Shapes import Shape
+from SkinnedMesh import SkinnedMesh
+
+try:
+    try:
+        import OpenGL.GL as gl
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+# floats per instance: a 4x4 model matrix and a 3x3 normal matrix, column by column, then an RGB color
+INSTANCE_SIZE = 16 + 9 + 3
+# texture unit of the bone buffer texture, past the units Texture hands out so no sampler2D shares it
+BONE_TEXTURE_UNIT = 17
+
+
+class InstancedMesh:
+    """
+    A shared mesh with the instance buffer used to draw all its copies
+    """
+    vao = None
+    instanceVbo = None
+    shaderProg = None
+    sharedMesh = None
+
+    def __init__(self, shaderProg: GLProgram, sharedMesh: SharedMesh):
+        """
+        :param shaderProg: compiled instanced shader program
+        :param sharedMesh: the geometry, from MeshCache
+        """
+        self.shaderProg = shaderProg
+        self.shaderProg.use()
+        self.sharedMesh = sharedMesh
+
+        self.vao = VAO()
+        self.instanceVbo = VBO()
+        self.initialize()
+
+    def initialize(self):
+        self.vao.bind()
+        self.sharedMesh.bindAttributes(self.shaderProg)
+
+        # a matrix attribute takes consecutive locations, one per column
+        self.instanceVbo.setBuffer(np.zeros(INSTANCE_SIZE), INSTANCE_SIZE, gl.GL_STREAM_DRAW)
+        modelLoc = self.shaderProg.getAttribLocation("instanceModel")
+        if modelLoc >= 0:
+            for i in range(4):
+                self.instanceVbo.setAttribPointer(modelLoc + i, stride=INSTANCE_SIZE, offset=4 * i,
+                                                  attribSize=4, divisor=1)
+        normalLoc = self.shaderProg.getAttribLocation("instanceNormal")
+        if normalLoc >= 0:
+            for i in range(3):
+                self.instanceVbo.setAttribPointer(normalLoc + i, stride=INSTANCE_SIZE, offset=16 + 3 * i,
+                                                  attribSize=3, divisor=1)
+        self.instanceVbo.setAttribPointer(self.shaderProg.getAttribLocation("instanceColor"),
+                                          stride=INSTANCE_SIZE, offset=25, attribSize=3, divisor=1)
+        self.vao.unbind()
+
+    def draw(self, instances: np.ndarray):
+        """
+        :param instances: N x INSTANCE_SIZE array, one row per copy to draw
+        """
+        self.vao.bind()
+        self.instanceVbo.setBuffer(instances, INSTANCE_SIZE, gl.GL_STREAM_DRAW)
+        self.sharedMesh.ebo.drawInstanced(len(instances))
+        self.vao.unbind()
+
+
+class InstancedSkinnedMesh:
+    """
+    A shared skinned mesh with the buffer texture holding the bones of all its copies
+    """
+    shaderProg = None
+    sharedMesh = None
+    boneBuffer = None
+
+    def __init__(self, shaderProg: GLProgram, sharedMesh: SharedMesh):
+        """
+        :param shaderProg: compiled instanced and skinned shader program
+        :param sharedMesh: the geometry, uploaded by a SkinnedMesh
+        """
+        self.shaderProg = shaderProg
+        self.sharedMesh = sharedMesh
+        self.boneBuffer = TBO()
+
+    def draw(self, bones: np.ndarray) -> int:
+        """
+        :param bones: N x boneCount x (BONE_TEXELS * 4) array, the bones of each copy to draw, see
+            InstanceRenderer.boneData
+        :return: number of draw calls, more than one when the bones of every copy do not fit in one buffer texture
+        """
+        n, boneCount = bones.shape[:2]
+        chunk = max(1, TBO.maxTexels() // (boneCount * BONE_TEXELS))
+        self.shaderProg.use()
+        self.shaderProg.setInt("boneCount", boneCount)
+        self.shaderProg.setInt("instanceBones", BONE_TEXTURE_UNIT)
+        self.boneBuffer.bind(BONE_TEXTURE_UNIT)
+        vao = self.sharedMesh.getVAO(self.shaderProg)
+        vao.bind()
+        for start in range(0, n, chunk):
+            copies = bones[start:start + chunk]
+            self.boneBuffer.setBuffer(copies)
+            self.sharedMesh.ebo.drawInstanced(len(copies))
+        vao.unbind()
+        return len(range(0, n, chunk))
+
+
+class InstanceRenderer:
+    """
+    Draws a component tree with one instanced draw call per primitive, and one per skinned mesh. Other components,
+    like the tank or a textured shape, are still drawn one by one through the regular shader program.
+    """
+    shaderProg = None  # the instanced GLProgram
+    skinnedProg = None  # its instanced and skinned variant
+    meshes = None  # Dict[meshKey, InstancedMesh]
+    skinnedMeshes = None  # Dict[meshKey, InstancedSkinnedMesh]
+    drawCalls = 0  # number of draw calls issued by the last draw
+    queue = None  # RenderQueue for the components that cannot be instanced
+
+    def __init__(self, shaderProg: GLProgram):
+        if not shaderProg.instanced:
+            raise ValueError("InstanceRenderer needs a GLProgram compiled with instanced=True")
+        self.shaderProg = shaderProg
+        self.skinnedProg = shaderProg.variant(instanced=True, skinned=True)
+        self.meshes = {}
+        self.skinnedMeshes = {}
+        self.queue = RenderQueue()
+
+    def getMesh(self, shape: Shape) -> InstancedMesh:
+        """
+        The instanced mesh of the primitive of shape, at the level of detail it is currently drawn with
+        """
+        vertices, indices, key = shape.mesh.levels[shape.mesh.lodLevel]
+        if key not in self.meshes:
+            self.meshes[key] = InstancedMesh(self.shaderProg, MeshCache.get(key, vertices, indices))
+        return self.meshes[key]
+
+    def getSkinnedMesh(self, skin: SkinnedMesh) -> InstancedSkinnedMesh:
+        """
+        The instanced mesh of a skinned mesh, at the level of detail it is currently drawn with
+        """
+        key = skin.levels[skin.lodLevel][2]
+        if key not in self.skinnedMeshes:
+            self.skinnedMeshes[key] = InstancedSkinnedMesh(self.skinnedProg, skin.sharedMesh)
+        return self.skinnedMeshes[key]
+
+    @staticmethod
+    def collect(root: Component, frustum: Frustum = None) \
+            -> Tuple[Dict[tuple, List[Shape]], Dict[tuple, List[SkinnedMesh]], List[Component]]:
+        """
+        Walk the tree, grouping the shapes by primitive and level of detail, and the skinned meshes by mesh and level
+        of detail.
+
+        :param frustum: skip the subtrees outside of it, None to walk the whole tree
+        :return: the shapes of each primitive, the skinned meshes sharing each mesh, and the other components that
+            have something to draw
+        """
+        groups = {}
+        skins = {}
+        others = []
+        if frustum is not None:
+            components = frustum.visibleComponents(root)
+        else:
+            components = []
+            stack = [root]
+            while stack:
+                comp = stack.pop()
+                components.append(comp)
+                stack.extend(reversed(comp.children))
+        for comp in components:
+            if comp.displayObj is None:
+                pass
+            elif isinstance(comp, Shape) and not comp.textureOn:
+                groups.setdefault(comp.mesh.levels[comp.mesh.lodLevel][2], []).append(comp)
+            elif isinstance(comp.displayObj, SkinnedMesh) and comp.displayObj.meshKey is not None:
+                skin = comp.displayObj
+                # the same mesh may be bound to fewer bones in some trees, the bones of a draw must line up
+                skins.setdefault((skin.levels[skin.lodLevel][2], len(skin.bones)), []).append(skin)
+            else:
+                others.append(comp)
+        return groups, skins, others
+
+    @staticmethod
+    def instanceData(shapes: List[Shape]) -> np.ndarray:
+        """
+        Model matrices, with each shape's own scale, normal matrices and colors of the shapes, packed for the
+        instance buffer
+        """
+        n = len(shapes)
+        models = np.empty((n, 4, 4))
+        colors = np.empty((n, 3))
+        for i, s in enumerate(shapes):
+            models[i] = s.modelMatrix()
+            colors[i] = s.current_color
+        data = np.empty((n, INSTANCE_SIZE), dtype=np.float32)
+        # GL reads matrices column by column
+        data[:, :16] = models.transpose(0, 2, 1).reshape(n, 16)
+        data[:, 16:25] = GLUtility.normalMatrix(models).reshape(n, 9)
+        data[:, 25:] = colors
+        return data
+
+    @staticmethod
+    def boneData(skins: List[SkinnedMesh]) -> np.ndarray:
+        """
+        Bone matrices and their normal matrices of skinned meshes with as many bones, packed for the buffer texture
+
+        :return: N x boneCount x (BONE_TEXELS * 4) array
+        """
+        mats = np.array([[b.transformationMat for b in skin.bones] for skin in skins])
+        n, boneCount = mats.shape[:2]
+        data = np.zeros((n, boneCount, BONE_TEXELS, 4), dtype=np.float32)
+        # GL reads matrices column by column
+        data[:, :, :4] = np.swapaxes(mats, -1, -2)
+        # the rows of the inverse are the columns of the normal matrix, its inverse transpose
+        data[:, :, 4:, :3] = GLUtility.normalMatrix(mats)
+        return data.reshape(n, boneCount, BONE_TEXELS * 4)
+
+    def draw(self, root: Component, shaderProg: GLProgram, frustum: Frustum = None):
+        """
+        Draw the tree under root. Transformation matrices should be up to date, see Component.update.
+
+        :param root: top of the tree
+        :param shaderProg: the regular shader program, for the components that cannot be instanced
+        :param frustum: skip the subtrees outside of it, None to draw the whole tree
+        """
+        groups, skins, others = self.collect(root, frustum)
+
+        for comp in others:
+            self.queue.add(comp, shaderProg)
+        self.queue.submit()
+        self.drawCalls = self.queue.drawCalls
+
+        self.shaderProg.use()
+        for key, shapes in groups.items():
+            self.getMesh(shapes[0]).draw(self.instanceData(shapes))
+            self.drawCalls += 1
+        for key, meshes in skins.items():
+            self.drawCalls += self.getSkinnedMesh(meshes[0]).draw(self.boneData(meshes))
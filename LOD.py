@@ -0,0 +1,180 @@
+"""
+Level of detail. Meshes come in up to three levels: as built, low poly, and a box around them. A mesh only has the
+levels that are coarser than the finer ones, e.g. a shape already built low poly has no low poly level, and draws its
+finer level instead. Each frame the level of every component is chosen from the size its bounding sphere has on
+screen, with some hysteresis so that a component moving around a threshold does not keep switching between two levels.
+"""
+import bisect
+import itertools
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from SceneGraph import SceneGraph
+
+# the levels every mesh provides
+LOD_FULL = 0
+LOD_LOW_POLY = 1
+LOD_BOX = 2
+
+# triangles of a box whose corner i is at (x, y, z) = (i >> 2 & 1, i >> 1 & 1, i & 1) in its bounds
+BOX_INDICES = np.array([
+    0, 1, 3, 0, 3, 2,
+    4, 6, 7, 4, 7, 5,
+    0, 4, 5, 0, 5, 1,
+    2, 3, 7, 2, 7, 6,
+    0, 2, 6, 0, 6, 4,
+    1, 5, 7, 1, 7, 3,
+], dtype=np.int32)
+
+
+def boxMesh(vertexData: np.ndarray, color=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The axis aligned box around some vertices.
+
+    :param vertexData: interleaved vertices, 11 floats each
+    :param color: color of the box vertices, black if not given
+    :return: the 8 corners, 11 floats each, and the triangle indices, both flat
+    """
+    positions = np.asarray(vertexData).reshape(-1, 11)[:, 0:3]
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    corners = np.array(list(itertools.product(*zip(low, high))))
+
+    vertices = np.zeros((8, 11), dtype=np.float32)
+    vertices[:, 0:3] = corners
+    # corners point away from the center
+    normals = corners - (low + high) / 2
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    vertices[:, 3:6] = normals / np.where(lengths > 0, lengths, 1)
+    if color is not None:
+        vertices[:, 6:9] = color
+    return vertices.reshape(-1), BOX_INDICES.copy()
+
+
+def fitToBounds(vertexData: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """
+    Scale and move some vertices along each axis so that their bounds are those of other vertices, e.g. so that a low
+    poly mesh keeps the size of the mesh it stands for.
+
+    :param vertexData: interleaved vertices, 11 floats each. They are not modified
+    :param reference: interleaved vertices, 11 floats each, whose bounds to fit
+    :return: the fitted vertices, flat
+    """
+    vertices = np.array(vertexData, dtype=np.float32).reshape(-1, 11)
+    positions = vertices[:, 0:3]
+    referencePositions = np.asarray(reference).reshape(-1, 11)[:, 0:3]
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    referenceLow, referenceHigh = referencePositions.min(axis=0), referencePositions.max(axis=0)
+    extent = high - low
+    scale = np.where(extent > 0, (referenceHigh - referenceLow) / np.where(extent > 0, extent, 1), 1)
+    vertices[:, 0:3] = (positions - low) * scale + referenceLow
+    # normals follow the inverse scale
+    normals = vertices[:, 3:6] / scale
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    vertices[:, 3:6] = normals / np.where(lengths > 0, lengths, 1)
+    return vertices.reshape(-1)
+
+
+def presentLevels(finest, lodLevels) -> Tuple[List, List[int]]:
+    """
+    The levels a mesh really has
+
+    :param finest: (vertexData, indexData, meshKey) of the mesh as built
+    :param lodLevels: the mesh of each coarser level, LOD_LOW_POLY first, None for a level the mesh does not have
+    :return: the meshes of the levels, finest first, and the level each one is used from
+    """
+    levels = [finest]
+    levelIds = [LOD_FULL]
+    for level, mesh in enumerate(lodLevels or [], start=LOD_FULL + 1):
+        if mesh is not None:
+            levels.append(mesh)
+            levelIds.append(level)
+    return levels, levelIds
+
+
+def levelIndex(levelIds: Sequence[int], level: int) -> int:
+    """
+    Index, in the levels of a mesh, of the mesh drawn at a level: the coarsest one used from that level or a finer one
+    """
+    return max(bisect.bisect_right(levelIds, level) - 1, 0)
+
+
+def boundingSphere(vertexData: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Center of the bounds of some vertices, and the distance from it to the furthest one
+    """
+    positions = np.asarray(vertexData).reshape(-1, 11)[:, 0:3]
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+    return center, float(np.linalg.norm(positions - center, axis=1).max())
+
+
+class LODSelector:
+    """
+    Chooses the level of detail of the components of a tree. The top-most components with a bounding sphere (see
+    Component.boundingSphere), e.g. the creatures, choose for their whole subtree, so that all the parts of a creature
+    switch together.
+    """
+    # radius on screen, in pixels, under which each coarser level is used. Only the spheres built at full resolution
+    # (eyes, food) have a low poly level, whose faces are up to 14% of the radius inside the full sphere, so it is
+    # used once that is about a pixel
+    thresholds: Sequence[float] = (8.0, 3.0)
+    # how far past a threshold, relative to it, the size must go before the level changes
+    hysteresis: float = 0.2
+
+    def __init__(self, thresholds: Sequence[float] = None, hysteresis: float = None):
+        if thresholds is not None:
+            self.thresholds = tuple(thresholds)
+        if hysteresis is not None:
+            self.hysteresis = hysteresis
+
+    @staticmethod
+    def projectedRadius(center: np.ndarray, radius: float, cameraPos, projectionMat: np.ndarray,
+                        viewportHeight: float) -> float:
+        """
+        Radius on screen, in pixels, of a sphere seen from cameraPos
+
+        :param projectionMat: the perspective matrix, see GLUtility.perspective
+        """
+        distance = np.linalg.norm(np.asarray(center, dtype=np.float64) - np.asarray(cameraPos, dtype=np.float64))
+        if distance <= radius:
+            return float("inf")
+        # projectionMat[1, 1] is cot(fov / 2) whether the matrix is transposed or not
+        return radius * projectionMat[1, 1] / distance * viewportHeight / 2
+
+    def chooseLevel(self, size: float, current: int) -> int:
+        """
+        :param size: radius on screen, in pixels
+        :param current: the level used so far
+        """
+        level = current
+        while level < len(self.thresholds) and size < self.thresholds[level] * (1 - self.hysteresis):
+            level += 1
+        while level > 0 and size > self.thresholds[level - 1] * (1 + self.hysteresis):
+            level -= 1
+        return level
+
+    def update(self, root, cameraPos, projectionMat: np.ndarray, viewportHeight: float):
+        """
+        Choose the level of every component under root and switch their meshes to it. Transformation matrices
+        should be up to date, see Component.update.
+        """
+        graph = root.sceneGraph if root.sceneGraph is not None else SceneGraph(root)
+        nodes = graph.components()
+        parents = graph.parents
+        levels = np.zeros(len(nodes), dtype=np.int64)
+        chosen = np.zeros(len(nodes), dtype=bool)
+
+        for i, node in enumerate(nodes):
+            parent = parents[i]
+            if parent >= 0 and chosen[parent]:
+                levels[i] = levels[parent]
+                chosen[i] = True
+            else:
+                sphere = node.boundingSphere()
+                if sphere is not None:
+                    size = self.projectedRadius(*sphere, cameraPos, projectionMat, viewportHeight)
+                    node.lodLevel = self.chooseLevel(size, node.lodLevel)
+                    levels[i] = node.lodLevel
+                    chosen[i] = True
+            if node.displayObj is not None:
+                node.displayObj.setLODLevel(int(levels[i]))
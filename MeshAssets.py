@@ -0,0 +1,135 @@
+"""
+Binary cache of the .dae mesh assets. Parsing collada XML is slow, so the vertex and index arrays of each asset are
+saved as .npy files next to it the first time it is loaded, and memory-mapped on the next runs. The SHA-1 of the .dae
+the cache was built from is saved with it, and a cache whose .dae has changed since is built again. Modification times
+are not trusted: a checkout, a copy or an unpacked archive can leave an edited .dae older than its cache, or a cache
+newer than a .dae it does not match.
+
+Usage: python MeshAssets.py [assets/*.dae], to build the cache ahead of time
+"""
+import glob
+import hashlib
+import os
+import sys
+from typing import Tuple
+
+import numpy as np
+
+
+def parseCollada(filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read the first triangle set of a collada file.
+
+    :return: the interleaved vertices, 11 floats each (position, normal, color, UV), with only the positions filled,
+        and the triangle indices, both flat
+    """
+    # imported here so that loading from the cache never needs pycollada
+    from collada import Collada
+
+    colladaData = Collada(filename)
+
+    geo = colladaData.geometries[0]
+    tridata = geo.primitives[0]
+
+    # construct vertex list, the normals, colors and UVs are left empty
+    positions = np.asarray(tridata.vertex)
+    vertices = np.zeros((len(positions), 11), dtype=np.float32)
+    vertices[:, 0:3] = positions
+
+    # construct indices
+    indices = np.asarray(tridata.vertex_index, dtype=np.int32)
+
+    return vertices.reshape(-1), indices.reshape(-1)
+
+
+def cachePaths(filename: str) -> Tuple[str, str]:
+    """
+    The vertex and index cache files of a .dae file
+    """
+    base = os.path.splitext(filename)[0]
+    return base + ".vertices.npy", base + ".indices.npy"
+
+
+def digestPath(filename: str) -> str:
+    """
+    The file holding the digest of the .dae file the cache of filename was built from
+    """
+    return os.path.splitext(filename)[0] + ".source.sha1"
+
+
+def sourceDigest(filename: str) -> str:
+    """
+    SHA-1 of the content of filename, as hexadecimal
+    """
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def isStale(filename: str) -> bool:
+    """
+    Whether the cache of filename is missing, or was built from another content of filename
+    """
+    if not all(os.path.isfile(path) for path in cachePaths(filename)):
+        return True
+    try:
+        with open(digestPath(filename)) as f:
+            digest = f.read().strip()
+    except OSError:
+        return True
+    return digest != sourceDigest(filename)
+
+
+def writeAtomically(path: str, write):
+    """
+    Write a file through a temporary one, so an interrupted build never leaves a truncated file behind
+
+    :param write: called with the temporary file, opened in binary mode
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def buildCache(filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse filename and save its arrays to the cache.
+
+    :return: the parsed vertices and indices
+    """
+    # hashed before parsing, so an edit made meanwhile leaves the cache stale rather than wrongly fresh
+    digest = sourceDigest(filename)
+    vertices, indices = parseCollada(filename)
+    for path, data in zip(cachePaths(filename), (vertices, indices)):
+        writeAtomically(path, lambda f: np.save(f, data))
+    # written last: until it is, the arrays do not count as a cache of this content
+    writeAtomically(digestPath(filename), lambda f: f.write(digest.encode("ascii")))
+    return vertices, indices
+
+
+def loadVertexData(filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The vertices and indices of a .dae file, from its cache when it is up to date. Arrays read from the cache are
+    read-only memory maps.
+    """
+    if not isStale(filename):
+        vertices_path, indices_path = cachePaths(filename)
+        return np.load(vertices_path, mmap_mode="r"), np.load(indices_path, mmap_mode="r")
+    try:
+        return buildCache(filename)
+    except OSError:
+        # the assets directory may be read-only, the data is still good without a cache
+        return parseCollada(filename)
+
+
+def main(argv=None):
+    filenames = sys.argv[1:] if argv is None else argv
+    if not filenames:
+        filenames = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "*.dae")))
+    for filename in filenames:
+        buildCache(filename)
+        print(f"{filename} -> {', '.join(cachePaths(filename) + (digestPath(filename),))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Geometry shared on the GPU. The vertices of a primitive are the same for every copy of it, only the model matrix and
+color differ, so each primitive and level of detail is uploaded once and its buffers are used by every component
+showing it.
+"""
+from typing import Dict, Hashable
+
+import numpy as np
+
+from GLBuffer import VAO, VBO, EBO
+from GLProgram import GLProgram
+
+# per-vertex attributes of the interleaved 11 floats layout: name, offset, size
+VERTEX_ATTRIBS = (
+    ("vertexPos", 0, 3),
+    ("vertexNormal", 3, 3),
+    ("vertexColor", 6, 3),
+    ("vertexTexture", 9, 2),
+)
+# the skinned layout adds 4 bone indices and their 4 weights, 19 floats per vertex, see SkinnedMesh
+SKINNED_VERTEX_ATTRIBS = VERTEX_ATTRIBS + (
+    ("vertexJoints", 11, 4),
+    ("vertexJointWeights", 15, 4),
+)
+
+
+class SharedMesh:
+    """
+    Vertex and index buffers of one mesh, with one VAO for each shader program drawing it
+    """
+    vbo = None
+    ebo = None
+    vaos = None  # Dict[int, VAO], keyed by GL program name
+
+    vertices = None
+    indices = None
+    attribs = VERTEX_ATTRIBS
+    stride = 11  # floats per vertex
+
+    def __init__(self, vertexData: np.ndarray, indexData: np.ndarray, attribs=VERTEX_ATTRIBS):
+        """
+        :param vertexData: interleaved vertices
+        :param indexData: triangle indices
+        :param attribs: layout of the vertices, (name, offset, size) for each attribute
+        """
+        self.vertices = vertexData
+        self.indices = indexData
+        self.attribs = attribs
+        self.stride = max(offset + size for name, offset, size in attribs)
+        self.vaos = {}
+
+        self.vbo = VBO()
+        self.ebo = EBO()
+        self.vbo.setBuffer(self.vertices, self.stride)
+        self.ebo.setBuffer(self.indices)
+
+    def bindAttributes(self, shaderProg: GLProgram):
+        """
+        Point the attributes of shaderProg at this mesh. The VAO to record them in must be bound.
+        """
+        self.ebo.bind()
+        for name, offset, size in self.attribs:
+            # the program may not use every attribute, e.g. the instanced one takes colors per instance
+            loc = shaderProg.getAttribLocation(name)
+            if loc >= 0:
+                self.vbo.setAttribPointer(loc, stride=self.stride, offset=offset, attribSize=size)
+
+    def getVAO(self, shaderProg: GLProgram) -> VAO:
+        if shaderProg.program not in self.vaos:
+            vao = VAO()
+            vao.bind()
+            self.bindAttributes(shaderProg)
+            vao.unbind()
+            self.vaos[shaderProg.program] = vao
+        return self.vaos[shaderProg.program]
+
+    def draw(self, shaderProg: GLProgram):
+        vao = self.getVAO(shaderProg)
+        vao.bind()
+        self.ebo.draw()
+        vao.unbind()
+
+
+class MeshCache:
+    """
+    Registry of the shared meshes, keyed by primitive and level of detail (see Shape.meshKey).
+
+    GL objects belong to a context, so the cache must be cleared whenever the GL context is created again.
+    """
+    __meshes: Dict[Hashable, SharedMesh] = {}
+
+    @classmethod
+    def get(cls, key: Hashable, vertexData: np.ndarray, indexData: np.ndarray, attribs=VERTEX_ATTRIBS) -> SharedMesh:
+        """
+        The mesh registered under key, uploading the given data the first time the key is asked for
+        """
+        if key not in cls.__meshes:
+            cls.__meshes[key] = SharedMesh(vertexData, indexData, attribs)
+        return cls.__meshes[key]
+
+    @classmethod
+    def clear(cls):
+        cls.__meshes.clear()
+
+    @classmethod
+    def size(cls) -> int:
+        return len(cls.__meshes)
@@ -0,0 +1,200 @@
+"""
+Offscreen vivarium: the scene of Sketch rendered into a framebuffer object of a surfaceless EGL context, without wx
+or any display, and streamed to a PNG sequence or raw video. Time advances by exactly one frame per frame rendered,
+so recordings run as fast as the machine draws, on servers with a GPU or with Mesa's software rasterizer.
+
+Usage: python Offscreen.py --frames 600 --fps 60 --png frames/
+       python Offscreen.py --frames 600 --raw - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 640x480 -r 60 -i - out.mp4
+"""
+import os
+
+# the EGL platform of PyOpenGL needs to be chosen before OpenGL is first imported, and Mesa needs to be told not to
+# look for a display server
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import argparse
+import ctypes
+import math
+import sys
+import time
+
+import ColorType
+from Capture import FrameRecorder, PNGSequenceWriter, RawVideoWriter
+from Component import Component
+from GLBuffer import FBO
+from Point import Point
+from SceneRenderer import SceneRenderer
+from Vivarium import Vivarium
+
+try:
+    from OpenGL import EGL
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL with EGL support not present")
+
+
+def createContext():
+    """
+    Make current an OpenGL 3.3 core context without any surface, the frames are drawn into framebuffer objects
+
+    :return: the EGL display and context
+    """
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise Exception("Cannot initialize EGL")
+
+    # configurations default to window surfaces, which a display without any window system has none of
+    configAttribs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                     EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+    config = EGL.EGLConfig()
+    configNum = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, configAttribs, ctypes.pointer(config), 1, ctypes.pointer(configNum)) \
+            or configNum.value == 0:
+        raise Exception("No EGL configuration supports OpenGL")
+
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    contextAttribs = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+                                      EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                                      EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                                      EGL.EGL_NONE)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, contextAttribs)
+    if not context:
+        raise Exception("Cannot create an OpenGL 3.3 core context")
+    if not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context):
+        raise Exception("Cannot make the context current without a surface")
+    return display, context
+
+
+class OffscreenRenderer:
+    """
+    The vivarium of Sketch, with the same default camera, drawn into a framebuffer object. A GL context must be
+    current, see createContext.
+    """
+    width = 640
+    height = 480
+    fbo = None  # FBO
+    sceneRenderer = None  # SceneRenderer
+    topLevelComponent = None
+    vivarium = None
+
+    backgroundColor = ColorType.BLUEGREEN
+    lookAtPt = None
+    upVector = None
+    cameraDis = 7.8
+    cameraTheta = 0.900796326794896
+    cameraPhi = 0.013598775598303803
+
+    def __init__(self, width: int = 640, height: int = 480, seed: int = None, interaction_radius: float = None):
+        """
+        :param seed: seed of the simulation, see Vivarium
+        :param interaction_radius: interaction radius of the creatures, see Vivarium
+        """
+        self.width = width
+        self.height = height
+        self.lookAtPt = [0, 0, 0]
+        self.upVector = [0, 1, 0]
+
+        self.fbo = FBO(width, height)
+        self.fbo.bind()
+        self.sceneRenderer = SceneRenderer(width, height)
+        self.vivarium = Vivarium(self, self.sceneRenderer.shaderProg, seed, interaction_radius)
+        self.topLevelComponent = Component(Point((0, 0, 0)))
+        self.topLevelComponent.addChild(self.vivarium)
+        self.topLevelComponent.initialize()
+
+    def getCameraPos(self):
+        ct = math.cos(self.cameraTheta)
+        st = math.sin(self.cameraTheta)
+        cp = math.cos(self.cameraPhi)
+        sp = math.sin(self.cameraPhi)
+        return [self.lookAtPt[0] + self.cameraDis * ct * cp,
+                self.lookAtPt[1] + self.cameraDis * sp,
+                self.lookAtPt[2] + self.cameraDis * st * cp]
+
+    def renderFrame(self, now: float):
+        """
+        Run the simulation up to now, then draw it into the framebuffer object
+
+        :param now: simulated time in seconds, see Vivarium.advance
+        """
+        with self.sceneRenderer.profiler.phase("simulate"):
+            self.vivarium.advance(now)
+        self.fbo.bind()
+        self.sceneRenderer.render(self.topLevelComponent, self.getCameraPos(), self.lookAtPt, self.upVector,
+                                  self.vivarium.clock.time, self.backgroundColor)
+
+    def record(self, frames: int, fps: float, writers) -> int:
+        """
+        Render frames at fps frames per simulated second, and give each one to every writer, in order
+
+        :return: the number of frames written
+        """
+        recorder = FrameRecorder(writers)
+        profiler = self.sceneRenderer.profiler
+        # the clock starts on the first frame, which shows the initial state
+        for i in range(frames):
+            profiler.beginFrame()
+            self.renderFrame(i / fps)
+            with profiler.phase("capture", gpu=True):
+                recorder.capture(self.width, self.height)
+            profiler.endFrame()
+        recorder.close()
+        return recorder.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the vivarium without any window.")
+    parser.add_argument("--frames", type=int, default=600, help="number of frames to render")
+    parser.add_argument("--fps", type=float, default=60, help="frames per simulated second")
+    parser.add_argument("--width", type=int, default=640, help="frame width, in pixels")
+    parser.add_argument("--height", type=int, default=480, help="frame height, in pixels")
+    parser.add_argument("--fish", type=int, default=0, help="number of salmon and cod pairs added to the default ones")
+    parser.add_argument("--food", type=int, default=0, help="number of food batches, 6 particles each")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the simulation, the same seed renders the same frames")
+    parser.add_argument("--radius", type=float, default=None,
+                        help="interaction radius of the spatial hash, every pair interacts if not given")
+    parser.add_argument("--png", default=None, help="write the frames as numbered PNG files in this directory")
+    parser.add_argument("--raw", default=None,
+                        help="write the frames as raw rgb24 video to this file, - for the standard output")
+    parser.add_argument("--profile", action="store_true", help="print the time taken by each phase of the frames")
+    parser.add_argument("--profile-csv", default=None, help="write the time of each phase of each frame to this CSV file")
+    parser.add_argument("--profile-trace", default=None,
+                        help="write the phases of the frames to this file, in the Chrome trace event format")
+    args = parser.parse_args(argv)
+
+    createContext()
+    renderer = OffscreenRenderer(args.width, args.height, args.seed, args.radius)
+    for _ in range(args.fish):
+        renderer.vivarium.addFish()
+    for _ in range(args.food):
+        renderer.vivarium.addFood()
+    profiler = renderer.sceneRenderer.profiler
+    profiler.enabled = args.profile or args.profile_csv is not None or args.profile_trace is not None
+    profiler.window = args.frames
+
+    writers = []
+    if args.png is not None:
+        writers.append(PNGSequenceWriter(args.png))
+    if args.raw is not None:
+        writers.append(RawVideoWriter(args.raw))
+
+    start = time.perf_counter()
+    written = renderer.record(args.frames, args.fps, writers)
+    elapsed = time.perf_counter() - start
+    # the standard output may carry the video
+    print(f"{written} frames of {args.width}x{args.height} in {elapsed:.3f}s, "
+          f"{written / max(elapsed, 1e-9):.1f} frames/s, {written / args.fps / max(elapsed, 1e-9):.2f}x realtime",
+          file=sys.stderr)
+    if profiler.enabled:
+        profiler.collectQueries(wait=True)
+        print(profiler.report(), file=sys.stderr)
+        if args.profile_csv is not None:
+            profiler.exportCSV(args.profile_csv)
+        if args.profile_trace is not None:
+            profiler.exportChromeTrace(args.profile_trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Potential functions and small vector kernels shared by the per-creature (CS680PA3.stepForward) and the
+batched (CreatureStore.stepForward) simulation paths.
+
+Every kernel works on a single (3,) vector as well as on a stack of (N, 3) vectors, and only uses element-wise
+operations and reductions over the last axis, so both paths produce the same numbers for the same input.
+"""
+import numpy as np
+
+
+def unit_v(vector: np.ndarray, tol: float = 1E-6) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    if norm == 0 or norm < abs(norm - 1.0) <= tol:
+        return vector
+    else:
+        return vector / norm
+
+
+def d_lower_bound(n: float, log_n: float, x: np.ndarray) -> np.ndarray:
+    # compute the lower bound gradient descent function
+    # n: the number of exponent
+    # log_n: log(n), precomputed for reduced computation
+    # x: the input vector
+    # y = np.pow(n, -x)
+    return -log_n * (n ** -x)
+
+
+def d_upper_bound(n: float, log_n: float, x: np.ndarray) -> np.ndarray:
+    # y = np.pow(n, x)
+    return log_n * (n ** x)
+
+
+def d_gravity(a, b: float, x: np.ndarray) -> np.ndarray:
+    # potential functions for mimic gravity boids.
+    # df(x) = - a / x + b
+    # b: limit point
+    # a / b should be the place you want to cross the 0
+    # a can be a scalar, or a (N, 1) column to give every row its own crossing point
+    sign_x = np.sign(x)
+    result = b - a / np.abs(x)
+    result *= sign_x
+    return result
+
+
+def d_dist(x: np.ndarray) -> np.ndarray:
+    # y = 1 / np.exp(x ** 2)
+    return -2 * x * np.exp(-x ** 2)
+
+
+def d_wall(tank_dimensions: np.ndarray, x: np.ndarray) -> np.ndarray:
+    # potential functions for the tank walls, so objects turn before they run into them
+    wall_drv_step = d_upper_bound(30, 3.4012, x - tank_dimensions / 2.162)
+    wall_drv_step += d_lower_bound(30, 3.4012, x + tank_dimensions / 2.162)
+    return wall_drv_step
+
+
+def length(x: np.ndarray) -> np.ndarray:
+    """
+    Euclidean length along the last axis, keeping that axis so the result broadcasts against x
+    """
+    return np.sqrt(np.sum(x ** 2, axis=-1, keepdims=True))
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    """
+    Normalize along the last axis. Zero vectors are returned unchanged, the same way Point.normalize does.
+    """
+    norm = length(x)
+    return np.divide(x, norm, out=np.array(x, dtype=np.float64), where=norm != 0)
+
+
+def reflect(x: np.ndarray, normal: np.ndarray) -> np.ndarray:
+    """
+    Reflect x against the plane with the given normal, the same way Point.reflect does.
+    """
+    n = normalize(normal)
+    ndp = 2 * np.sum(x * n, axis=-1, keepdims=True)
+    return x - ndp * n
+
+
+def turn(direction: np.ndarray, target: np.ndarray, t: float) -> np.ndarray:
+    """
+    Rotate unit vectors towards unit targets, along the last axis, by t times the angle between them and at most half
+    a turn. t = 1 returns the targets as they are.
+    """
+    if t == 1:
+        return target
+    cos = np.clip(np.sum(direction * target, axis=-1, keepdims=True), -1, 1)
+    side = target - direction * cos
+    angle = np.minimum(np.arccos(cos) * t, np.pi)
+    turned = direction * np.cos(angle) + normalize(side) * np.sin(angle)
+    # aligned or opposite vectors have no plane to turn in
+    return np.where(length(side) > 0, turned, target)
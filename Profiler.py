@@ -0,0 +1,267 @@
+"""
+Per-phase frame timing. Each phase of a frame is timed on the CPU with perf_counter_ns and, for the phases issuing
+GL commands, on the GPU with GL_TIME_ELAPSED queries. Query results are only collected once available, a few frames
+later, so profiling does not stall the pipeline. The last frames are kept in rolling windows to report percentiles,
+and can be exported to CSV or to a Chrome trace (chrome://tracing, or https://ui.perfetto.dev).
+"""
+import collections
+import contextlib
+import csv
+import ctypes
+import json
+import time
+from typing import Dict
+
+import numpy as np
+
+try:
+    try:
+        import OpenGL.GL as gl
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+    # the wrapped version cannot allocate its 64 bits result
+    from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class RollingStats:
+    """
+    The last samples of a measure, in milliseconds
+    """
+    samples = None  # Deque[float]
+
+    def __init__(self, window: int):
+        self.samples = collections.deque(maxlen=window)
+
+    def add(self, value: float):
+        self.samples.append(value)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Mean, 50th, 95th and 99th percentiles and maximum of the samples, empty without any
+        """
+        if not self.samples:
+            return {}
+        values = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+                "max": float(values.max())}
+
+
+class PhaseSample:
+    """
+    One phase of one frame. Times are in nanoseconds, start on the perf_counter_ns clock
+    """
+    frame = 0
+    name = None
+    start = 0
+    cpu = 0
+    gpu = None  # None until the timer query is read, or if the phase is not timed on the GPU
+
+    def __init__(self, frame: int, name: str, start: int, cpu: int):
+        self.frame = frame
+        self.name = name
+        self.start = start
+        self.cpu = cpu
+
+
+class FrameProfiler:
+    """
+    Times the phases of each frame:
+
+        profiler.beginFrame()
+        with profiler.phase("simulate"):
+            ...
+        with profiler.phase("draw", gpu=True):
+            ...
+        profiler.endFrame()
+
+    A whole frame is recorded as the phase "frame". Only one phase at a time can be timed on the GPU, a phase nested
+    in another one timed on the GPU is only timed on the CPU. Timing GPU phases needs a current GL context.
+    """
+    FRAME = "frame"
+
+    enabled = True
+    window = 300  # number of frames the statistics are computed over
+    frame = 0  # number of frames begun
+
+    cpuStats = None  # Dict[str, RollingStats]
+    gpuStats = None  # Dict[str, RollingStats]
+    history = None  # Deque[List[PhaseSample]], the samples of each of the last frames, for export
+
+    __frameStart = None
+    __gpuPhase = None  # the phase currently timed on the GPU
+    __freeQueries = None  # List[int]
+    __pendingQueries = None  # Deque[(query, PhaseSample)], oldest first
+
+    def __init__(self, window: int = 300, historyFrames: int = 3600, enabled: bool = True):
+        """
+        :param window: number of frames the percentiles are computed over
+        :param historyFrames: number of frames kept for export
+        """
+        self.window = window
+        self.enabled = enabled
+        self.cpuStats = {}
+        self.gpuStats = {}
+        self.history = collections.deque(maxlen=historyFrames)
+        self.__freeQueries = []
+        self.__pendingQueries = collections.deque()
+
+    def reset(self):
+        """
+        Forget every sample, e.g. after the scene changed
+        """
+        self.cpuStats = {}
+        self.gpuStats = {}
+        self.history.clear()
+
+    def beginFrame(self):
+        if not self.enabled:
+            return
+        self.collectQueries()
+        self.frame += 1
+        self.__frameStart = time.perf_counter_ns()
+
+    def endFrame(self):
+        if not self.enabled or self.__frameStart is None:
+            return
+        end = time.perf_counter_ns()
+        self.__record(PhaseSample(self.frame, self.FRAME, self.__frameStart, end - self.__frameStart))
+        self.__frameStart = None
+
+    @contextlib.contextmanager
+    def phase(self, name: str, gpu: bool = False):
+        """
+        Time the body of the with statement as the phase name of the current frame
+
+        :param gpu: also time the GL commands issued in it on the GPU
+        """
+        if not self.enabled:
+            yield
+            return
+        query = None
+        if gpu and self.__gpuPhase is None:
+            query = self.__freeQueries.pop() if self.__freeQueries else int(gl.glGenQueries(1)[0])
+            gl.glBeginQuery(gl.GL_TIME_ELAPSED, query)
+            self.__gpuPhase = name
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            sample = PhaseSample(self.frame, name, start, end - start)
+            if query is not None:
+                gl.glEndQuery(gl.GL_TIME_ELAPSED)
+                self.__gpuPhase = None
+                self.__pendingQueries.append((query, sample))
+            self.__record(sample)
+
+    def collectQueries(self, wait: bool = False):
+        """
+        Read the results of the timer queries that are available, oldest first
+
+        :param wait: wait for all of them, e.g. before exporting
+        """
+        while self.__pendingQueries:
+            query, sample = self.__pendingQueries[0]
+            if not wait and not gl.glGetQueryObjectiv(query, gl.GL_QUERY_RESULT_AVAILABLE):
+                # queries complete in order
+                break
+            self.__pendingQueries.popleft()
+            result = ctypes.c_uint64()
+            glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT, ctypes.byref(result))
+            self.__freeQueries.append(query)
+            # the GPU cannot have spent longer on a phase than the time elapsed since it began. Some drivers
+            # (llvmpipe) report a timestamp instead of a duration for the very first query
+            if result.value > time.perf_counter_ns() - sample.start:
+                continue
+            sample.gpu = result.value
+            self.__stats(self.gpuStats, sample.name).add(sample.gpu / 1e6)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Statistics of the last frames, in milliseconds, by phase then by clock:
+
+            {"draw": {"cpu": {"mean": ..., "p50": ..., "p95": ..., "p99": ..., "max": ...}, "gpu": {...}}, ...}
+        """
+        result = {}
+        for name, stats in self.cpuStats.items():
+            result[name] = {"cpu": stats.summary()}
+        for name, stats in self.gpuStats.items():
+            result.setdefault(name, {})["gpu"] = stats.summary()
+        return result
+
+    def report(self) -> str:
+        """
+        The statistics as a table, one line per phase
+        """
+        lines = [f"{'phase':<10} {'clock':<5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms, last {self.window} frames)"]
+        for name, clocks in self.stats().items():
+            for clock, summary in clocks.items():
+                if summary:
+                    lines.append(f"{name:<10} {clock:<5} {summary['p50']:8.3f} {summary['p95']:8.3f} "
+                                 f"{summary['p99']:8.3f} {summary['max']:8.3f}")
+        return "\n".join(lines)
+
+    def exportCSV(self, path: str):
+        """
+        Write one row per phase of each frame kept: frame, phase, start, cpu and gpu times in milliseconds
+        """
+        self.collectQueries(wait=True)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "phase", "start_ms", "cpu_ms", "gpu_ms"])
+            for s in self.samples():
+                writer.writerow([s.frame, s.name, f"{s.start / 1e6:.6f}", f"{s.cpu / 1e6:.6f}",
+                                 "" if s.gpu is None else f"{s.gpu / 1e6:.6f}"])
+
+    def exportChromeTrace(self, path: str):
+        """
+        Write the frames kept in the Chrome trace event format. GPU times are drawn on their own track, starting
+        with the CPU side of their phase since the GPU clock is not synchronized with it.
+        """
+        self.collectQueries(wait=True)
+        events = []
+        for s in self.samples():
+            events.append({"name": s.name, "ph": "X", "pid": 0, "tid": "CPU", "ts": s.start / 1e3, "dur": s.cpu / 1e3,
+                           "args": {"frame": s.frame}})
+            if s.gpu is not None:
+                events.append({"name": s.name, "ph": "X", "pid": 0, "tid": "GPU", "ts": s.start / 1e3,
+                               "dur": s.gpu / 1e3, "args": {"frame": s.frame}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def samples(self):
+        """
+        Every sample of the frames kept, oldest first
+        """
+        for frame in self.history:
+            yield from frame
+
+    def __stats(self, stats: Dict[str, RollingStats], name: str) -> RollingStats:
+        if name not in stats:
+            stats[name] = RollingStats(self.window)
+        return stats[name]
+
+    def __record(self, sample: PhaseSample):
+        self.__stats(self.cpuStats, sample.name).add(sample.cpu / 1e6)
+        if not self.history or self.history[-1][0].frame != sample.frame:
+            self.history.append([])
+        self.history[-1].append(sample)
@@ -0,0 +1,134 @@
+"""
+Per-frame list of draw items. The scene graph is walked once to collect what each component draws, with the state it
+needs, then the list is sorted by program, texture and VAO and submitted in a single pass, so each piece of GL state
+is only changed when the next item needs a different one.
+"""
+import numpy as np
+
+from Component import Component
+from Displayable import Displayable
+from Frustum import Frustum
+from GLBuffer import Texture
+from GLProgram import GLProgram
+from GLUtility import GLUtility
+from SceneGraph import SceneGraph
+
+
+class DrawItem:
+    """
+    Everything needed to draw one component, captured when it is queued
+    """
+    program = None  # GLProgram
+    texture = None  # Texture, None to draw untextured
+    displayObj = None  # Displayable
+    color = None
+    modelMat = None  # world matrix in row-major order, see Component.modelMatrix
+
+    def __init__(self, program: GLProgram, texture, displayObj: Displayable, color, modelMat: np.ndarray):
+        self.program = program
+        self.texture = texture
+        self.displayObj = displayObj
+        self.color = color
+        self.modelMat = modelMat
+
+    def vao(self):
+        """
+        The VAO the item is drawn from, None if its Displayable only knows how to draw itself
+        """
+        if getattr(self.displayObj, "ebo", None) is None:
+            return None
+        return getattr(self.displayObj, "vao", None)
+
+    def sortKey(self):
+        vao = self.vao()
+        return (self.program.program,
+                0 if self.texture is None else self.texture.textureName,
+                0 if vao is None else vao.vao)
+
+
+class RenderQueue:
+    """
+    Collects draw items, then submits them sorted by state:
+
+        queue.collect(topLevelComponent, shaderProg)
+        queue.submit()
+    """
+    items = None  # List[DrawItem]
+    drawCalls = 0  # number of draw calls issued by the last submit
+    vaoBinds = 0  # number of VAO binds issued by the last submit
+
+    def __init__(self):
+        self.items = []
+
+    def clear(self):
+        self.items = []
+
+    def add(self, component: Component, shaderProg: GLProgram):
+        """
+        Queue one component, without its children. Its transformationMat should be up to date.
+
+        :param shaderProg: program to draw with, unless the component's Displayable has its own
+        """
+        if not isinstance(component.displayObj, Displayable):
+            return
+        self.items.append(DrawItem(getattr(component.displayObj, "shaderProg", None) or shaderProg,
+                                   component.texture if component.textureOn else None,
+                                   component.displayObj,
+                                   component.current_color,
+                                   component.modelMatrix()))
+
+    def collect(self, root: Component, shaderProg: GLProgram, frustum: Frustum = None):
+        """
+        Queue every component of the tree under root that has something to draw
+
+        :param frustum: skip the subtrees outside of it, None to queue everything
+        """
+        if frustum is not None:
+            components = frustum.visibleComponents(root)
+        else:
+            graph = root.sceneGraph if root.sceneGraph is not None else SceneGraph(root)
+            components = graph.components()
+        for component in components:
+            self.add(component, shaderProg)
+
+    def submit(self):
+        """
+        Draw the queued items and empty the queue. Items sharing the same state keep the order they were queued in.
+        """
+        items = sorted(self.items, key=DrawItem.sortKey)
+        self.clear()
+        self.drawCalls = 0
+        self.vaoBinds = 0
+
+        boundVao = None
+        for item in items:
+            program = item.program
+            # GLProgram and Texture skip the calls that would not change the GL state
+            program.setMat4("modelMat", item.modelMat.transpose())
+            if program.hasUniform("normalMat"):
+                program.setMat3("normalMat", GLUtility.normalMatrix(item.modelMat))
+            program.setVec3("currentColor", item.color)
+            program.setBool("vertexColorOn", item.displayObj.vertexColors)
+            if item.texture is not None:
+                program.setInt("textureImage", item.texture.bind())
+            else:
+                Texture.bindUnit(0, 0)
+                program.setInt("textureImage", 0)
+
+            vao = item.vao()
+            if vao is None:
+                # the Displayable binds and unbinds its own VAO
+                if boundVao is not None:
+                    boundVao.unbind()
+                    boundVao = None
+                item.displayObj.draw()
+            else:
+                if vao is not boundVao:
+                    vao.bind()
+                    boundVao = vao
+                    self.vaoBinds += 1
+                item.displayObj.ebo.draw()
+            self.drawCalls += 1
+
+        if boundVao is not None:
+            boundVao.unbind()
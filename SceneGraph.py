@@ -0,0 +1,192 @@
+"""
+Flat evaluation of the transformation matrices of a component tree. The tree is compiled once into arrays of nodes in
+topological order, grouped by depth, so every local transform is built with batched NumPy operations and the world
+transforms are computed one level at a time with a single np.matmul per level.
+"""
+from typing import List
+
+import numpy as np
+
+
+def rotationMatrices(angles: np.ndarray, axes: np.ndarray) -> np.ndarray:
+    """
+    Batched GLUtility.rotate, in row-major order.
+
+    :param angles: N rotation angles, in degrees
+    :param axes: N x 3 rotation axes
+    :return: N x 4 x 4 rotation matrices
+    """
+    half = np.radians(angles) * 0.5
+    quats = np.empty((len(angles), 4))
+    quats[:, 0] = np.cos(half)
+    quats[:, 1:] = np.sin(half)[:, None] * axes
+
+    norm = np.linalg.norm(quats, axis=1)
+    degenerate = norm < 1e-6
+    quats /= np.where(degenerate, 1, norm)[:, None]
+    s, a, b, c = quats.T
+
+    result = np.zeros((len(angles), 4, 4))
+    result[:, 0, 0] = 1 - 2 * b * b - 2 * c * c
+    result[:, 1, 0] = 2 * a * b + 2 * s * c
+    result[:, 2, 0] = 2 * a * c - 2 * s * b
+    result[:, 0, 1] = 2 * a * b - 2 * s * c
+    result[:, 1, 1] = 1 - 2 * a * a - 2 * c * c
+    result[:, 2, 1] = 2 * b * c + 2 * s * a
+    result[:, 0, 2] = 2 * a * c + 2 * s * b
+    result[:, 1, 2] = 2 * b * c - 2 * s * a
+    result[:, 2, 2] = 1 - 2 * a * a - 2 * b * b
+    result[:, 3, 3] = 1
+    result[degenerate] = np.identity(4)
+    return result
+
+
+class SceneGraph:
+    """
+    A component tree compiled into flat arrays:
+
+        * nodes: every component of the tree, each parent before its children
+        * parents: index in nodes of the parent of each node, -1 for the root
+        * levels: for each depth below the root, the indices of the nodes at that depth
+
+    The compiled arrays are reused as long as no child is added to or removed from any component, see invalidate.
+    Each update only computes the nodes whose transform changed since the last one.
+    """
+    # bumped by invalidate, a graph compiled for an older version compiles again on its next update
+    version = 0
+
+    root = None
+    nodes = None  # List[Component]
+    parents = None  # np.ndarray
+    levels = None  # List[np.ndarray]
+
+    __compiled_version = -1
+    __parent_mat = None  # the parent transform used by the last update
+
+    def __init__(self, root):
+        self.root = root
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Tell every graph that the structure of some component tree changed
+        """
+        cls.version += 1
+
+    def compile(self):
+        nodes = [self.root]
+        parents = [-1]
+        depths = [0]
+        # breadth first, so the nodes of a level are contiguous and every parent comes before its children
+        i = 0
+        while i < len(nodes):
+            depth = depths[i] + 1
+            for c in nodes[i].children:
+                nodes.append(c)
+                parents.append(i)
+                depths.append(depth)
+            i += 1
+
+        self.nodes = nodes
+        self.parents = np.array(parents, dtype=np.int64)
+        depths = np.array(depths, dtype=np.int64)
+        self.levels = [np.flatnonzero(depths == d) for d in range(1, depths.max() + 1)]
+        self.__compiled_version = SceneGraph.version
+
+    def components(self) -> List:
+        """
+        Every component of the tree, each parent before its children
+        """
+        if self.__compiled_version != SceneGraph.version:
+            self.compile()
+        return self.nodes
+
+    def localTransforms(self, nodes: List) -> np.ndarray:
+        """
+        The transform of each node relative to its parent, as Component.update used to build it:
+        translation @ postRotation @ outRotation @ rotationU @ rotationV @ rotationW @ inRotation @ preRotation @ scale,
+        after the node's parentOffset
+
+        :return: N x 4 x 4 array
+        """
+        n = len(nodes)
+        positions = np.empty((n, 3))
+        angles = np.empty((n, 3))
+        axes = np.empty((n, 3, 3))
+        scales = np.empty((n, 3))
+        posts = np.empty((n, 4, 4))
+        outs = np.empty((n, 4, 4))
+        ins = np.empty((n, 4, 4))
+        pres = np.empty((n, 4, 4))
+        offsets = np.empty((n, 4, 4))
+        quats = []
+        for i, c in enumerate(nodes):
+            positions[i] = c.currentPos.coords[:3]
+            angles[i] = c.uAngle, c.vAngle, c.wAngle
+            axes[i] = c.uAxis.coords[:3], c.vAxis.coords[:3], c.wAxis.coords[:3]
+            scales[i] = c.currentScaling
+            posts[i] = c.postRotationMat
+            outs[i] = c.outRotation
+            ins[i] = c.inRotation
+            pres[i] = c.preRotationMat
+            offsets[i] = c.parentOffsetMat
+            if c.quat is not None:
+                quats.append(i)
+
+        rotations = rotationMatrices(angles.reshape(-1), axes.reshape(-1, 3)).reshape(n, 3, 4, 4)
+        rotation = rotations[:, 0] @ rotations[:, 1] @ rotations[:, 2]
+        # a quaternion overrides the Euler angles
+        for i in quats:
+            rotation[i] = nodes[i].quat.toMatrix().transpose()
+
+        local = np.zeros((n, 4, 4))
+        local[:, :3, 3] = positions
+        local[:, [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+        local = offsets @ local @ posts @ outs @ rotation @ ins @ pres
+        # scaling only multiplies the columns
+        local[:, :, :3] *= scales[:, None, :]
+        return local
+
+    def update(self, parentTransformationMat=None):
+        """
+        Compute the transformationMat of the nodes of the tree that changed. A node is computed again when its local
+        transform is dirty (see Component.localDirty) or when its parent was computed again.
+
+        :param parentTransformationMat: transform of the root's parent, identity if not given
+        """
+        nodes = self.components()
+        if parentTransformationMat is None:
+            parentTransformationMat = np.identity(4)
+
+        n = len(nodes)
+        dirty = np.fromiter((c.localDirty for c in nodes), dtype=bool, count=n)
+        changed = dirty.copy()
+        changed[0] |= self.root.transformationMat is None or self.__parent_mat is None or \
+            not np.array_equal(parentTransformationMat, self.__parent_mat)
+        for level in self.levels:
+            changed[level] |= changed[self.parents[level]]
+        if not changed.any():
+            return
+
+        dirty_indices = np.flatnonzero(dirty)
+        if len(dirty_indices):
+            for i, mat in zip(dirty_indices, self.localTransforms([nodes[i] for i in dirty_indices])):
+                nodes[i].localMat = mat
+                nodes[i].localDirty = False
+
+        # world transforms of the nodes to compute, and of the unchanged parents they are computed from
+        world = np.empty((n, 4, 4))
+        indices = np.flatnonzero(changed)
+        world[indices] = [nodes[i].localMat for i in indices]
+        for i in np.setdiff1d(self.parents[indices[indices > 0]], indices):
+            world[i] = nodes[i].transformationMat
+
+        if changed[0]:
+            world[0] = parentTransformationMat @ world[0]
+        for level in self.levels:
+            level = level[changed[level]]
+            world[level] = world[self.parents[level]] @ world[level]
+
+        for i in indices:
+            nodes[i].transformationMat = world[i]
+        self.__parent_mat = np.array(parentTransformationMat, dtype=np.float64)
@@ -0,0 +1,130 @@
+"""
+Draws a component tree seen from a camera into the current framebuffer. Everything a frame needs from the GL side
+(shader programs, camera uniform block, instanced and sorted renderers, level of detail and frustum culling) is kept
+here, without any window, so the same scene can be shown by Sketch or rendered offscreen, see Offscreen.
+"""
+import numpy as np
+
+from Frustum import Frustum
+from GLBuffer import Texture
+from GLProgram import GLProgram, CameraBlock
+from GLUtility import GLUtility
+from InstanceRenderer import InstanceRenderer
+from LOD import LODSelector
+from MeshCache import MeshCache
+from Profiler import FrameProfiler
+from RenderQueue import RenderQueue
+
+try:
+    try:
+        import OpenGL.GL as gl
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class SceneRenderer:
+    """
+    Create it once the GL context is current, then for each frame:
+
+        sceneRenderer.render(topLevelComponent, cameraPos, lookAtPt, upVector, time)
+    """
+    fov = 45  # vertical field of view, in degrees
+    znear = 0.01
+    zfar = 100
+
+    shaderProg = None  # the regular GLProgram, which the models are built with
+    # projection, view, camera position and time, shared by all shader programs
+    cameraBlock = None
+
+    # draw all copies of each primitive, and all creatures of each species, at once, see InstanceRenderer
+    instanced = True
+    instanceProg = None
+    renderer = None
+    # otherwise, draw components sorted by GL state
+    renderQueue = None
+    # coarser meshes for the creatures that are small on screen, see LOD. None to always draw the finest ones
+    lodSelector = None
+    # skip the creatures outside of the view, see Frustum
+    frustumCulling = True
+    # times the phases of each frame, disabled until enabled, see Profiler
+    profiler = None
+
+    width = 1
+    height = 1
+    viewMat = None
+    perspMat = None
+
+    def __init__(self, width: int, height: int):
+        # buffers and bindings of a previous GL context cannot be used anymore
+        MeshCache.clear()
+        GLProgram.resetState()
+        Texture.resetState()
+        self.shaderProg = GLProgram()
+        self.shaderProg.compile()
+        self.instanceProg = GLProgram(instanced=True)
+        self.instanceProg.compile()
+        self.renderer = InstanceRenderer(self.instanceProg)
+        self.renderQueue = RenderQueue()
+        self.lodSelector = LODSelector()
+        self.cameraBlock = CameraBlock()
+        self.profiler = FrameProfiler(enabled=False)
+
+        gl.glClearDepth(1.0)
+        # enable depth checking
+        gl.glEnable(gl.GL_DEPTH_TEST)
+        self.resize(width, height)
+        self.shaderProg.setMat4("modelMat", np.identity(4))
+
+    def resize(self, width: int, height: int):
+        """
+        Fit the viewport and the perspective matrix to a new size of the framebuffer
+        """
+        self.width = max(1, width)
+        self.height = max(1, height)
+        gl.glViewport(0, 0, self.width, self.height)
+        self.perspMat = GLUtility.perspective(self.fov, self.width, self.height, self.znear, self.zfar)
+        self.cameraBlock.update(projectionMat=self.perspMat)
+
+    def render(self, root, cameraPos, lookAtPt, upVector, time: float = 0, background=(0.2, 0.3, 0.3)):
+        """
+        Clear the framebuffer and draw the tree under root
+
+        :param time: simulated time, for the shaders
+        :param background: clear color, RGB in [0, 1]
+        """
+        profiler = self.profiler
+        with profiler.phase("clear", gpu=True):
+            gl.glClearColor(*background, 1.0)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
+
+        # These are per-frame updates to the shader! One upload of the camera block serves every program
+        self.viewMat = GLUtility().view(cameraPos, lookAtPt, upVector)
+        self.cameraBlock.update(viewMat=self.viewMat, cameraPos=cameraPos, time=time)
+
+        with profiler.phase("update"):
+            root.update(np.identity(4))
+        with profiler.phase("lod"):
+            if self.lodSelector is not None:
+                self.lodSelector.update(root, cameraPos, self.perspMat, self.height)
+        frustum = Frustum.fromCamera(self.viewMat, self.perspMat) if self.frustumCulling else None
+        with profiler.phase("draw", gpu=True):
+            if self.instanced:
+                self.renderer.draw(root, self.shaderProg, frustum)
+            else:
+                self.renderQueue.collect(root, self.shaderProg, frustum)
+                self.renderQueue.submit()
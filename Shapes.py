@@ -4,11 +4,13 @@ Implements four geometric primitives (Sphere, Cube, Cone, Cylinder) using the Di
 Modified by Daniel Scrivener 07/2022
 """
 
+import functools
 from time import time_ns
 from typing import Union, List, Tuple
 
-from collada import *
 from DisplayableMesh import DisplayableMesh
+import LOD
+import MeshAssets
 from Component import Component
 import GLUtility
 import ColorType
@@ -18,33 +20,34 @@ from GLProgram import GLProgram
 from Point import Point
 
 
+@functools.lru_cache(maxsize=None)
 def getVertexData(filename):
+    """
+    Read the first triangle set of a collada file, from its binary cache when it is up to date (see MeshAssets).
+    Each file is only read once, later calls return the same arrays.
 
-    colladaData = Collada(filename)
+    :return: the interleaved vertices, 11 floats each (position, normal, color, UV), with only the positions filled,
+        and the triangle indices, both flat
+    """
+    return MeshAssets.loadVertexData(filename)
 
-    # generate vertices from model data
-    # also generate indices
 
-    geo = colladaData.geometries[0]
-    tridata = geo.primitives[0]
-    trilist = list(tridata)
+@functools.lru_cache(maxsize=None)
+def getBoxData(filename):
+    """
+    The box around the mesh of a collada file, for the coarsest level of detail (see LOD)
+    """
+    return LOD.boxMesh(getVertexData(filename)[0])
 
-    # construct vertex list
-    vertices = np.array([])
-    
-    for vert in tridata.vertex:
-        vert = np.concatenate((vert, [0.,0.,0.]), axis=0) # empty normals
-        vert = np.concatenate((vert, [0.,0.,0.]), axis=0) # color
-        vert = np.concatenate((vert, [0.,0.]), axis=0) # empty UV
-        vertices = np.append(vertices, vert)
 
-    # construct indices
-    indices = np.array([])
-
-    for tri in trilist:
-        indices = np.append(indices, tri.indices)
-
-    return (vertices, indices)
+@functools.lru_cache(maxsize=None)
+def getFittedLowPolyData(filenameLP, filename):
+    """
+    The low poly mesh of a collada file fitted to the bounds of its full mesh, which it stands for at the low poly
+    level of detail (see LOD). The low poly assets are not the same size as the full ones.
+    """
+    vertices, indices = getVertexData(filenameLP)
+    return LOD.fitToBounds(vertices, getVertexData(filename)[0]), indices
 
 
 class Shape(Component):
@@ -52,6 +55,13 @@ class Shape(Component):
     indexData = None
     mesh = None
 
+    # .dae files of the primitive, defined by each subclass. They are only read when first needed, see meshData
+    pathname = None
+    pathnameLP = None
+
+    lowPoly = False  # whether this instance uses the low poly version of the primitive
+    meshScale = None  # the scale of this instance, applied by modelMatrix
+
     def __init__(self,
                  position: Point,
                  shaderProg: GLProgram,
@@ -74,20 +84,52 @@ class Shape(Component):
             rather than the object's center
         :type limb: boolean
         """
-        self.mesh = DisplayableMesh(shaderProg, scale, vertexData, indexData, color)
+        self.meshScale = np.array(scale, dtype=np.float64)
+        self.mesh = DisplayableMesh(shaderProg, scale, vertexData, indexData, color, self.meshKey,
+                                    lodLevels=self.lodLevels())
         super(Shape, self).__init__(position, self.mesh)
 
+    def modelMatrix(self):
+        # the shared mesh is unscaled, so this shape's own scale goes in the matrix
+        return self.transformationMat * np.append(self.meshScale, 1)
+
+    @classmethod
+    def meshData(cls, lowPoly: bool = False):
+        """
+        The unscaled vertices and indices shared by every instance of this primitive
+
+        :param lowPoly: use the low poly version, if this primitive has one
+        """
+        if lowPoly and cls.pathnameLP is not None:
+            return getVertexData(cls.pathnameLP)
+        return getVertexData(cls.pathname)
+
+    def lodLevels(self):
+        """
+        The coarser levels of detail of this primitive, see LOD: its low poly version at the size of the mesh this
+        instance uses, if it does not use it already, then the box around that mesh
+        """
+        cls = type(self)
+        if cls.pathname is None:
+            return []
+        lowPoly = None
+        if not self.lowPoly and cls.pathnameLP is not None:
+            lowPoly = (*getFittedLowPolyData(cls.pathnameLP, cls.pathname), (cls.__name__, "fittedLowPoly"))
+        pathname = cls.pathnameLP if self.lowPoly and cls.pathnameLP is not None else cls.pathname
+        return [lowPoly, (*getBoxData(pathname), ("box",) + self.meshKey)]
+
+    @property
+    def meshKey(self):
+        """
+        Shapes with the same key share the same unscaled geometry
+        """
+        return type(self).__name__, self.lowPoly
+
 
 class Cone(Shape):
 
     pathname = "assets/cone0.dae"
     pathnameLP = "assets/coneLP.dae"
-    data = getVertexData(pathname)
-    dataLP = getVertexData(pathnameLP)
-    vertices = data[0]
-    verticesLP = dataLP[0]
-    indices = data[1]
-    indicesLP = dataLP[1]
 
     def __init__(self,
                  position: Point,
@@ -105,10 +147,11 @@ class Cone(Shape):
         :param color: vertex color to be applied uniformly
         :type color: ColorType
         """
+        self.lowPoly = lowPoly
         if lowPoly:
-            super(Cone, self).__init__(position, shaderProg, scale, self.verticesLP.copy(), self.indicesLP.copy(), color)
+            super(Cone, self).__init__(position, shaderProg, scale, *self.meshData(True), color)
         else:
-            super(Cone, self).__init__(position, shaderProg, scale, self.vertices.copy(), self.indices.copy(), color)
+            super(Cone, self).__init__(position, shaderProg, scale, *self.meshData(), color)
 
         # translate object by -z extent of the new component so that rotations occur @ the joint
         # rather than around the object's true center
@@ -122,9 +165,6 @@ class Cone(Shape):
 class Cube(Shape):
 
     pathname = "assets/cube0.dae"
-    data = getVertexData(pathname)
-    vertices = data[0]
-    indices = data[1]
 
     def __init__(self,
                  position: Point,
@@ -141,7 +181,7 @@ class Cube(Shape):
         :param color: vertex color to be applied uniformly
         :type color: ColorType
         """
-        super(Cube, self).__init__(position, shaderProg, scale, self.vertices.copy(), self.indices.copy(), color)
+        super(Cube, self).__init__(position, shaderProg, scale, *self.meshData(), color)
         # translate object by -z extent of the new component so that rotations occur @ the joint
         # rather than around the object's true center
         glutility = GLUtility.GLUtility()
@@ -155,12 +195,6 @@ class Cylinder(Shape):
 
     pathname = "assets/cylinder0.dae"
     pathnameLP = "assets/cylinderLP.dae"
-    data = getVertexData(pathname)
-    dataLP = getVertexData(pathnameLP)
-    vertices = data[0]
-    verticesLP = dataLP[0]
-    indices = data[1]
-    indicesLP = dataLP[1]
 
     def __init__(self,
                  position: Point,
@@ -178,10 +212,11 @@ class Cylinder(Shape):
         :param color: vertex color to be applied uniformly
         :type color: ColorType
         """
+        self.lowPoly = lowPoly
         if lowPoly:
-            super(Cylinder, self).__init__(position, shaderProg, scale, self.verticesLP.copy(), self.indicesLP.copy(), color)
+            super(Cylinder, self).__init__(position, shaderProg, scale, *self.meshData(True), color)
         else:
-            super(Cylinder, self).__init__(position, shaderProg, scale, self.vertices.copy(), self.indices.copy(), color)
+            super(Cylinder, self).__init__(position, shaderProg, scale, *self.meshData(), color)
         # translate object by -z extent of the new component so that rotations occur @ the joint
         # rather than around the object's true center
         glutility = GLUtility.GLUtility()
@@ -195,12 +230,6 @@ class Sphere(Shape):
 
     pathname = "assets/sphere0.dae"
     pathnameLP = "assets/sphereLP.dae"
-    data = getVertexData(pathname)
-    dataLP = getVertexData(pathnameLP)
-    vertices = data[0]
-    verticesLP = dataLP[0]
-    indices = data[1]
-    indicesLP = dataLP[1]
 
     def __init__(self,
                  position: Point,
@@ -223,10 +252,11 @@ class Sphere(Shape):
             Set this to False for eyes or other ball joints.
         :type limb: boolean
         """
+        self.lowPoly = lowPoly
         if lowPoly:
-            super(Sphere, self).__init__(position, shaderProg, scale, self.verticesLP.copy(), self.indicesLP.copy(), color)
+            super(Sphere, self).__init__(position, shaderProg, scale, *self.meshData(True), color)
         else:
-            super(Sphere, self).__init__(position, shaderProg, scale, self.vertices.copy(), self.indices.copy(), color)
+            super(Sphere, self).__init__(position, shaderProg, scale, *self.meshData(), color)
         # translate object by -z extent of the new component so that rotations occur @ the joint
         # rather than around the object's true center   
         glutility = GLUtility.GLUtility()
@@ -0,0 +1,74 @@
+"""
+Fixed timestep clock, so the simulation advances at the same rate however fast frames are rendered.
+"""
+import time
+
+# length of one simulation tick, in seconds
+DEFAULT_DT = 1 / 120
+
+
+class SimClock:
+    """
+    Accumulates the real time elapsed between frames and turns it into a whole number of simulation ticks of length
+    dt. Whatever is left over is kept for the next frame, and alpha tells how far the rendered frame is between the
+    last two ticks, so transforms can be interpolated when rendering runs faster than the simulation.
+    """
+    dt = DEFAULT_DT
+    # at most this many ticks are run in one frame, the rest of the lag is dropped instead of piling up
+    max_ticks = 8
+    accumulator = 0.0
+    ticks = 0  # total number of ticks since start
+
+    __last_time = None
+
+    def __init__(self, dt: float = DEFAULT_DT, max_ticks: int = 8):
+        if dt <= 0:
+            raise ValueError("simulation timestep should be positive")
+        self.dt = dt
+        self.max_ticks = max_ticks
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the time elapsed so far, e.g. after the simulation was paused
+        """
+        self.accumulator = 0.0
+        self.__last_time = None
+
+    def advance(self, now: float = None) -> int:
+        """
+        Add the time elapsed since the last call.
+
+        :param now: current time in seconds, defaults to time.perf_counter()
+        :return: the number of ticks to simulate for this frame
+        """
+        if now is None:
+            now = time.perf_counter()
+        if self.__last_time is None:
+            self.__last_time = now
+            return 0
+        self.accumulator += max(0.0, now - self.__last_time)
+        self.__last_time = now
+
+        ticks = int(self.accumulator // self.dt)
+        if ticks > self.max_ticks:
+            ticks = self.max_ticks
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.dt
+        self.ticks += ticks
+        return ticks
+
+    @property
+    def time(self) -> float:
+        """
+        Simulated time since start, in seconds, including the part of the current tick already elapsed
+        """
+        return (self.ticks + self.alpha) * self.dt
+
+    @property
+    def alpha(self) -> float:
+        """
+        Position of the current frame between the last tick (0) and the next one (1)
+        """
+        return min(1.0, self.accumulator / self.dt)
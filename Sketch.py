@@ -9,9 +9,9 @@ First version Created on 09/28/2018
 Modified by Daniel Scrivener 07/2022
 """
 
+import argparse
 import os
 import math
-import random
 import time
 
 import numpy as np
@@ -19,9 +19,10 @@ import numpy as np
 from Point import Point
 from CanvasBase import CanvasBase
 import ColorType
-from GLProgram import GLProgram
-from GLBuffer import VAO, VBO, EBO, Texture
 from Vivarium import Vivarium
+from SceneRenderer import SceneRenderer
+from Capture import FrameRecorder, PNGSequenceWriter
+from Profiler import FrameProfiler
 from Quaternion import Quaternion
 import GLUtility
 
@@ -100,6 +101,12 @@ class Sketch(CanvasBase):
     texture = None
     shaderProg = None
     glutility = None
+    # programs, camera state and renderers drawing the scene, see SceneRenderer
+    sceneRenderer = None
+    # reads back every frame while recording, see Capture
+    recorder = None
+    # title of the window before the frame times were shown in it
+    windowTitle = None
 
     frameCount = 0
 
@@ -110,20 +117,23 @@ class Sketch(CanvasBase):
     cameraTheta = None  # theta on horizontal sphere cut, in range [0, 2pi]
     cameraPhi = None  # in range [-pi, pi], for smooth purpose
 
-    viewMat = None
-    perspMat = None
-
     pauseScene = False
+    # seed of the simulation, see Vivarium. None for a different run every time
+    seed = None
+    # interaction radius of the creatures, see Vivarium. None lets every pair interact
+    interactionRadius = None
 
     # models
     basisAxes = None
     scene = None
 
-    def __init__(self, parent):
+    def __init__(self, parent, seed: int = None, interactionRadius: float = None):
         """
         Init everything. You should set your model here.
         """
         super(Sketch, self).__init__(parent)
+        self.seed = seed
+        self.interactionRadius = interactionRadius
         # prepare OpenGL context
         # Initialize context attributes, this is needed by MacOS!
         contextAttrib = glcanvas.GLContextAttrs()
@@ -154,11 +164,12 @@ class Sketch(CanvasBase):
     def InitGL(self):
         # self.texture = Texture()
 
-        self.shaderProg = GLProgram()
-        self.shaderProg.compile()
+        self.sceneRenderer = SceneRenderer(self.size.width, self.size.height)
+        self.shaderProg = self.sceneRenderer.shaderProg
 
         # instantiate models, then can only be done with a compiled GL program
-        self.vivarium = Vivarium(self, self.shaderProg)  # all things are here
+        # all things are here
+        self.vivarium = Vivarium(self, self.shaderProg, self.seed, self.interactionRadius)
         
         self.topLevelComponent.clear()
         self.topLevelComponent.addChild(self.vivarium)
@@ -166,19 +177,6 @@ class Sketch(CanvasBase):
 
         self.components = self.vivarium.components
 
-        gl.glClearColor(0.2, 0.3, 0.3, 1.0)
-        gl.glClearDepth(1.0)
-        gl.glViewport(0, 0, self.size[0], self.size[1])
-
-        # enable depth checking
-        gl.glEnable(gl.GL_DEPTH_TEST)
-
-        # set basic viewing matrix
-        self.perspMat = self.glutility.perspective(45, self.size.width, self.size.height, 0.01, 100)
-        self.shaderProg.setMat4("projectionMat", self.perspMat)
-        self.shaderProg.setMat4("viewMat", self.glutility.view(self.getCameraPos(), self.lookAtPt, self.upVector))
-        self.shaderProg.setMat4("modelMat", np.identity(4))
-
     def getCameraPos(self):
         ct = math.cos(self.cameraTheta)
         st = math.sin(self.cameraTheta)
@@ -190,15 +188,13 @@ class Sketch(CanvasBase):
         return result
 
     def OnResize(self, event):
-        contextAttrib = glcanvas.GLContextAttrs()
-        contextAttrib.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3).EndList()
-        self.context = glcanvas.GLContext(self, ctxAttrs=contextAttrib)
-
         self.size = self.GetClientSize()
         self.size[1] = max(1, self.size[1])  # avoid divided by 0
-        self.SetCurrent(self.context)
 
-        self.init = False
+        # the context, its buffers and the scene stay valid, only the projection depends on the size
+        if self.init:
+            self.SetCurrent(self.context)
+            self.sceneRenderer.resize(self.size.width, self.size.height)
         self.Refresh(eraseBackground=True)
         self.Update()
 
@@ -215,20 +211,69 @@ class Sketch(CanvasBase):
         self.OnDraw()
 
     def OnDraw(self):
-        gl.glClearColor(*self.backgroundColor, 1.0)
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-
-        # These are per-frame updates to the shader! Update the viewing matrix and the joint transforms
-        self.viewMat = self.glutility.view(self.getCameraPos(), self.lookAtPt, self.upVector)
-        self.shaderProg.setMat4("viewMat", self.viewMat)
-
-        self.topLevelComponent.update(np.identity(4))
-        self.topLevelComponent.draw(self.shaderProg)
-
-        # perform the next step of the animation
-        self.vivarium.animationUpdate()
-
-        self.SwapBuffers()
+        profiler = self.sceneRenderer.profiler
+        profiler.beginFrame()
+        # run the simulation ticks due since the last frame, however long it took to render
+        with profiler.phase("simulate"):
+            self.vivarium.advance()
+
+        self.sceneRenderer.render(self.topLevelComponent, self.getCameraPos(), self.lookAtPt, self.upVector,
+                                  self.vivarium.clock.time, self.backgroundColor)
+        if self.recorder is not None:
+            # read from the back buffer, before it is swapped
+            with profiler.phase("capture", gpu=True):
+                self.recorder.capture(self.size.width, self.size.height)
+
+        with profiler.phase("swap"):
+            self.SwapBuffers()
+        profiler.endFrame()
+
+        if profiler.enabled and profiler.frame % 30 == 0:
+            self.showProfile()
+
+    def toggleProfiling(self):
+        """
+        Start timing the phases of every frame, or stop it and print their statistics
+        """
+        profiler = self.sceneRenderer.profiler
+        if not profiler.enabled:
+            profiler.reset()
+            profiler.enabled = True
+            self.windowTitle = self.GetTopLevelParent().GetTitle()
+        else:
+            profiler.collectQueries(wait=True)
+            print(profiler.report())
+            profiler.enabled = False
+            self.GetTopLevelParent().SetTitle(self.windowTitle)
+
+    def showProfile(self):
+        """
+        Show the 95th percentile of the frame time and of its longest phases in the window title
+        """
+        stats = self.sceneRenderer.profiler.stats()
+        frame = stats.pop(FrameProfiler.FRAME, {}).get("cpu")
+        if not frame:
+            return
+        phases = sorted(((name, clocks["cpu"]["p95"]) for name, clocks in stats.items() if clocks.get("cpu")),
+                        key=lambda phase: -phase[1])
+        gpu = sum(clocks["gpu"]["p95"] for clocks in stats.values() if clocks.get("gpu"))
+        title = f"{self.windowTitle} | frame p95 {frame['p95']:.1f} ms ({1000 / max(frame['p50'], 1e-6):.0f} fps)"
+        title += "".join(f" | {name} {value:.1f}" for name, value in phases[:3])
+        title += f" | gpu {gpu:.1f}"
+        self.GetTopLevelParent().SetTitle(title)
+
+    def toggleRecording(self):
+        """
+        Start writing every frame shown to a new directory of numbered PNG files under captures/, or stop it
+        """
+        if self.recorder is None:
+            directory = os.path.join("captures", time.strftime("%Y%m%d-%H%M%S"))
+            self.recorder = FrameRecorder([PNGSequenceWriter(directory)])
+            print("Recording to", directory)
+        else:
+            self.recorder.close()
+            print(self.recorder.count, "frames recorded")
+            self.recorder = None
 
     def OnDestroy(self, event):
         """
@@ -237,8 +282,12 @@ class Sketch(CanvasBase):
         :param event: Window destroy event
         :return: None
         """
+        if self.recorder is not None:
+            self.recorder.close()
         if self.shaderProg is not None:
             del self.shaderProg
+        if self.sceneRenderer is not None:
+            del self.sceneRenderer
         super(Sketch, self).OnDestroy(event)
 
     def Interrupt_Scroll(self, wheelRotation):
@@ -268,11 +317,11 @@ class Sketch(CanvasBase):
         """
         result1 = glu.gluUnProject(x, y, 0.0,
                                    np.identity(4),
-                                   self.viewMat @ self.perspMat,
+                                   self.sceneRenderer.viewMat @ self.sceneRenderer.perspMat,
                                    gl.glGetIntegerv(gl.GL_VIEWPORT))
         result2 = glu.gluUnProject(x, y, 1.0,
                                    np.identity(4),
-                                   self.viewMat @ self.perspMat,
+                                   self.sceneRenderer.viewMat @ self.sceneRenderer.perspMat,
                                    # be careful, the concate of view and persp is called projection matrix in opengl
                                    gl.glGetIntegerv(gl.GL_VIEWPORT))
         result = Point([(1 - u) * r1 + u * r2 for r1, r2 in zip(result1, result2)])
@@ -376,17 +425,26 @@ class Sketch(CanvasBase):
         elif chr(keycode) in "fF":
             self.vivarium.addFood()
             self.update()
+        elif chr(keycode) in "cC":
+            self.toggleRecording()
+        elif chr(keycode) in "tT":
+            self.toggleProfiling()
 
 
 if __name__ == "__main__":
     print("This is the main entry! ")
+    parser = argparse.ArgumentParser(description="Show the vivarium.")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the simulation, to reproduce a run")
+    parser.add_argument("--radius", type=float, default=None,
+                        help="interaction radius of the spatial hash, every pair interacts if not given")
+    args = parser.parse_args()
     app = wx.App(False)
     # Set FULL_REPAINT_ON_RESIZE will repaint everything when scaling the frame,
     # here is the style setting for it: wx.DEFAULT_FRAME_STYLE | wx.FULL_REPAINT_ON_RESIZE
     # Resize disabled in this one
     frame = wx.Frame(None, size=(500, 500), title="3D Vivarium",
                      style=wx.DEFAULT_FRAME_STYLE | wx.FULL_REPAINT_ON_RESIZE)  # Disable Resize: ^ wx.RESIZE_BORDER
-    canvas = Sketch(frame)
+    canvas = Sketch(frame, args.seed, args.radius)
 
     frame.Show()
     app.MainLoop()
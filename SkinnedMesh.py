@@ -0,0 +1,95 @@
+"""
+A mesh moved on the GPU by bone matrices. Each vertex is bound to up to four bones with weights, and the world
+matrices of the bones are uploaded with every draw, so a whole creature with moving joints is one draw call.
+
+Only the skinning runs on the GPU. The swimming motion is still animated on the CPU: the joint angles of every
+creature are stepped in CS680PA3.animationUpdate, their world matrices are computed by the scene graph update, and
+the bones are uploaded every frame, per creature here or per species through InstanceRenderer.boneData. Benchmark
+times these stages.
+"""
+from typing import List
+
+import numpy as np
+
+import ColorType
+import LOD
+from Displayable import Displayable
+from GLProgram import GLProgram, MAX_BONES
+from GLUtility import GLUtility
+from MeshCache import MeshCache, SharedMesh, SKINNED_VERTEX_ATTRIBS
+
+
+class SkinnedMesh(Displayable):
+    """
+    Vertices are 19 floats: position, normal, color and UV as in DisplayableMesh, then 4 bone indices and their 4
+    weights. Positions and normals are in the space of the bones they are bound to, colors are always taken from the
+    vertices.
+    """
+    shaderProg = None  # the skinned variant of the program given to the constructor
+    bones = None  # List[Component], whose transformationMat move the vertices bound to them
+
+    vertices = None
+    indices = None
+    defaultColor = None
+    vertexColors = True
+
+    meshKey = None  # meshes with the same key share their buffers, see MeshCache
+    sharedMesh = None
+
+    # (vertexData, indexData, meshKey) of each level of detail the mesh has, the most detailed first, see LOD
+    levels = None
+    levelIds = None  # the level each of them is used from
+    lodLevel = 0  # index in levels of the mesh drawn
+    sharedMeshes = None  # uploaded mesh of each level
+
+    def __init__(self, shaderProg: GLProgram, bones: List, vertexData, indexData, meshKey=None, lodLevels=None):
+        """
+        :param shaderProg: compiled shader program, its skinned variant is used
+        :param bones: components whose world transforms drive the mesh, in the order the vertices refer to them
+        :param vertexData: vertices, 19 floats each
+        :param indexData: triangle indices
+        :param meshKey: key to share the uploaded data with every mesh having the same key, None to keep it private
+        :param lodLevels: (vertexData, indexData, meshKey) of the coarser levels of detail, finest first, None for a
+            level the mesh does not have
+        """
+        super(SkinnedMesh, self).__init__()
+        if len(bones) > MAX_BONES:
+            raise ValueError(f"A skinned mesh can have at most {MAX_BONES} bones")
+
+        self.shaderProg = shaderProg.variant(skinned=True)
+        self.bones = bones
+        self.vertices = vertexData
+        self.indices = indexData
+        self.meshKey = meshKey
+        self.levels, self.levelIds = LOD.presentLevels((vertexData, indexData, meshKey), lodLevels)
+        self.defaultColor = np.array(ColorType.WHITE.getRGB())
+
+    def initialize(self):
+        """
+        Upload every level of the mesh, unless another mesh with the same key already did
+        """
+        self.sharedMeshes = []
+        for vertices, indices, meshKey in self.levels:
+            if meshKey is None:
+                sharedMesh = SharedMesh(vertices, indices, SKINNED_VERTEX_ATTRIBS)
+            else:
+                sharedMesh = MeshCache.get(meshKey, vertices, indices, SKINNED_VERTEX_ATTRIBS)
+            sharedMesh.getVAO(self.shaderProg)
+            self.sharedMeshes.append(sharedMesh)
+        self.setLODLevel(self.levelIds[self.lodLevel])
+
+    def setLODLevel(self, level):
+        """
+        Draw from another level of detail, or from the finer level drawn in its place if the mesh does not have it
+        """
+        self.lodLevel = LOD.levelIndex(self.levelIds, level)
+        if self.sharedMeshes is not None:
+            self.sharedMesh = self.sharedMeshes[self.lodLevel]
+
+    def draw(self):
+        # no vao/ebo attributes, so RenderQueue lets the mesh draw itself with its bone matrices
+        mats = np.array([b.transformationMat for b in self.bones])
+        self.shaderProg.setMat4Array("bones", mats.transpose(0, 2, 1))
+        if self.shaderProg.hasUniform("boneNormals"):
+            self.shaderProg.setMat3Array("boneNormals", GLUtility.normalMatrix(mats))
+        self.sharedMesh.draw(self.shaderProg)
@@ -0,0 +1,118 @@
+"""
+Uniform grid over the tank box, used to find the creatures that are close enough to interact with each other
+without testing every pair.
+"""
+from typing import List, Tuple, Union
+
+import numpy as np
+
+
+def _neighbourOffsets(reach: int) -> np.ndarray:
+    """
+    Offsets of a cell and of every cell at most reach cells away from it along each axis
+    """
+    r = range(-reach, reach + 1)
+    return np.array([(x, y, z) for x in r for y in r for z in r])
+
+
+class SpatialHash:
+    """
+    Points are bucketed into cubic cells of size cell_size covering the tank, then sorted by cell so each cell is a
+    contiguous range of the sorted order. A query only looks at the cells within ceil(radius / cell_size) cells of
+    a point, so it is answered exactly and is cheapest for a radius up to cell_size (the cell and its 26 neighbours).
+
+    The grid is rebuilt from scratch with every call to rebuild, which is a single O(N log N) sort of cell keys.
+    """
+    cell_size = None
+    origin = None  # lower corner of the tank
+    shape = None  # number of cells along each axis
+
+    __points = None
+    __cells = None
+    __order = None  # point indices sorted by cell key
+    __sorted_keys = None
+
+    def __init__(self, tank_dimensions: Union[List[float], np.ndarray], cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell size of the spatial hash should be positive")
+        tank_dimensions = np.array(tank_dimensions, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        self.origin = -tank_dimensions / 2
+        self.shape = np.maximum(np.ceil(tank_dimensions / self.cell_size).astype(np.int64), 1)
+        self.rebuild(np.zeros((0, 3)))
+
+    def __len__(self):
+        return len(self.__points)
+
+    def _key(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[..., 0] * self.shape[1] + cells[..., 1]) * self.shape[2] + cells[..., 2]
+
+    def _reach(self, radius: float) -> int:
+        return max(1, int(np.ceil(radius / self.cell_size)))
+
+    def rebuild(self, points: np.ndarray) -> None:
+        """
+        Bucket the points again. Points outside the tank are put in the nearest border cell.
+
+        :param points: N x 3 array of positions
+        """
+        self.__points = np.asarray(points, dtype=np.float64)
+        cells = np.floor((self.__points - self.origin) / self.cell_size).astype(np.int64)
+        self.__cells = np.clip(cells, 0, self.shape - 1)
+        keys = self._key(self.__cells)
+        self.__order = np.argsort(keys, kind="stable")
+        self.__sorted_keys = keys[self.__order]
+
+    def pairs(self, radius: float, rows: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every pair of distinct points closer than radius.
+
+        :param radius: query radius
+        :param rows: only look for the neighbours of these points, defaults to all points
+        :return: two index arrays (i, j), sorted by i and then by j
+        """
+        if rows is None:
+            rows = np.arange(len(self.__points))
+        rows = np.asarray(rows, dtype=np.int64)
+
+        all_i = []
+        all_j = []
+        for offset in _neighbourOffsets(self._reach(radius)):
+            cells = self.__cells[rows] + offset
+            inside = np.all((cells >= 0) & (cells < self.shape), axis=1)
+            keys = self._key(cells[inside])
+            start = np.searchsorted(self.__sorted_keys, keys, side="left")
+            count = np.searchsorted(self.__sorted_keys, keys, side="right") - start
+            total = int(count.sum())
+            if total == 0:
+                continue
+            # expand every [start, start + count) range into one flat array of positions in the sorted order
+            first = np.cumsum(count) - count
+            sorted_pos = np.repeat(start - first, count) + np.arange(total)
+            all_i.append(np.repeat(rows[inside], count))
+            all_j.append(self.__order[sorted_pos])
+
+        if not all_i:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        i = np.concatenate(all_i)
+        j = np.concatenate(all_j)
+        diff = self.__points[i] - self.__points[j]
+        keep = (i != j) & (np.sum(diff ** 2, axis=1) < radius * radius)
+        i, j = i[keep], j[keep]
+        order = np.lexsort((j, i))
+        return i[order], j[order]
+
+    def query(self, point: Union[List[float], np.ndarray], radius: float) -> np.ndarray:
+        """
+        Indices of the points closer than radius to the given point, in ascending order.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        cell = np.clip(np.floor((point - self.origin) / self.cell_size).astype(np.int64), 0, self.shape - 1)
+        cells = cell + _neighbourOffsets(self._reach(radius))
+        cells = cells[np.all((cells >= 0) & (cells < self.shape), axis=1)]
+        keys = self._key(cells)
+        start = np.searchsorted(self.__sorted_keys, keys, side="left")
+        end = np.searchsorted(self.__sorted_keys, keys, side="right")
+        candidates = np.concatenate([self.__order[s:e] for s, e in zip(start, end)])
+        diff = self.__points[candidates] - point
+        return np.sort(candidates[np.sum(diff ** 2, axis=1) < radius * radius])
@@ -0,0 +1,69 @@
+"""
+Simulation parameters of every creature in the vivarium, and where they are spawned in the tank.
+This module has no GL dependency, so the headless simulation can share it with the models.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+class Species:
+    """
+    Parameters used by the simulation, all relative to the unscaled model:
+
+        * boundary_radius: radius of the bounding sphere, used for collisions and wall reflection
+        * boundary_center: center of the bounding sphere
+        * speed: distance travelled per second
+        * food_chain_level: the smaller number represents the higher level
+        * drifting: the creature does not steer, and only drifts along its step vector
+        * size: uniform scale the vivarium gives to the model
+    """
+    name = None
+    boundary_radius: float = 1.0
+    boundary_center: Tuple[float, float, float] = (0, 0, 0)
+    speed: float = 60
+    food_chain_level: int = 0
+    drifting: bool = False
+    size: float = 1.0
+
+    def __init__(self, name, boundary_radius, boundary_center, speed, food_chain_level, size, drifting=False):
+        self.name = name
+        self.boundary_radius = boundary_radius
+        self.boundary_center = boundary_center
+        self.speed = speed
+        self.food_chain_level = food_chain_level
+        self.size = size
+        self.drifting = drifting
+
+    def __repr__(self):
+        return f"Species({self.name})"
+
+
+SHARK = Species("Shark", 1.8, (0, 0, 0), 6, 100, 0.25)
+SALMON = Species("Salmon", 2, (0, 0, -1.7), 36, 200, 0.1)
+COD = Species("Cod", 1.6, (0, 0, -1.2), 36, 200, 0.1)
+FOOD = Species("Food", 1, (0, 0, 0), 24, 1000, 0.07, drifting=True)
+
+
+def init_fish_pos(rng: np.random.Generator) -> np.ndarray:
+    return rng.uniform(low=-1.5, high=1.5, size=(3,))
+
+
+def init_fish_food_pos(rng: np.random.Generator) -> np.ndarray:
+    return np.array([
+        rng.uniform(low=-1.2, high=1.2),
+        rng.uniform(low=1, high=1.8),
+        rng.uniform(low=-1.2, high=1.2)
+    ])
+
+
+def init_pos(species: Species, rng: np.random.Generator) -> np.ndarray:
+    """
+    Where a new creature of the species is spawned: the shark in the middle of the tank, food near the surface, and
+    fish anywhere
+    """
+    if species is SHARK:
+        return np.zeros(3)
+    if species is FOOD:
+        return init_fish_food_pos(rng)
+    return init_fish_pos(rng)
@@ -0,0 +1,193 @@
+"""
+Merges the rigid parts of a component tree into one mesh per joint. Most parts of a creature never move relative to
+the joint they hang from (eyes, dorsal fins, the segments of a fin), so their vertices can be transformed once into
+the space of that joint and drawn together with a single draw call, using vertex colors to keep each part's color.
+Only the joints stay in the tree, with the transforms of the parts removed in between folded into their
+parentOffsetMat. The merged meshes of a tree can then be skinned into a single mesh moved by the joints on the GPU.
+"""
+import hashlib
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+import LOD
+from Component import Component
+from DisplayableMesh import DisplayableMesh
+from GLProgram import MAX_BONES
+from GLUtility import GLUtility
+from Point import Point
+from SceneGraph import SceneGraph
+from Shapes import Shape
+from SkinnedMesh import SkinnedMesh
+
+
+def isMergeable(comp: Component) -> bool:
+    """
+    Whether the geometry of comp can go in a merged mesh
+    """
+    return isinstance(comp, Shape) and comp.displayObj is not None and not comp.textureOn
+
+
+def meshHash(vertices: np.ndarray, indices: np.ndarray) -> str:
+    """
+    Digest of the content of a mesh, meshes with the same content can share their buffers
+    """
+    return hashlib.sha1(vertices.tobytes() + indices.tobytes()).hexdigest()
+
+
+def mergeMeshes(parts: List[Tuple[Shape, np.ndarray]], level: int = LOD.LOD_FULL) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate the meshes of some shapes, each one moved by its own matrix and colored with its current color.
+
+    :param parts: shapes with the matrix placing each of them in the space of the merged mesh, in row-major order
+    :param level: level of detail of the shape meshes to merge, see LOD
+    :return: interleaved vertices, 11 floats each, and triangle indices, both flat
+    """
+    vertexList = []
+    indexList = []
+    vertexNum = 0
+    for shape, mat in parts:
+        shapeVertices, shapeIndices, _ = shape.mesh.levelData(level)
+        vertices = np.array(shapeVertices, dtype=np.float64).reshape(-1, 11)
+        # the shared meshes are unscaled, see Shape.modelMatrix
+        mat = mat * np.append(shape.meshScale, 1)
+        vertices[:, 0:3] = vertices[:, 0:3] @ mat[:3, :3].T + mat[:3, 3]
+        # n' = inverse(M)^T n, i.e. n'^T = n^T inverse(M)
+        vertices[:, 3:6] = vertices[:, 3:6] @ GLUtility.normalMatrix(mat)
+        vertices[:, 6:9] = shape.current_color
+        vertexList.append(vertices)
+        indexList.append(np.asarray(shapeIndices, dtype=np.int64).reshape(-1) + vertexNum)
+        vertexNum += len(vertices)
+    return np.concatenate(vertexList).astype(np.float32).reshape(-1), np.concatenate(indexList).astype(np.int32)
+
+
+def mergedLevels(parts: List[Tuple[Shape, np.ndarray]]) -> List[Union[Tuple[np.ndarray, np.ndarray, tuple], None]]:
+    """
+    Every level of detail of the merged mesh of some shapes: their meshes merged at each level, then a single box
+    colored like the shapes taking the most room in it.
+
+    :return: (vertexData, indexData, meshKey) of each level, finest first, None for the low poly level if no shape
+        has one
+    """
+    full = mergeMeshes(parts, LOD.LOD_FULL)
+    lowPoly = None
+    if any(LOD.LOD_LOW_POLY in shape.mesh.levelIds for shape, _ in parts):
+        lowPoly = mergeMeshes(parts, LOD.LOD_LOW_POLY)
+    # how much each primitive is scaled in volume, its size before that is about the same for all of them
+    volumes = np.array([abs(np.linalg.det(mat[:3, :3] * shape.meshScale)) for shape, mat in parts])
+    colors = np.array([shape.current_color for shape, _ in parts], dtype=np.float64)
+    color = volumes @ colors / volumes.sum() if volumes.sum() > 0 else colors.mean(axis=0)
+    box = LOD.boxMesh(full[0], color)
+    # creatures of the same look share their merged meshes
+    return [None if level is None else (*level, ("baked", meshHash(*level))) for level in (full, lowPoly, box)]
+
+
+def bakeRigidParts(root: Component, joints: List[Component]) -> List[Component]:
+    """
+    Merge the parts of the tree under root that do not move relative to each other. Call it before the tree is
+    initialized, the merged meshes are uploaded with the rest of it.
+
+    Kept in the tree are root, the joints, and the components drawing something that cannot be merged, e.g. a textured
+    shape. Every other shape is merged into the mesh of the nearest kept component above it, or of itself for a
+    joint, and every other component is removed.
+
+    :param root: top of the tree to bake
+    :param joints: components whose transform still changes after the bake
+    :return: the components drawing the merged meshes, one child of each kept component having something to merge
+    """
+    graph = SceneGraph(root)
+    nodes = graph.components()
+    localMats = graph.localTransforms(nodes)
+
+    kept = {id(root)} | {id(j) for j in joints}
+    kept |= {id(c) for c in nodes if c.displayObj is not None and not isMergeable(c)}
+
+    # for every node, the kept component it hangs from, or itself if kept, and its transform in that component's space
+    frames: Dict[int, Tuple[Component, np.ndarray]] = {id(root): (root, np.identity(4))}
+    parts: Dict[int, List[Tuple[Shape, np.ndarray]]] = {}
+    newChildren: Dict[int, List[Component]] = {id(root): []}
+    for node, localMat in zip(nodes, localMats):
+        if node is not root:
+            anchor, mat = frames[id(node.parentComponent)]
+            if id(node) in kept:
+                if node.parentComponent is not anchor:
+                    node.parentOffsetMat = mat @ node.parentOffsetMat
+                newChildren[id(anchor)].append(node)
+                newChildren[id(node)] = []
+                frames[id(node)] = (node, np.identity(4))
+            else:
+                frames[id(node)] = (anchor, mat @ localMat)
+        if isMergeable(node):
+            anchor, mat = frames[id(node)]
+            parts.setdefault(id(anchor), []).append((node, mat))
+
+    baked = []
+    for node in nodes:
+        if id(node) not in kept:
+            continue
+        for c in list(node.children):
+            node.removeChild(c)
+        for c in newChildren[id(node)]:
+            node.addChild(c)
+        if id(node) not in parts:
+            continue
+
+        (vertices, indices, meshKey), *lodLevels = mergedLevels(parts[id(node)])
+        shaderProg = parts[id(node)][0][0].mesh.shaderProg
+        part = Component(Point((0, 0, 0)),
+                         DisplayableMesh(shaderProg, [1, 1, 1], vertices, indices, meshKey=meshKey, vertexColors=True,
+                                         lodLevels=lodLevels))
+        node.addChild(part)
+        baked.append(part)
+        if isMergeable(node):
+            # the joint's own shape is drawn by the merged mesh now
+            node.displayObj = None
+    return baked
+
+
+def skinBakedParts(root: Component, baked: List[Component]) -> Union[Component, None]:
+    """
+    Replace the merged meshes left by bakeRigidParts with one SkinnedMesh, each vertex bound with full weight to the
+    component its merged mesh hung from.
+
+    :param root: top of the baked tree, the skinned mesh is added to its children
+    :param baked: the components returned by bakeRigidParts
+    :return: the component drawing the skinned mesh, None if there is nothing to skin or too many bones
+    """
+    if not baked or len(baked) > MAX_BONES:
+        return None
+
+    levels = []
+    for level in (LOD.LOD_FULL, LOD.LOD_LOW_POLY, LOD.LOD_BOX):
+        if not any(level in part.displayObj.levelIds for part in baked):
+            # drawn with the finer level
+            levels.append(None)
+            continue
+        vertexList = []
+        indexList = []
+        vertexNum = 0
+        for bone, part in enumerate(baked):
+            partVertices, partIndices, _ = part.displayObj.levelData(level)
+            vertices = np.zeros((len(partVertices) // 11, 19), dtype=np.float32)
+            vertices[:, 0:11] = partVertices.reshape(-1, 11)
+            vertices[:, 11] = bone  # first bone index, the 3 others have no weight
+            vertices[:, 15] = 1
+            vertexList.append(vertices)
+            indexList.append(partIndices + vertexNum)
+            vertexNum += len(vertices)
+
+        vertices = np.concatenate(vertexList).reshape(-1)
+        indices = np.concatenate(indexList).astype(np.int32)
+        meshKey = ("skinned", meshHash(vertices, indices))
+        levels.append((vertices, indices, meshKey))
+
+    bones = []
+    for part in baked:
+        bones.append(part.parentComponent)
+        part.parentComponent.removeChild(part)
+
+    (vertices, indices, meshKey), *lodLevels = levels
+    skin = Component(Point((0, 0, 0)),
+                     SkinnedMesh(baked[0].displayObj.shaderProg, bones, vertices, indices, meshKey, lodLevels))
+    root.addChild(skin)
+    return skin
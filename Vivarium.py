@@ -13,8 +13,11 @@ import numpy as np
 from Point import Point
 from Component import Component
 from CS680PA3 import CS680PA3
+from CreatureStore import CreatureStore
+from SimClock import SimClock, DEFAULT_DT
 from ModelTank import Tank
 from EnvironmentObject import EnvironmentObject
+import Species
 from models import Shark, Salmon, Cod, Food
 
 
@@ -26,6 +29,14 @@ class Vivarium(Component):
     parent = None  # class that have current context
     tank = None
     tank_dimensions = None
+    store = None  # CreatureStore, the simulation state of every creature
+    clock = None  # SimClock, turns the real time between frames into fixed simulation ticks
+    # where the spawn positions are drawn from. Each creature draws from its own generator spawned from this one,
+    # so the same seed gives the same tank whatever the models draw, here or in the HeadlessVivarium
+    rng = None  # np.random.Generator
+
+    # step all creatures at once through the store. Set to False to use the per-creature CS680PA3.stepForward
+    batched = True
 
     ## BONUS 5(for CS680 Students): Feed your creature
     # Requirements:
@@ -35,10 +46,14 @@ class Vivarium(Component):
     #     the vivarium and remain there within the tank until eaten.
     #     * The food should disappear once it has been eaten. Food is eaten by the first creature that touches it.
 
-    _fish_size = np.ones(3) * 0.1
-    _food_size = np.ones(3) * 0.07
+    # the model drawing each species
+    _models = {Species.SHARK: Shark, Species.SALMON: Salmon, Species.COD: Cod, Species.FOOD: Food}
 
-    def __init__(self, parent, shaderProg):
+    def __init__(self, parent, shaderProg, seed: int = None, interaction_radius: float = None):
+        """
+        :param seed: seed of every random number of the simulation, None for a different run every time
+        :param interaction_radius: creatures further apart ignore each other, see CreatureStore.interaction_radius
+        """
         self.parent = parent
         self.shaderProg = shaderProg
 
@@ -52,43 +67,115 @@ class Vivarium(Component):
 
         # Store all components in one list, for us to access them later
         self.components = [tank]
+        self.store = CreatureStore(interaction_radius=interaction_radius)
+        self.clock = SimClock()
+        self.rng = np.random.default_rng(seed)
 
         # add one shark as the predator
-        shark_size = np.array([1, 1, 1]) * 0.25
-        self.addNewObjInTank(Shark(self, Point((0, 0, 0)), shaderProg, shark_size))
+        shark_size = np.array([1, 1, 1]) * Species.SHARK.size
+        self.addNewObjInTank(Shark(self, Point((0, 0, 0)), shaderProg, shark_size, rng=self.rng.spawn(1)[0]))
         # add 4 fishes
         for _ in range(2):
             self.addFish()
 
-    @staticmethod
-    def init_fish_pos():
-        return np.random.uniform(low=-1.5, high=1.5, size=(3,))
+    def init_fish_pos(self):
+        return Species.init_fish_pos(self.rng)
+
+    def init_fish_food_pos(self):
+        return Species.init_fish_food_pos(self.rng)
 
-    @staticmethod
-    def init_fish_food_pos():
-        return np.array([
-            np.random.uniform(low=-1.2, high=1.2),
-            np.random.uniform(low=1, high=1.8),
-            np.random.uniform(low=-1.2, high=1.2)
-        ])
+    def addCreature(self, species: Species.Species, position: Point = None) -> CS680PA3:
+        """
+        Add one creature of a species to the tank
+
+        :param position: where it is spawned, see Species.init_pos if not given
+        """
+        if position is None:
+            position = Point(Species.init_pos(species, self.rng))
+        creature = self._models[species](self, position, self.shaderProg, np.ones(3) * species.size,
+                                         rng=self.rng.spawn(1)[0])
+        creature.initialize()
+        self.addNewObjInTank(creature)
+        return creature
 
     def addFish(self):
-        salmon = Salmon(self, Point(self.init_fish_pos()), self.shaderProg, self._fish_size)
-        salmon.initialize()
-        self.addNewObjInTank(salmon)
-        cod = Cod(self, Point(self.init_fish_pos()), self.shaderProg, self._fish_size)
-        cod.initialize()
-        self.addNewObjInTank(cod)
+        self.addCreature(Species.SALMON, Point(self.init_fish_pos()))
+        self.addCreature(Species.COD, Point(self.init_fish_pos()))
 
     def addFood(self):
         for _ in range(6):
-            food = Food(self, Point(self.init_fish_food_pos()), self.shaderProg, self._food_size)
-            food.initialize()
-            self.addNewObjInTank(food)
+            self.addCreature(Species.FOOD, Point(self.init_fish_food_pos()))
+
+    def creatures(self) -> typing.List[CS680PA3]:
+        return [c for c in self.components if isinstance(c, CS680PA3)]
 
-    def animationUpdate(self):
+    def advance(self, now: float = None) -> int:
         """
-        Update all creatures in vivarium
+        Run the simulation ticks due since the last frame, then show every creature between the last two ticks.
+
+        :param now: current time in seconds, see SimClock.advance
+        :return: the number of ticks simulated
+        """
+        ticks = self.clock.advance(now)
+        if ticks > 0:
+            # the creatures may still show an interpolated state from the last frame
+            for c in self.creatures():
+                c.restoreState()
+            for _ in range(ticks):
+                self.animationUpdate(self.clock.dt)
+
+        alpha = self.clock.alpha
+        for c in self.creatures():
+            c.interpolateState(alpha)
+        self.update()
+        return ticks
+
+    def animationUpdate(self, dt: float = DEFAULT_DT):
+        """
+        Update all creatures in vivarium by one simulation tick. Transforms are not updated, see advance
+
+        :param dt: length of the tick, in seconds
+        """
+        if self.batched:
+            self.batchedUpdate(dt)
+        else:
+            self.objectUpdate(dt)
+        for c in self.creatures():
+            c.saveState()
+
+    def batchedUpdate(self, dt: float = DEFAULT_DT):
+        """
+        Step every creature through the CreatureStore, then copy the result back to the creatures
+        """
+        creatures = list(self.store.creatures)
+        _, eaten = self.store.stepForward(self.tank_dimensions, dt)
+        self.applySteps(creatures, eaten, dt)
+
+    def applySteps(self, creatures: typing.List[CS680PA3], eaten: np.ndarray, dt: float = DEFAULT_DT):
+        """
+        Copy the state of the CreatureStore after its stepForward back to the creatures, animate them, and remove
+        the creatures that have been eaten
+
+        :param creatures: the creatures of the store, in its order before the step
+        :param eaten: the mask returned by CreatureStore.stepForward
+        """
+        step_vectors = self.store.step_vectors.copy()
+        positions = self.store.positions.copy()
+
+        for i, c in enumerate(creatures):
+            if eaten[i]:
+                continue
+            c.step_vector = Point(step_vectors[i])
+            c.animationUpdate(dt)
+            c.currentPos = Point(positions[i])
+            c.rotateDirection()
+
+        for i in np.flatnonzero(eaten):
+            self.delObjInTank(creatures[i])
+
+    def objectUpdate(self, dt: float = DEFAULT_DT):
+        """
+        Step every creature through its own stepForward
         """
         update_list = []
         removed_item = set()
@@ -96,7 +183,7 @@ class Vivarium(Component):
         # first iterate all the objects
         for c in self.components:
             if isinstance(c, EnvironmentObject) and c not in removed_item:
-                step, rem_list = c.stepForward(self.components, self.tank_dimensions, self)
+                step, rem_list = c.stepForward(self.components, self.tank_dimensions, self, dt)
                 update_list.append((c, step))
                 if rem_list is not None:
                     removed_item.update(rem_list)
@@ -106,16 +193,18 @@ class Vivarium(Component):
             if c in removed_item:
                 self.delObjInTank(c)
                 continue
-            c.animationUpdate()
+            c.animationUpdate(dt)
             c.currentPos += step
             c.rotateDirection()
-
-        self.update()
+            if c in self.store:
+                self.store.refresh(c)
 
     def delObjInTank(self, obj):
         if isinstance(obj, Component):
-            self.tank.children.remove(obj)
+            self.tank.removeChild(obj)
             self.components.remove(obj)
+            if obj in self.store:
+                self.store.remove(obj)
             del obj
 
     def _sort_cs680(self, component: Component) -> int:
@@ -131,6 +220,8 @@ class Vivarium(Component):
 
             # sort the components each time when a new one is added
             self.components.sort(key=self._sort_cs680)
+        if isinstance(newComponent, CS680PA3):
+            self.store.add(newComponent)
         if isinstance(newComponent, EnvironmentObject):
             # add environment components list reference to this new object's
             newComponent.env_obj_list = self.components
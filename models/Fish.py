@@ -1,7 +1,9 @@
 import typing
 
+import numpy as np
 
 import ColorType as Ct
+import Species
 from CS680PA3 import CS680PA3
 from Shapes import *
 from models.Eye import Eye
@@ -31,14 +33,15 @@ class Cod(CS680PA3):
                  fin1Color: Ct.ColorType = Utility.CodFin1Color,
                  fin2Color: Ct.ColorType = Utility.CodFin2Color,
                  tail1Color: Ct.ColorType = Utility.CodTail1Color,
-                 tail2Color: Ct.ColorType = Utility.CodTail2Color):
-        CS680PA3.__init__(self, position)
+                 tail2Color: Ct.ColorType = Utility.CodTail2Color,
+                 rng: typing.Optional[np.random.Generator] = None):
+        CS680PA3.__init__(self, position, rng)
 
         # define the head
         head_size = np.array([0.6, 0.9, 0.8])
         head = Cube(Point((0, 0, 0)), shaderProg, head_size, headColor)
         head.setRotateExtents(0, 0, -8, 8, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(head, [0, 0.6, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(head, [0, 72, 0]))
         self.addChild(head)
 
         # define the body
@@ -46,7 +49,7 @@ class Cod(CS680PA3):
         conn1 = Cube(Point((0, 0, -head_size[2] / 2)), shaderProg, conn_size, headColor)
         head.addChild(conn1)
         conn1.setRotateExtents(0, 0, -4, 4, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(conn1, [0, 0.2, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(conn1, [0, 24, 0]))
 
         body_size = np.array([0.6, 1, 1.9])
         body_pos = np.array([0, -0.1 / 2, -1.9 / 2])
@@ -69,7 +72,7 @@ class Cod(CS680PA3):
         )))
         pec_fin1.setDefaultAngle(-135, pec_fin1.wAxis)
         pec_fin1.setRotateExtent(pec_fin1.wAxis, -150, -120)
-        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin1, [0, 0, -1]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin1, [0, 0, -120]))
         body.addChild(pec_fin1)
         pec_fin2 = Utility.createFin(12, shaderProg, [1, 0.4, 0.4], fin2Color)
         pec_fin2.setDefaultPosition(Point((
@@ -77,7 +80,7 @@ class Cod(CS680PA3):
         )))
         pec_fin2.setDefaultAngle(135, pec_fin2.wAxis)
         pec_fin2.setRotateExtent(pec_fin1.wAxis, 120, 150)
-        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin2, [0, 0, 1]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin2, [0, 0, 120]))
         body.addChild(pec_fin2)
 
         # Define the Dorsal Fins
@@ -98,7 +101,7 @@ class Cod(CS680PA3):
         tail_conn = Cube(Point((0, 0, -body_size[2] / 2)), shaderProg, conn_size, bodyColor)
         body.addChild(tail_conn)
         tail_conn.setRotateExtents(0, 0, -36, 36, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(tail_conn, [0, -2.7, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(tail_conn, [0, -324, 0]))
         tail_upper_conn = Sphere(Point((0, 0, 0)), shaderProg, conn_size, tail1Color, limb=True)
         tail_lower_conn = Sphere(Point((0, 0, 0)), shaderProg, conn_size, tail1Color, limb=True)
         tail_conn.addChild(tail_upper_conn)
@@ -114,10 +117,7 @@ class Cod(CS680PA3):
         tail_lower_conn.addChild(tail_upper)
 
         # set basic boundary radius
-        self.basic_boundary_radius = 1.6
-        self.basic_speed = 0.3
-        self.basic_boundary_center = Point((0, 0, -1.2))
-        self.food_chain_level = 200
+        self.setSpecies(Species.COD)
 
         if scale is not None:
             self.setDefaultScale(scale)
@@ -136,14 +136,15 @@ class Salmon(CS680PA3):
                  fin1Color: Ct.ColorType = Utility.SalmonFin1Color,
                  fin2Color: Ct.ColorType = Utility.SalmonFin2Color,
                  tail1Color: Ct.ColorType = Utility.SalmonTail1Color,
-                 tail2Color: Ct.ColorType = Utility.SalmonTail2Color,):
-        CS680PA3.__init__(self, position)
+                 tail2Color: Ct.ColorType = Utility.SalmonTail2Color,
+                 rng: typing.Optional[np.random.Generator] = None):
+        CS680PA3.__init__(self, position, rng)
 
         # define the head
         head_size = np.array([0.6, 0.9, 0.8])
         head = Cube(Point((0, 0, 0)), shaderProg, head_size, headColor)
         head.setRotateExtents(0, 0, -6, 6, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(head, [0, 0.8, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(head, [0, 96, 0]))
         self.addChild(head)
 
         # define the body
@@ -151,7 +152,7 @@ class Salmon(CS680PA3):
         body1_conn = Cube(Point((0, 0, -head_size[2] / 2)), shaderProg, conn_size, headColor)
         head.addChild(body1_conn)
         body1_conn.setRotateExtents(0, 0, -4, 4, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(body1_conn, [0, -0.533, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(body1_conn, [0, -64, 0]))
 
         body_size = np.array([0.6, 1, 1.5])
         body1_pos = np.array([0, -0.1 / 2, -1.5 / 2])
@@ -161,7 +162,7 @@ class Salmon(CS680PA3):
         body2_conn = Cube(Point((0, 0, -body_size[2] / 2)), shaderProg, conn_size, headColor)
         body1.addChild(body2_conn)
         body2_conn.setRotateExtents(0, 0, -26, 26, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(body2_conn, [0, 3.466, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(body2_conn, [0, 416, 0]))
         body2_pos = np.array([0, 0, -1.5 / 2])
         body2 = Cube(Point(body2_pos), shaderProg, body_size, bodyColor)
         body2_conn.addChild(body2)
@@ -182,7 +183,7 @@ class Salmon(CS680PA3):
         )))
         pec_fin1.setDefaultAngle(-135, pec_fin1.wAxis)
         pec_fin1.setRotateExtent(pec_fin1.wAxis, -150, -120)
-        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin1, [0, 0, -1]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin1, [0, 0, -120]))
         body1.addChild(pec_fin1)
         pec_fin2 = Utility.createFin(12, shaderProg, [1, 0.4, 0.4], fin2Color)
         pec_fin2.setDefaultPosition(Point((
@@ -190,7 +191,7 @@ class Salmon(CS680PA3):
         )))
         pec_fin2.setDefaultAngle(135, pec_fin2.wAxis)
         pec_fin2.setRotateExtent(pec_fin1.wAxis, 120, 150)
-        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin2, [0, 0, 1]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(pec_fin2, [0, 0, 120]))
         body1.addChild(pec_fin2)
 
         # Define the Dorsal Fins
@@ -206,7 +207,7 @@ class Salmon(CS680PA3):
         tail_conn = Cube(Point((0, 0, -body_size[2] / 2)), shaderProg, conn_size, bodyColor)
         body2.addChild(tail_conn)
         tail_conn.setRotateExtents(0, 0, -36, 36, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(tail_conn, [0, 4.8, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(tail_conn, [0, 576, 0]))
         tail_upper_conn = Sphere(Point((0, 0, 0)), shaderProg, conn_size, tail1Color, limb=True)
         tail_lower_conn = Sphere(Point((0, 0, 0)), shaderProg, conn_size, tail1Color, limb=True)
         tail_conn.addChild(tail_upper_conn)
@@ -222,10 +223,7 @@ class Salmon(CS680PA3):
         tail_lower_conn.addChild(tail_upper)
 
         # set basic boundary radius
-        self.basic_boundary_radius = 2
-        self.basic_speed = 0.3
-        self.basic_boundary_center = Point((0, 0, -1.7))
-        self.food_chain_level = 200
+        self.setSpecies(Species.SALMON)
 
         if scale is not None:
             self.setDefaultScale(scale)
@@ -1,8 +1,10 @@
 import typing
 from CS680PA3 import CS680PA3
+from SimClock import DEFAULT_DT
 from Shapes import *
 import ColorType as Ct
 import numpy as np
+import Species
 
 import models.Utility
 from models.Eye import Eye
@@ -26,8 +28,9 @@ class Shark(CS680PA3):
                  parent: Component,
                  position: Point,
                  shaderProg: GLProgram,
-                 scale: typing.Optional[typing.Iterator] = None):
-        CS680PA3.__init__(self, position)
+                 scale: typing.Optional[typing.Iterator] = None,
+                 rng: typing.Optional[np.random.Generator] = None):
+        CS680PA3.__init__(self, position, rng)
 
         # define the colors
         SHARK_GREY = Ct.ColorType(0.243, 0.275, 0.376)
@@ -39,7 +42,7 @@ class Shark(CS680PA3):
         body_size = np.array([0.9, 1.1, 1.4])
         body = Cube(Point((0, 0, 0)), shaderProg, body_size, SHARK_GREY)
         body.setRotateExtents(0, 0, -8, 8, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(body, [0, 0.2, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(body, [0, 24, 0]))
         self.addChild(body)
 
         connect_part_size = [0.01, 0.01, 0.01]
@@ -57,7 +60,7 @@ class Shark(CS680PA3):
 
             new_tail = Cube(Point((0, 0, 0)), shaderProg, new_size, SHARK_GREY)
 
-            self.rotationRegistry.append(CS680PA3.RotWrap(conn_part, [0, -0.5, 0]))
+            self.rotationRegistry.append(CS680PA3.RotWrap(conn_part, [0, -60, 0]))
             cur_par.addChild(conn_part)
             conn_part.addChild(new_tail)
             # tails_part.append(new_tail)
@@ -103,7 +106,7 @@ class Shark(CS680PA3):
         mouth = Cube(Point(mouth_pos), shaderProg, mouth_size, SHARK_LIGHTGREY)
         mouth.setCurrentAngle(0, mouth.uAxis)
         mouth.setRotateExtents(0, 30, 0, 0, 0, 0)
-        self.rotationRegistry.append(CS680PA3.RotWrap(mouth, [0.4, 0, 0]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(mouth, [48, 0, 0]))
         neck.addChild(mouth)
 
         # define the first dorsal
@@ -120,7 +123,7 @@ class Shark(CS680PA3):
         )
         pectoral_1.setDefaultAngle(140, pectoral_1.wAxis)
         pectoral_1.setRotateExtent(pectoral_1.wAxis, 120, 160)
-        self.rotationRegistry.append(CS680PA3.RotWrap(pectoral_1, [0, 0, 0.4]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(pectoral_1, [0, 0, 48]))
         body.addChild(pectoral_1)
 
         pectoral_2 = models.Utility.createFin(12, shaderProg, [1, 1, 0.6], SHARK_LIGHTGREY)
@@ -131,7 +134,7 @@ class Shark(CS680PA3):
         )
         pectoral_2.setDefaultAngle(-140, pectoral_2.wAxis)
         pectoral_2.setRotateExtent(pectoral_2.wAxis, -160, -120)
-        self.rotationRegistry.append(CS680PA3.RotWrap(pectoral_2, [0, 0, -0.4]))
+        self.rotationRegistry.append(CS680PA3.RotWrap(pectoral_2, [0, 0, -48]))
         body.addChild(pectoral_2)
 
         # add the eye
@@ -142,16 +145,13 @@ class Shark(CS680PA3):
         eye2.setDefaultAngle(-90, eye2.vAxis)
         head.addChild(eye2)
 
-        self.basic_boundary_radius = 1.8
-        self.basic_boundary_center = Point((0, 0, 0))
-        self.basic_speed = 0.05
-        self.food_chain_level = 100
+        self.setSpecies(Species.SHARK)
 
         if scale is not None:
             self.setDefaultScale(scale)
 
-    def animationUpdate(self):
+    def animationUpdate(self, dt: float = DEFAULT_DT):
         # rotate animation
         # self.vAngle = (self.vAngle + 5) % 360
         # self.setCurrentPosition(self.defaultPos + Point((0, 0.5 * np.sin(self.vAngle / 180 * np.pi), 0)))
-        super().animationUpdate()
+        super().animationUpdate(dt)
@@ -0,0 +1,26 @@
+"""
+The modules live at the top of the repository and load their assets relative to it, so the tests run from there.
+Tests needing OpenGL take the glContext fixture, which renders offscreen through EGL and skips the test where no
+context can be made.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# the EGL platform of PyOpenGL has to be chosen before OpenGL is first imported, see Offscreen
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+
+@pytest.fixture(scope="session")
+def glContext():
+    os.chdir(ROOT)
+    try:
+        from Offscreen import createContext
+        createContext()
+    except Exception as e:
+        pytest.skip(f"no offscreen OpenGL context: {e}")
@@ -0,0 +1,214 @@
+import numpy as np
+import pytest
+
+import Species
+from CreatureStore import CreatureStore
+from Headless import HeadlessVivarium
+from Point import Point
+
+
+def headlessRun(seed: int, ticks: int, fish: int = 5, food: int = 2):
+    vivarium = HeadlessVivarium(seed=seed)
+    vivarium.addShark()
+    for _ in range(2 + fish):
+        vivarium.addFish()
+    for _ in range(food):
+        vivarium.addFood()
+    positions = []
+    for _ in range(ticks):
+        vivarium.animationUpdate()
+        positions.append(vivarium.store.positions.copy())
+    return positions
+
+
+def sceneRun(seed: int, ticks: int, batched: bool, fish: int = 5, food: int = 2):
+    from Offscreen import OffscreenRenderer
+
+    vivarium = OffscreenRenderer(32, 32, seed).vivarium
+    vivarium.batched = batched
+    for _ in range(fish):
+        vivarium.addFish()
+    for _ in range(food):
+        vivarium.addFood()
+    positions = []
+    for _ in range(ticks):
+        vivarium.animationUpdate()
+        positions.append(np.array([c.currentPos.coords for c in vivarium.creatures()], dtype=np.float64))
+    return positions
+
+
+def assertSameRun(a, b):
+    assert len(a) == len(b)
+    for tick, (x, y) in enumerate(zip(a, b)):
+        assert x.shape == y.shape, f"different creatures left at tick {tick}"
+        np.testing.assert_array_equal(x, y, err_msg=f"tick {tick}")
+
+
+def test_rows_sorted_by_level():
+    vivarium = HeadlessVivarium(seed=0)
+    vivarium.addFish()
+    vivarium.addShark()
+    vivarium.addFood()
+    vivarium.addFish()
+    levels = vivarium.store.levels
+    assert list(levels) == sorted(levels, reverse=True)
+    assert [c.food_chain_level for c in vivarium.creatures] == list(levels)
+
+
+def test_remove_keeps_rows():
+    vivarium = HeadlessVivarium(seed=0)
+    for _ in range(3):
+        vivarium.addFish()
+    store = vivarium.store
+    creature = store.creatures[2]
+    others = [c for c in store.creatures if c is not creature]
+    expected = np.array([store.positions[store.indexOf(c)] for c in others])
+    store.remove(creature)
+    assert creature not in store
+    assert len(store) == len(others)
+    np.testing.assert_array_equal(store.positions, expected)
+
+
+def test_empty_store():
+    steps, eaten = CreatureStore().stepForward([4, 4, 4])
+    assert steps.shape == (0, 3) and eaten.shape == (0,)
+
+
+def test_headless_seed_reproduces():
+    assertSameRun(headlessRun(3, 200), headlessRun(3, 200))
+    assert not np.array_equal(headlessRun(3, 20)[-1], headlessRun(4, 20)[-1])
+
+
+def test_step_vectors_stay_unit():
+    vivarium = HeadlessVivarium(seed=1)
+    vivarium.addShark()
+    for _ in range(10):
+        vivarium.addFish()
+    vivarium.run(100)
+    np.testing.assert_allclose(np.linalg.norm(vivarium.store.step_vectors, axis=1), 1)
+
+
+def test_creatures_stay_in_tank():
+    vivarium = HeadlessVivarium(seed=2)
+    vivarium.addShark()
+    for _ in range(10):
+        vivarium.addFish()
+    vivarium.run(500)
+    half = np.array(vivarium.tank_dimensions) / 2
+    assert np.all(np.abs(vivarium.store.positions + vivarium.store.centers) < half)
+
+
+@pytest.mark.parametrize("seed", [11, 12])
+def test_batched_matches_per_object(glContext, seed):
+    batched = sceneRun(seed, 300, batched=True)
+    perObject = sceneRun(seed, 300, batched=False)
+    assertSameRun(batched, perObject)
+    # the run only tells something if creatures have been eaten on the way
+    assert len(batched[-1]) < len(batched[0])
+
+
+def test_headless_matches_scene(glContext):
+    assertSameRun(headlessRun(11, 300), sceneRun(11, 300, batched=True))
+
+
+def test_food_sinks_and_rests():
+    vivarium = HeadlessVivarium(seed=0)
+    vivarium.addFood()
+    store = vivarium.store
+    assert np.all(store.levels == Species.FOOD.food_chain_level)
+    start = store.positions.copy()
+    vivarium.run(10)
+    np.testing.assert_array_equal(store.positions[:, [0, 2]], start[:, [0, 2]])
+    assert np.all(store.positions[:, 1] < start[:, 1])
+    vivarium.run(3000)
+    resting = store.positions.copy()
+    vivarium.run(10)
+    np.testing.assert_array_equal(store.positions, resting)
+
+
+def oneByOne(steering, turning, i, j):
+    # every creature in its own wave, in row order
+    return np.where(turning, np.cumsum(turning) - 1, -1)
+
+
+@pytest.mark.parametrize("radius", [None, 0.3])
+def test_waves_match_one_by_one(monkeypatch, radius):
+    def run():
+        vivarium = HeadlessVivarium(seed=5, interaction_radius=radius)
+        vivarium.addShark()
+        for _ in range(30):
+            vivarium.addFish()
+        for _ in range(3):
+            vivarium.addFood()
+        positions = []
+        for _ in range(150):
+            vivarium.animationUpdate()
+            positions.append(vivarium.store.positions.copy())
+        return positions
+
+    waves = run()
+    monkeypatch.setattr(CreatureStore, "_waves", staticmethod(oneByOne))
+    assertSameRun(waves, run())
+
+
+def test_food_eaten_once_by_two_fish():
+    vivarium = HeadlessVivarium(seed=0)
+    food = vivarium.addCreature(Species.FOOD, Point((0, 0.5, 0)))
+    for x in (-0.02, 0.02):
+        vivarium.addCreature(Species.SALMON, Point((x, 0.5, 0)) - Point(Species.SALMON.boundary_center) *
+                             Species.SALMON.size)
+    vivarium.animationUpdate()
+    assert food not in vivarium.store
+    assert len(vivarium.store) == 2
+
+
+def clusterVivarium(centers, radius, seed=3, count=6):
+    # every cluster is drawn from its own center, so that it starts the same with or without the others
+    vivarium = HeadlessVivarium(interaction_radius=radius)
+    for center in centers:
+        rng = np.random.default_rng([seed, *(int(c * 10) + 100 for c in center)])
+        for k in range(count):
+            species = Species.SALMON if k % 2 else Species.COD
+            creature = vivarium.addCreature(species, Point(np.asarray(center) + rng.uniform(-0.05, 0.05, 3)))
+            creature.step_vector = Point(rng.normal(0, 1, 3)).normalize()
+            vivarium.store.refresh(creature)
+    return vivarium
+
+
+def stepVectors(vivarium, ticks=1):
+    for _ in range(ticks):
+        vivarium.animationUpdate()
+    return vivarium.store.step_vectors.copy()
+
+
+def test_neighbour_pairs_match_brute_force():
+    vivarium = HeadlessVivarium(seed=2, interaction_radius=0.3)
+    for _ in range(60):
+        vivarium.addFish()
+    store = vivarium.store
+    tank = np.asarray(vivarium.tank_dimensions, dtype=np.float64)
+    rows = np.arange(0, len(store), 3)
+    i, j = store._neighbourPairs(tank, store.positions, rows, 0.01)
+
+    search = np.maximum(0.3, 2 * store.radii) + 0.01
+    dist = np.linalg.norm(store.positions[:, None] - store.positions[None], axis=-1)
+    near = (dist < np.maximum(search[:, None], search[None])) & ~np.eye(len(store), dtype=bool)
+    expected_i, expected_j = np.nonzero(near[rows])
+    np.testing.assert_array_equal(i, rows[expected_i])
+    np.testing.assert_array_equal(j, expected_j)
+
+
+def test_radius_covering_the_tank_matches_all_pairs():
+    centers = [(-1, 0, 0), (1, 0.5, 0)]
+    np.testing.assert_array_equal(stepVectors(clusterVivarium(centers, None), 20),
+                                  stepVectors(clusterVivarium(centers, 10.0), 20))
+
+
+def test_radius_keeps_the_forces_inside_and_drops_the_ones_outside():
+    centers = [(-1, 0, 0), (1, 0, 0)]
+    # within the radius, a cluster moves as with every pair
+    alone = [stepVectors(clusterVivarium([center], None)) for center in centers]
+    cut = stepVectors(clusterVivarium(centers, 0.3))
+    np.testing.assert_allclose(cut, np.concatenate(alone), rtol=0, atol=1e-12)
+    # beyond it, the clusters still pull each other when every pair interacts, so the radius is an approximation
+    assert not np.allclose(stepVectors(clusterVivarium(centers, None)), cut, rtol=0, atol=1e-6)
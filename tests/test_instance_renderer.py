@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+
+class Bone:
+    def __init__(self, mat):
+        self.transformationMat = mat
+
+
+class Skin:
+    def __init__(self, mats):
+        self.bones = [Bone(m) for m in mats]
+
+
+def test_bone_data_packs_columns_then_normal_columns():
+    from GLProgram import BONE_TEXELS
+    from GLUtility import GLUtility
+    from InstanceRenderer import InstanceRenderer
+
+    rng = np.random.default_rng(0)
+    mats = np.tile(np.identity(4), (2, 3, 1, 1))
+    mats[..., :3, :] = rng.normal(size=(2, 3, 3, 4))
+    data = InstanceRenderer.boneData([Skin(m) for m in mats])
+
+    assert data.shape == (2, 3, BONE_TEXELS * 4) and data.dtype == np.float32
+    texels = data.reshape(2, 3, BONE_TEXELS, 4)
+    for k in range(4):
+        np.testing.assert_allclose(texels[:, :, k], mats[..., :, k], rtol=1e-6)
+    normal = np.swapaxes(np.linalg.inv(mats[..., :3, :3]), -1, -2)
+    for k in range(3):
+        np.testing.assert_allclose(texels[:, :, 4 + k, :3], normal[..., :, k], rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(texels[:, :, 4:, 3], 0)
+    np.testing.assert_allclose(GLUtility.normalMatrix(mats[0, 0]), texels[0, 0, 4:, :3], rtol=1e-5, atol=1e-6)
+
+
+def render(renderer, instanced):
+    import OpenGL.GL as gl
+
+    renderer.sceneRenderer.instanced = instanced
+    renderer.renderFrame(0.5)
+    gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+    pixels = gl.glReadPixels(0, 0, renderer.width, renderer.height, gl.GL_RGB, gl.GL_UNSIGNED_BYTE)
+    return np.frombuffer(pixels, dtype=np.uint8).copy()
+
+
+@pytest.mark.parametrize("bake", [True, False])
+def test_instanced_matches_one_by_one(glContext, monkeypatch, bake):
+    from CS680PA3 import CS680PA3
+    from GLBuffer import TBO
+    from Offscreen import OffscreenRenderer
+
+    monkeypatch.setattr(CS680PA3, "bake_static_geometry", bake)
+    renderer = OffscreenRenderer(96, 72, seed=4)
+    for _ in range(5):
+        renderer.vivarium.addFish()
+    renderer.vivarium.addFood()
+
+    expected = render(renderer, False)
+    calls = renderer.sceneRenderer.renderQueue.drawCalls
+    assert len(np.unique(expected.reshape(-1, 3), axis=0)) > 1
+    np.testing.assert_array_equal(render(renderer, True), expected)
+    assert renderer.sceneRenderer.renderer.drawCalls < calls
+
+    # the bones of a few creatures only per draw
+    monkeypatch.setattr(TBO, "maxTexels", staticmethod(lambda: 2 * 16 * 7))
+    np.testing.assert_array_equal(render(renderer, True), expected)
+
+
+def test_skinned_creatures_are_instanced(glContext):
+    from InstanceRenderer import InstanceRenderer
+    from Offscreen import OffscreenRenderer
+
+    renderer = OffscreenRenderer(32, 32, seed=1)
+    for _ in range(3):
+        renderer.vivarium.addFish()
+    root = renderer.topLevelComponent
+    root.update(np.identity(4))
+    groups, skins, others = InstanceRenderer.collect(root)
+    creatures = [c for c in renderer.vivarium.components if hasattr(c, "step_vector")]
+    assert sum(len(meshes) for meshes in skins.values()) == len(creatures)
+    # one group per species look: the shark, the salmon and the cod
+    assert len(skins) == 3
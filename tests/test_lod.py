@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import LOD
+from LOD import LODSelector
+
+
+def test_level_index():
+    # a mesh with a full and a box level, but no low poly one
+    levelIds = [LOD.LOD_FULL, LOD.LOD_BOX]
+    assert LOD.levelIndex(levelIds, LOD.LOD_FULL) == 0
+    assert LOD.levelIndex(levelIds, LOD.LOD_LOW_POLY) == 0
+    assert LOD.levelIndex(levelIds, LOD.LOD_BOX) == 1
+    assert LOD.levelIndex([LOD.LOD_FULL], LOD.LOD_BOX) == 0
+    assert LOD.levelIndex([LOD.LOD_FULL, LOD.LOD_LOW_POLY, LOD.LOD_BOX], LOD.LOD_LOW_POLY) == 1
+
+
+def test_present_levels():
+    full, box = ("full",), ("box",)
+    levels, levelIds = LOD.presentLevels(full, [None, box])
+    assert levels == [full, box]
+    assert levelIds == [LOD.LOD_FULL, LOD.LOD_BOX]
+    assert LOD.presentLevels(full, None) == ([full], [LOD.LOD_FULL])
+
+
+def test_choose_level_thresholds():
+    selector = LODSelector(thresholds=(10.0, 4.0), hysteresis=0.2)
+    assert selector.chooseLevel(100, 0) == 0
+    assert selector.chooseLevel(7, 0) == 1
+    # straight to the coarsest level when shrinking past both thresholds at once
+    assert selector.chooseLevel(2, 0) == 2
+    assert selector.chooseLevel(100, 2) == 0
+
+
+@pytest.mark.parametrize("size, current, expected", [
+    # within 20% of the threshold the level does not change, whichever side it comes from
+    (9.0, 0, 0), (8.1, 0, 0), (7.9, 0, 1),
+    (11.0, 1, 1), (11.9, 1, 1), (12.1, 1, 0),
+    (3.3, 1, 1), (3.1, 1, 2), (4.7, 2, 2), (4.9, 2, 1),
+])
+def test_choose_level_hysteresis(size, current, expected):
+    selector = LODSelector(thresholds=(10.0, 4.0), hysteresis=0.2)
+    assert selector.chooseLevel(size, current) == expected
+
+
+def test_no_flicker_around_threshold():
+    selector = LODSelector(thresholds=(10.0,), hysteresis=0.2)
+    level = 0
+    changes = 0
+    for size in 10 + 1.5 * np.sin(np.linspace(0, 20 * np.pi, 500)):
+        new = selector.chooseLevel(size, level)
+        changes += new != level
+        level = new
+    assert changes == 0
+
+
+def test_projected_radius():
+    projection = np.identity(4)
+    projection[1, 1] = 2.0
+    assert LODSelector.projectedRadius([0, 0, -10], 1.0, [0, 0, 0], projection, 100) == pytest.approx(10.0)
+    assert LODSelector.projectedRadius([0, 0, 0], 1.0, [0, 0, 0.5], projection, 100) == float("inf")
+
+
+def test_fit_to_bounds():
+    rng = np.random.default_rng(0)
+    reference = np.zeros((50, 11), dtype=np.float32)
+    reference[:, 0:3] = rng.uniform(-0.9, 0.9, (50, 3))
+    vertices = np.zeros((40, 11), dtype=np.float32)
+    vertices[:, 0:3] = rng.uniform(-1.2, 1.1, (40, 3))
+    vertices[:, 3:6] = [0, 0, 1]
+    fitted = LOD.fitToBounds(vertices.reshape(-1), reference.reshape(-1)).reshape(-1, 11)
+    np.testing.assert_allclose(fitted[:, 0:3].min(axis=0), reference[:, 0:3].min(axis=0), atol=1e-6)
+    np.testing.assert_allclose(fitted[:, 0:3].max(axis=0), reference[:, 0:3].max(axis=0), atol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(fitted[:, 3:6], axis=1), 1, atol=1e-6)
@@ -0,0 +1,78 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import MeshAssets
+from conftest import ROOT
+
+pytest.importorskip("collada")
+
+
+@pytest.fixture
+def asset(tmp_path):
+    path = tmp_path / "cube0.dae"
+    shutil.copy(os.path.join(ROOT, "assets", "cube0.dae"), path)
+    return str(path)
+
+
+def setMtime(path: str, mtime: float):
+    os.utime(path, (mtime, mtime))
+
+
+def test_missing_cache_is_stale(asset):
+    assert MeshAssets.isStale(asset)
+
+
+def test_built_cache_is_fresh(asset):
+    vertices, indices = MeshAssets.buildCache(asset)
+    assert not MeshAssets.isStale(asset)
+    cached_vertices, cached_indices = MeshAssets.loadVertexData(asset)
+    assert isinstance(cached_vertices, np.memmap)
+    np.testing.assert_array_equal(cached_vertices, vertices)
+    np.testing.assert_array_equal(cached_indices, indices)
+
+
+def edit(path: str):
+    # an XML comment after the root element changes the content but not the mesh
+    with open(path, "a") as f:
+        f.write("\n<!-- edited -->\n")
+
+
+def test_edited_source_is_stale_whatever_its_mtime(asset):
+    MeshAssets.buildCache(asset)
+    edit(asset)
+    setMtime(asset, 1_000_000)
+    for path in MeshAssets.cachePaths(asset):
+        setMtime(path, 2_000_000)
+    assert MeshAssets.isStale(asset)
+
+
+def test_touched_source_is_fresh(asset):
+    MeshAssets.buildCache(asset)
+    for path in MeshAssets.cachePaths(asset):
+        setMtime(path, 1_000_000)
+    setMtime(asset, 2_000_000)
+    assert not MeshAssets.isStale(asset)
+
+
+def test_partial_cache_is_stale(asset):
+    MeshAssets.buildCache(asset)
+    os.remove(MeshAssets.cachePaths(asset)[1])
+    assert MeshAssets.isStale(asset)
+
+
+def test_cache_without_digest_is_stale(asset):
+    MeshAssets.buildCache(asset)
+    os.remove(MeshAssets.digestPath(asset))
+    assert MeshAssets.isStale(asset)
+
+
+def test_stale_cache_is_rebuilt(asset):
+    MeshAssets.buildCache(asset)
+    np.save(MeshAssets.cachePaths(asset)[0], np.zeros(11, dtype=np.float32))
+    edit(asset)
+    vertices, _ = MeshAssets.loadVertexData(asset)
+    assert len(vertices) > 11
+    assert not MeshAssets.isStale(asset)
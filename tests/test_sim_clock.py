@@ -0,0 +1,65 @@
+import pytest
+
+from SimClock import SimClock, DEFAULT_DT
+
+
+def test_first_frame_runs_no_tick():
+    clock = SimClock()
+    assert clock.advance(10.0) == 0
+    assert clock.ticks == 0
+
+
+def test_ticks_of_elapsed_time():
+    clock = SimClock(dt=0.01)
+    clock.advance(0.0)
+    assert clock.advance(0.035) == 3
+    assert clock.ticks == 3
+    # the left over 5 ms is half a tick
+    assert clock.alpha == pytest.approx(0.5)
+    assert clock.advance(0.041) == 1
+    assert clock.alpha == pytest.approx(0.1)
+    assert clock.ticks == 4
+    assert clock.time == pytest.approx(0.041)
+
+
+def test_fast_frames_interpolate():
+    clock = SimClock(dt=0.01)
+    clock.advance(0.0)
+    assert clock.advance(0.004) == 0
+    assert clock.alpha == pytest.approx(0.4)
+    assert clock.advance(0.008) == 0
+    assert clock.alpha == pytest.approx(0.8)
+    assert clock.advance(0.012) == 1
+    assert clock.alpha == pytest.approx(0.2)
+
+
+def test_lag_is_dropped():
+    clock = SimClock(dt=0.01, max_ticks=4)
+    clock.advance(0.0)
+    # a one second stall only runs max_ticks ticks, and the rest of it is not caught up later
+    assert clock.advance(1.0) == 4
+    assert clock.alpha == 0
+    assert clock.advance(1.015) == 1
+    assert clock.ticks == 5
+
+
+def test_time_going_backwards_is_ignored():
+    clock = SimClock(dt=0.01)
+    clock.advance(5.0)
+    assert clock.advance(4.0) == 0
+    assert clock.advance(4.025) == 2
+
+
+def test_reset_forgets_elapsed_time():
+    clock = SimClock(dt=0.01)
+    clock.advance(0.0)
+    clock.advance(0.005)
+    clock.reset()
+    assert clock.advance(100.0) == 0
+    assert clock.alpha == 0
+
+
+def test_default_and_invalid_dt():
+    assert SimClock().dt == DEFAULT_DT
+    with pytest.raises(ValueError):
+        SimClock(dt=0)
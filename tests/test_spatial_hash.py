@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from SpatialHash import SpatialHash
+
+TANK = np.array([4.0, 4.0, 4.0])
+
+
+def bruteForcePairs(points: np.ndarray, radius: float, rows=None):
+    diff = points[:, None, :] - points[None, :, :]
+    close = np.sum(diff ** 2, axis=2) < radius * radius
+    np.fill_diagonal(close, False)
+    if rows is not None:
+        keep = np.zeros(len(points), dtype=np.bool_)
+        keep[rows] = True
+        close &= keep[:, None]
+    return np.nonzero(close)
+
+
+def randomPoints(seed: int, n: int, spread: float = 2.0):
+    return np.random.default_rng(seed).uniform(-spread, spread, (n, 3))
+
+
+@pytest.mark.parametrize("cell_size, radius", [(0.5, 0.5), (0.5, 0.3), (0.3, 0.8), (1.0, 1.5), (4.0, 1.0)])
+def test_pairs_match_brute_force(cell_size, radius):
+    points = randomPoints(0, 300)
+    grid = SpatialHash(TANK, cell_size)
+    grid.rebuild(points)
+    i, j = grid.pairs(radius)
+    expected_i, expected_j = bruteForcePairs(points, radius)
+    np.testing.assert_array_equal(i, expected_i)
+    np.testing.assert_array_equal(j, expected_j)
+
+
+def test_pairs_of_some_rows():
+    points = randomPoints(1, 200)
+    rows = np.array([3, 17, 42, 199])
+    grid = SpatialHash(TANK, 0.6)
+    grid.rebuild(points)
+    i, j = grid.pairs(0.6, rows)
+    expected_i, expected_j = bruteForcePairs(points, 0.6, rows)
+    np.testing.assert_array_equal(i, expected_i)
+    np.testing.assert_array_equal(j, expected_j)
+
+
+def test_points_outside_the_tank():
+    # creatures may look slightly past the walls, they are kept in the border cells
+    points = randomPoints(2, 200, spread=2.4)
+    grid = SpatialHash(TANK, 0.5)
+    grid.rebuild(points)
+    i, j = grid.pairs(0.5)
+    expected_i, expected_j = bruteForcePairs(points, 0.5)
+    np.testing.assert_array_equal(i, expected_i)
+    np.testing.assert_array_equal(j, expected_j)
+
+
+def test_query_matches_brute_force():
+    points = randomPoints(3, 200)
+    grid = SpatialHash(TANK, 0.5)
+    grid.rebuild(points)
+    for point in randomPoints(4, 20):
+        expected = np.flatnonzero(np.sum((points - point) ** 2, axis=1) < 0.7 ** 2)
+        np.testing.assert_array_equal(grid.query(point, 0.7), expected)
+
+
+def test_rebuild_replaces_points():
+    grid = SpatialHash(TANK, 0.5)
+    grid.rebuild(randomPoints(5, 50))
+    grid.rebuild(np.array([[0.0, 0.0, 0.0], [0.1, 0.0, 0.0], [1.5, 1.5, 1.5]]))
+    assert len(grid) == 3
+    i, j = grid.pairs(0.5)
+    assert list(zip(i, j)) == [(0, 1), (1, 0)]
+
+
+def test_empty_grid():
+    grid = SpatialHash(TANK, 0.5)
+    i, j = grid.pairs(0.5)
+    assert len(i) == 0 and len(j) == 0
+
+
+def test_cell_size_must_be_positive():
+    with pytest.raises(ValueError):
+        SpatialHash(TANK, 0)